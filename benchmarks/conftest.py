@@ -0,0 +1,71 @@
+import sys
+import tracemalloc
+import pytest
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parents[1] / 'src'))
+
+import findpapers as fp  # noqa: E402
+
+from corpus import DATABASES, LIMIT, QUERY, load_search_dicts  # noqa: E402
+from utils.cache import SearchCache, make_cache_key  # noqa: E402
+from utils.pipeline import merge_searches  # noqa: E402
+
+DEFAULT_SIZES = '1000,10000'
+
+
+def pytest_addoption(parser):
+    parser.addoption('--corpus-sizes', default=DEFAULT_SIZES,
+                     help="comma separated numbers of papers, e.g. 1000,10000,100000")
+
+
+def pytest_generate_tests(metafunc):
+    if 'corpus_size' in metafunc.fixturenames:
+        sizes = [int(size) for size in metafunc.config.getoption('corpus_sizes').split(',')]
+        metafunc.parametrize('corpus_size', sizes, scope='session')
+
+
+@pytest.fixture(scope='session')
+def search_dicts(corpus_size):
+    return load_search_dicts(corpus_size)
+
+
+@pytest.fixture
+def replay_cache(search_dicts, tmp_path):
+    """Search cache answering every database from the recorded results."""
+    cache = SearchCache(tmp_path / 'cache.sqlite', ttl=10 ** 9, max_entries=10 ** 6)
+    cache.put_many({
+        make_cache_key(QUERY, [database], None, None, None, LIMIT,
+                       scopus=False, ieee=False, enrich=False,
+                       similarity_threshold=0.95): search
+        for database, search in search_dicts.items()
+    })
+    return cache
+
+
+@pytest.fixture(scope='session')
+def merged_search(search_dicts):
+    searches = [fp.models.search.Search.from_dict(search) for search in search_dicts.values()]
+    merged, _ = merge_searches(searches, QUERY, None, None, LIMIT, DATABASES)
+    return merged
+
+
+@pytest.fixture
+def measure(benchmark):
+    """Times a function and records its peak memory in the benchmark results.
+
+    The peak is taken from one extra call under tracemalloc, so the
+    tracing overhead does not distort the timings.
+    """
+    def run(function, *args, rounds=5):
+        tracemalloc.start()
+        try:
+            function(*args)
+            benchmark.extra_info['peak_memory_mb'] = \
+                round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+        finally:
+            tracemalloc.stop()
+        return benchmark.pedantic(function, args, rounds=rounds, iterations=1)
+    return run
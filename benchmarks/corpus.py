@@ -0,0 +1,121 @@
+"""Synthetic search results replayed by the benchmarks."""
+
+import datetime
+import gzip
+import json
+import numpy as np
+import findpapers as fp
+
+from pathlib import Path
+
+QUERY = "[autism] AND ([fnirs] OR [hyperscanning])"
+DATABASES = ['ACM', 'arXiv', 'IEEE', 'PubMed', 'Scopus']
+LIMIT = 10 ** 6
+FIXTURE_DIR = Path(__file__).parent / 'fixtures'
+
+_WORDS = (
+    "autism spectrum disorder functional near infrared spectroscopy hyperscanning "
+    "interpersonal synchrony parent child interaction brain to brain coupling "
+    "prefrontal cortex social cognition joint attention cooperation imitation "
+    "classification deep learning signal processing motion artifact correction "
+    "longitudinal cohort meta analysis systematic review randomized controlled trial "
+    "adolescents infants adults emotion regulation language development eye tracking"
+).split()
+_VENUES = ['NeuroImage', 'Autism Research', 'Scientific Reports', 'Cerebral Cortex',
+           'Frontiers in Psychology', 'IEEE Transactions on Biomedical Engineering',
+           'Proceedings of CHI', 'Molecular Autism']
+
+
+def _title(rng) -> str:
+    return ' '.join(rng.choice(_WORDS, size=rng.randint(6, 13))).capitalize()
+
+
+def _near_duplicate(title: str) -> str:
+    """Spelling variant of a title as another database reports it."""
+    return title.replace(' ', '-', 1).rstrip('.') + '.'
+
+
+def make_papers(n_papers: int, seed: int = 0) -> list:
+    """Random papers, each found by one to three databases.
+
+    About 5% of the papers are reported by a second database without
+    DOI and with a slightly different title, so they are only merged by
+    the near-duplicate detection.
+
+    Args:
+        n_papers (int): number of distinct papers.
+        seed (int, optional): random seed. Defaults to 0.
+
+    Returns:
+        list: (database, paper dict) of every record.
+    """
+    rng = np.random.RandomState(seed)
+    records = []
+    for n in range(n_papers):
+        title = _title(rng)
+        date = datetime.date(2000, 1, 1) + datetime.timedelta(days=int(rng.randint(0, 8000)))
+        venue = _VENUES[rng.randint(len(_VENUES))]
+        paper = {
+            'title': title,
+            'abstract': ' '.join(rng.choice(_WORDS, size=rng.randint(60, 120))),
+            'authors': [f'Author {rng.randint(5000)}' for _ in range(rng.randint(1, 7))],
+            'publication': {'title': venue, 'issn': None, 'isbn': None,
+                            'publisher': None, 'category': 'Journal',
+                            'subject_areas': []},
+            'publication_date': date.isoformat(),
+            'urls': [f'https://example.org/paper/{seed}/{n}'],
+            'doi': f'10.5555/bench.{seed}.{n}' if rng.rand() < 0.7 else None,
+            'citations': int(rng.poisson(12)),
+            'keywords': list(rng.choice(_WORDS, size=3, replace=False)),
+        }
+        found_by = rng.choice(DATABASES, size=rng.randint(1, 4), replace=False)
+        for database in found_by:
+            records.append((database, dict(paper, databases=[database])))
+        if rng.rand() < 0.05:
+            others = [database for database in DATABASES if database not in found_by]
+            if others:
+                database = others[rng.randint(len(others))]
+                records.append((database, dict(paper, title=_near_duplicate(title), doi=None,
+                                               databases=[database])))
+    return records
+
+
+def make_search_dicts(n_papers: int, seed: int = 0) -> dict:
+    """Single database search results as stored in the search cache.
+
+    Args:
+        n_papers (int): number of distinct papers.
+        seed (int, optional): random seed. Defaults to 0.
+
+    Returns:
+        dict: findpapers search dict by database.
+    """
+    by_database = {database: [] for database in DATABASES}
+    for database, paper in make_papers(n_papers, seed):
+        by_database[database].append(fp.models.paper.Paper.from_dict(paper))
+    searches = {}
+    for database, papers in by_database.items():
+        search = fp.models.search.Search(QUERY, databases=[database.lower()])
+        for paper in papers:
+            search.add_paper(paper)
+        searches[database] = fp.models.search.Search.to_dict(search)
+    return searches
+
+
+def load_search_dicts(n_papers: int, seed: int = 0) -> dict:
+    """Replays the recorded results of a corpus size, recording them first if needed.
+
+    Args:
+        n_papers (int): number of distinct papers.
+        seed (int, optional): random seed. Defaults to 0.
+
+    Returns:
+        dict: findpapers search dict by database.
+    """
+    path = FIXTURE_DIR / f'corpus-{n_papers}-{seed}.json.gz'
+    if not path.exists():
+        FIXTURE_DIR.mkdir(parents=True, exist_ok=True)
+        with gzip.open(path, 'wt', encoding='utf-8') as file:
+            json.dump(make_search_dicts(n_papers, seed), file)
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        return json.load(file)
@@ -0,0 +1,20 @@
+import findpapers as fp
+import pytest
+
+from utils.exports import iter_frames, iter_json
+
+
+def _json_size(search) -> int:
+    return sum(len(part) for part in iter_json(search))
+
+
+def test_json_export(measure, merged_search):
+    assert measure(_json_size, merged_search) > 0
+
+
+@pytest.mark.skipif(not hasattr(fp, 'RisExport'), reason="requires the findpapers fork")
+def test_ris_and_rayyan_export(measure, merged_search):
+    def frames(search):
+        return sum(len(ris_df) for ris_df, _ in iter_frames(search))
+
+    assert measure(frames, merged_search) == len(merged_search.papers)
@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+from utils.pipeline import search_view
+from utils.stats import overlap
+
+
+def test_apply_exclusions(measure, merged_search):
+    keys = sorted(merged_search.paper_by_key)
+    excluded = frozenset(keys[::10])
+
+    view = measure(search_view, merged_search, excluded)
+    assert len(view.papers) == len(keys) - len(excluded)
+
+
+def test_overlap_statistics(measure, merged_search):
+    databases = pd.Series([sorted(paper.databases) for paper in merged_search.papers])
+
+    stats = measure(overlap, databases)
+    assert stats.counts.sum() == len(databases)
+    assert np.all(stats.masks > 0)
@@ -0,0 +1,17 @@
+import numpy as np
+
+from utils.prioritization import RelevanceModel, tfidf_matrix
+
+
+def test_retrain_after_a_decision(measure, merged_search):
+    papers = sorted(merged_search.papers, key=lambda paper: paper.title)
+    matrix = tfidf_matrix([f'{paper.title} {paper.abstract}' for paper in papers])
+    labeled = np.arange(0, len(papers), 10)
+    labels = np.arange(len(labeled)) % 5 == 0
+    model = RelevanceModel(matrix.shape[1]).fit(matrix, labeled[:-1], labels[:-1])
+
+    def retrain():
+        return model.fit(matrix, labeled, labels).predict(matrix)
+
+    probabilities = measure(retrain)
+    assert probabilities.shape == (len(papers),)
@@ -0,0 +1,13 @@
+from corpus import DATABASES, LIMIT, QUERY
+from utils.pipeline import run_search
+
+
+def test_merge_and_deduplicate(measure, replay_cache, corpus_size):
+    """Replays every database from the cache, then merges and deduplicates."""
+    def search():
+        return run_search(QUERY, None, None, LIMIT, DATABASES, cache=replay_cache)
+
+    merged, results, dropped = measure(search)
+    assert all(result.error is None and result.from_cache for result in results)
+    assert dropped == 0
+    assert corpus_size <= len(merged.papers) < 1.1 * corpus_size
@@ -3,7 +3,7 @@ import streamlit as st
 from pathlib import Path
 from utils.site_config import set_page_title, set_page_style
 
-@st.cache
+@st.cache_data
 def get_home_md() -> str:
     """Returns home
 
@@ -1,12 +1,16 @@
 import datetime
-import findpapers as fp
 import streamlit as st
 import utils.consts as cs
 
 from utils.site_config import set_page_title
 from utils.search_engine import build_search_str, single_search_str, get_search_str
-from utils.search_engine import set_build_btns, set_single_btns
-from utils.search_engine import convert_search_to_json
+from utils.search_engine import set_build_btns, set_single_btns, check_search_str
+from utils.search_engine import get_export_dir, download_buttons, store_review, review_available
+from utils.search_engine import submit_search_job, show_background_jobs
+from utils.search_engine import show_interrupted_searches, query_set_str, show_query_comparison
+from utils.pipeline import shared_search, load_search, shared_exports, dropped_papers
+from utils.pipeline import papers_to_frame, request_metrics
+from utils.pipeline import shared_citations, new_run_profile, compare_queries
 
 # configure page
 set_page_title("Literature Search")
@@ -22,6 +26,24 @@ enrich_col, cross_search_col = st.sidebar.columns(2)
 enrich = enrich_col.checkbox("Enrich papers", value=False, help=cs.HELP_ENRICH)
 cross_search = cross_search_col.checkbox("Cross-references", value=False, help=cs.HELP_CROSS_REF)
 
+force_refresh = st.sidebar.checkbox("Force refresh", value=False,
+                                    help=cs.HELP_FORCE_REFRESH)
+incremental = st.sidebar.checkbox("Incremental update", value=False,
+                                  help=cs.HELP_INCREMENTAL)
+background = st.sidebar.checkbox("Run in background", value=False,
+                                 help=cs.HELP_BACKGROUND)
+jsonl_col, compress_col = st.sidebar.columns(2)
+jsonl = jsonl_col.checkbox("JSON Lines", value=False, help=cs.HELP_JSONL)
+compress = compress_col.checkbox("Compress", value=False, help=cs.HELP_COMPRESS)
+
+if cross_search:
+    citation_depth = st.sidebar.slider("Citation depth", min_value=1,
+                                       max_value=cs.CITATION_MAX_DEPTH,
+                                       value=cs.CITATION_DEPTH)
+    citation_max_nodes = st.sidebar.number_input("Maximum papers in the citation graph",
+                                                 min_value=1,
+                                                 value=cs.CITATION_MAX_NODES)
+
 if enrich is True or cross_search is True:
     st.sidebar.info("We recommend using time-consuming enrich and" 
                     "cross-references features only in console mode.")
@@ -95,72 +117,157 @@ if search_str_type == cs.SEARCH_STRING_TYPE[1]:
 elif search_str_type == cs.SEARCH_STRING_TYPE[0]:
     search_str_txt = single_search_str()
     search_state = set_single_btns(search_str_txt)
+else:
+    variants, compare_state = query_set_str()
+    search_state = False
+    if compare_state:
+        progress = st.progress(0.0)
+        st.session_state.query_comparison = compare_queries(
+            variants, start_date, end_date, limit=limit, databases=databases,
+            publication_types=pub_types,
+            scopus_api_token=scopus_api_key,
+            ieee_api_token=ieee_api_key,
+            enrich=enrich,
+            similarity_threshold=similarity_threshold,
+            force_refresh=force_refresh,
+            on_clause=lambda done, total: progress.progress(done / total))
+    if 'query_comparison' in st.session_state:
+        show_query_comparison(st.session_state.query_comparison)
 
 
 search_string = get_search_str()
+if search_string != "":
+    # invalid search strings are rejected before any request is sent
+    search_string = check_search_str(search_string)
+    search_state = search_state and search_string is not None
+
+resumed = show_interrupted_searches()
 
 # search
+result_key, search, table = None, None, None
+profile = new_run_profile()
 if search_state and search_string == "":
     st.error("Please enter a search string")
-elif search_state and search_string != "":
-    st.write("Please wait till the results are obtained")
-    search = fp.search(None,
-                       search_string,
-                       start_date,
-                       end_date,
-                       limit=limit * len(databases),
-                       limit_per_database=limit,
-                       databases=databases,
-                       publication_types=pub_types,
-                       scopus_api_token=scopus_api_key,
-                       ieee_api_token=ieee_api_key,
-                       cross_reference_search=cross_search,
-                       enrich=enrich,
-                       similarity_threshold=similarity_threshold)
-
-    # process search results
-    result_json = convert_search_to_json(search)
-    search_export = fp.RayyanExport(search)
-    rayyan_file, rayyan_df = search_export.generate_rayyan_csv()
-    ris = fp.RisExport(search)
-    ris_file, ris_df = ris.generate_ris()
+elif search_state and background:
+    job_id = submit_search_job(search_string,
+                               start_date,
+                               end_date,
+                               limit=limit,
+                               databases=databases,
+                               publication_types=pub_types,
+                               scopus_api_token=scopus_api_key,
+                               ieee_api_token=ieee_api_key,
+                               enrich=enrich,
+                               similarity_threshold=similarity_threshold,
+                               force_refresh=force_refresh,
+                               incremental=incremental)
+    st.success(f"Search submitted as background job {job_id}")
+elif (search_state and search_string != "") or resumed is not None:
+    run_params = resumed or dict(query=search_string,
+                                 since=start_date,
+                                 until=end_date,
+                                 limit=limit,
+                                 databases=databases,
+                                 publication_types=pub_types,
+                                 enrich=enrich,
+                                 similarity_threshold=similarity_threshold,
+                                 force_refresh=force_refresh,
+                                 incremental=incremental)
+    n_databases = len(run_params['databases'])
+    progress = st.progress(0.0)
+    status = st.empty()
+    table = st.empty()
+    done, cached = [], []
 
-    # store session data
-    if 'review' not in st.session_state:
-        st.session_state.search = search
-        st.session_state.ris_df = ris_df.copy()
-        st.session_state.rayyan_df = rayyan_df.copy()
-        st.session_state.review = ris_df.copy()
-        st.session_state.review.insert(1, 'criteria', 'default')
-        st.session_state.review.insert(1, 'decision', True)
-        st.session_state.review.insert(1, 'reviewed', False)
+    def show_progress(result, finished):
+        done.append(result.database)
+        if result.error is not None:
+            st.warning(f"{result.database} failed: {result.error}")
+        else:
+            if result.from_cache:
+                cached.append(result.database)
+            table.dataframe(papers_to_frame(finished))
+        progress.progress(len(done) / n_databases)
+        status.write(f"{len(done)} of {n_databases} databases finished")
+
+    status.write("Please wait till the results are obtained")
+    # identical searches of other sessions are run only once
+    result_key, failed, fetched = shared_search(**run_params,
+                                                scopus_api_token=scopus_api_key,
+                                                ieee_api_token=ieee_api_key,
+                                                on_result=show_progress,
+                                                profile=profile)
+    if not fetched:
+        progress.progress(1.0)
+        status.write("Results shared with an identical search")
+        for failure in failed:
+            st.warning(f"{failure}")
+    n_dropped = dropped_papers(result_key)
+    if n_dropped:
+        st.warning(f"{n_dropped} papers could not be merged, e.g. beyond the maximum "
+                   "number of papers of a database, see the log for details")
+    if cached:
+        st.caption(f"Loaded from cache: {', '.join(cached)}. "
+                   "Use force refresh to fetch them again.")
+    with st.expander("Requests per database"):
+        st.dataframe(request_metrics())
 
+loaded_key = show_background_jobs()
+if loaded_key is not None:
+    result_key = loaded_key
+
+if result_key is not None:
+    search = load_search(result_key)
+    if search is None:
+        st.error("The results expired, please run the search again.")
+
+if search is not None:
+    # process search results, exports and review store are shared as well
+    export_options = dict(compress=compress, jsonl=jsonl)
+    citations = None
+    if cross_search:
+        # snowballed papers are added to the review and the exports
+        citations = dict(depth=citation_depth, max_nodes=int(citation_max_nodes))
+        with st.spinner("Expanding the citation graph..."):
+            graph, snowballed = shared_citations(result_key, profile=profile, **citations)
+    with profile.span('export', papers_in=len(search.papers)) as span:
+        # the full-text index of the reviewed results is reused
+        previous = st.session_state.store if review_available() else None
+        export_paths, store = shared_exports(result_key, export_options, citations, previous)
+        span['bytes'] = sum(path.stat().st_size for path in export_paths.values())
+
+    # store session data
+    if 'store' not in st.session_state:
+        store_review(result_key, store, export_options, citations)
     else:
         st.info("Override results!!!")
         if st.button("Yes I'm ready to override"):
-            st.session_state.search = search
-            st.session_state.ris_df = ris_df.copy()
-            st.session_state.rayyan_df = rayyan_df.copy()
-            st.session_state.review = ris_df.copy()
-            st.session_state.review.insert(1, 'criteria', 'default')
-            st.session_state.review.insert(1, 'decision', True)
-            st.session_state.review.insert(1, 'reviewed', False)
+            store_review(result_key, store, export_options, citations)
 
     # display results
-    st.dataframe(ris_df)
+    if table is None:
+        table = st.empty()
+    table.dataframe(store.read())
+
+    # citation snowballing
+    if cross_search:
+        with st.expander(f"Citation graph ({len(graph.depth)} papers, "
+                         f"{len(graph.edges)} citations, {len(snowballed)} papers added)"):
+            if not graph.complete:
+                st.caption("The graph was cut at the maximum number of papers "
+                           "or the time budget.")
+            st.dataframe(graph.node_frame())
+
+    # time spent in each stage
+    export_paths['profile'] = profile.write_jsonl(get_export_dir("search") / cs.EXPORT_PROFILE,
+                                                  append=False)
+    profile.write_jsonl(cs.PROFILE_PATH)
+    with st.expander("Run profile"):
+        profile_df = profile.frame()
+        st.caption("Databases are searched concurrently, so their spans overlap.")
+        st.bar_chart(profile_df.groupby('name', sort=False)['seconds'].sum())
+        st.dataframe(profile_df.drop(columns=['run_id']))
 
     # download results
     st.subheader("Download")
-    download_json, download_ris, download_csv, = st.columns(3)
-    download_json.download_button(label='Details - JSON',
-                                  data=result_json,
-                                  file_name='set_you_free_results.json',
-                                  mime='text/plain')
-    download_ris.download_button(label='CADIMA - RIS',
-                                 data=ris_file,
-                                 file_name='set_you_free_cadima.ris',
-                                 mime='text/plain')             
-    download_csv.download_button(label='Rayyan - CSV',
-                                 data=rayyan_file,
-                                 file_name='set_you_free_rayyan.csv',
-                                 mime='text/csv')
+    download_buttons(export_paths)
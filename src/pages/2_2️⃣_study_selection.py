@@ -1,7 +1,12 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode, DataReturnMode
+import utils.consts as cs
 from utils.site_config import set_page_title
+from utils.search_engine import review_available, get_screening_log, relevance_queue
+from utils.review_store import review_view, changed_decisions, apply_decisions, match_keys
+from utils.screening import shard_of, reviewer_decisions, consolidate, agreement
+from utils.prioritization import estimated_recall
 
 
 # configure page
@@ -9,9 +14,15 @@ set_page_title("Study selection")
 
 st.subheader("Manual selection of publications")
 
-if 'review' not in st.session_state:
+if not review_available():
     st.error("Please run the search first.")
 else:
+    # the grid component is only loaded once there is something to review
+    from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode, DataReturnMode
+
+    store = st.session_state.store
+    decisions = st.session_state.decisions
+
     # sidebar
     st.sidebar.title("Inspection settings")
 
@@ -21,9 +32,36 @@ else:
                                        default='default')
     criterias = 'default' if criterias == '' else criterias
 
+    # team screening, decisions of all reviewers are logged for the search
+    st.sidebar.subheader("Team screening")
+    reviewer = st.sidebar.text_input("Reviewer", help=cs.HELP_REVIEWER).strip()
+    review_id = st.session_state.result_key
+    log = get_screening_log()
+    paper_keys = store.read(['paper_key']).paper_key
+    shard_rows = None
+    if reviewer:
+        n_shards, shards = log.assignment(review_id)
+        with st.sidebar.expander("Assign shards", expanded=n_shards is None):
+            team = st.text_input("Reviewers (comma separated)", reviewer)
+            n_new = st.number_input("Shards", min_value=1, value=cs.SCREENING_SHARDS)
+            per_shard = st.number_input("Reviewers per paper", min_value=1,
+                                        value=cs.SCREENING_REVIEWERS_PER_PAPER)
+            if st.button("Assign"):
+                log.assign(review_id, [name.strip() for name in team.split(',') if name.strip()],
+                           int(n_new), int(per_shard))
+                n_shards, shards = log.assignment(review_id)
+        if n_shards is not None:
+            shard_rows = np.flatnonzero(np.isin(shard_of(paper_keys, n_shards),
+                                                shards.get(reviewer, [])))
+            st.sidebar.caption(f"Shards {shards.get(reviewer, [])} of {n_shards}: "
+                               f"{len(shard_rows)} papers")
+        # the table shows the latest decisions of the reviewer
+        apply_decisions(decisions, reviewer_decisions(log.events(review_id, reviewer),
+                                                      paper_keys, decisions.id))
+
     st.sidebar.info(
-        f"Reviewed papers: {len(st.session_state.review[st.session_state.review.reviewed == True])} of "
-        f"{len(st.session_state.review)}"
+        f"Reviewed papers: {int(decisions.reviewed.sum())} of "
+        f"{len(decisions)}"
     )
 
     # select study
@@ -32,36 +70,92 @@ else:
         "The decision column describes which publications are included in your results."
     )
 
-    gb = GridOptionsBuilder.from_dataframe(st.session_state.review)
+    # full-text search, ranked matches are looked up in the index of the store
+    text = st.text_input("Search titles and abstracts",
+                         help="All words have to occur, use * for prefixes (e.g. neuro*).")
+    rows = store.search(text) if text.strip() else None
+    if shard_rows is not None:
+        assigned = set(shard_rows.tolist())
+        rows = shard_rows.tolist() if rows is None else [row for row in rows if row in assigned]
+
+    # active learning, unreviewed papers ordered by predicted relevance
+    prioritize = st.sidebar.checkbox("Prioritize by relevance", value=False,
+                                     help=cs.HELP_PRIORITIZE)
+    if prioritize:
+        model, relevance, queue = relevance_queue(store, decisions)
+        if rows is not None:
+            allowed = set(rows)
+            queue = queue[[row in allowed for row in queue]]
+        rows = queue.tolist()
+        if model.trained:
+            history = st.session_state.screening_history[-cs.PRIORITY_RECALL_WINDOW:]
+            recent = [row for row, _ in history]
+            recall = estimated_recall(relevance, decisions.reviewed.values,
+                                      decisions.decision.values,
+                                      decisions.decision.values[recent],
+                                      [probability for _, probability in history])
+            st.sidebar.progress(min(recall['recall'] or 0.0, 1.0))
+            st.sidebar.caption(f"Estimated recall: {recall['recall'] or 0:.0%} "
+                               f"({recall['found']} includes found, "
+                               f"about {recall['remaining']:.0f} left)")
+            if recall['recall'] is not None and recall['recall'] >= cs.PRIORITY_TARGET_RECALL:
+                st.sidebar.success("Most includes were probably found, "
+                                   "you may stop screening.")
+        else:
+            st.sidebar.caption("The order is learned once papers were included "
+                               "and excluded.")
+
+    n_rows = len(decisions) if rows is None else len(rows)
+    if rows is not None:
+        st.caption(f"{n_rows} matching papers")
+
+    # only the current page of lightweight columns is sent to the table
+    page_size = st.sidebar.select_slider("Papers per page:",
+                                         options=cs.REVIEW_PAGE_SIZES,
+                                         value=cs.REVIEW_PAGE_SIZES[1])
+    n_pages = max((n_rows - 1) // page_size + 1, 1)
+    page = st.sidebar.number_input(f"Page (of {n_pages}):",
+                                   min_value=1, max_value=n_pages, value=1, step=1)
+    start = (int(page) - 1) * page_size
+    stop = start + page_size
+
+    columns = [column for column in store.columns() if column not in ('abstract', 'paper_key')]
+    if rows is None:
+        review = review_view(store, decisions, columns, start=start, stop=stop)
+    else:
+        review = review_view(store, decisions, columns, rows=rows[start:stop])
+    gb = GridOptionsBuilder.from_dataframe(review)
     gb.configure_column(field='custom1', editable=True)
     gb.configure_column(field='custom2', editable=True)
-    gb.configure_column(field='abstract', hide=True)
     #gb.configure_column(field='title', pinned='left')
     gb.configure_column(field='doi', pinned='left', checkboxSelection=True)
     gb.configure_selection('single')  # use_checkbox=True
     gb.configure_grid_options(stopEditingWhenCellsLoseFocus=True)
-    gb.configure_pagination(paginationAutoPageSize=True)
     build_gb = gb.build()
     grid = AgGrid(
-        dataframe=st.session_state.review,
+        dataframe=review,
         width='100%',
         update_mode=GridUpdateMode.__members__['MODEL_CHANGED'],
         data_return_mode=DataReturnMode.__members__['AS_INPUT'],
         gridOptions=build_gb,
         fit_columns_on_grid_load=False,
         theme='streamlit',
-        enable_enterprise_modules=True)
+        enable_enterprise_modules=True,
+        key=f'review_page_{start}_{page_size}_{text}')
 
-    st.session_state.review = grid['data']
+    # write back the edited rows of the page only
+    apply_decisions(decisions, changed_decisions(review[decisions.columns], grid['data']))
     selected = grid['selected_rows']
     selected_df = pd.DataFrame(selected)
 
     with st.spinner("Load publication..."):
         if not selected_df.empty:
+            row = pd.Index(decisions.id).get_loc(selected_df.loc[0, 'id'])
+            abstract = store.read(['abstract'], start=row, stop=row + 1).abstract
             st.markdown(f"## {selected_df.loc[0, 'title']} \n"
                         f"***{selected_df.loc[0, 'doi']}***")
             st.markdown("## Abstract \n"
-                        f"{selected_df.loc[0, 'abstract']}")
+                        f"{abstract.iloc[0] if not abstract.empty else ''}")
 
             # exclusion
             st.subheader("Decision...")
@@ -69,18 +163,34 @@ else:
             exclude_col, submit_col = st.columns(2)
 
             exclude = exclude_col.checkbox(f"Exclude because: {criterias}", value=False)
+            final = reviewer and exclude_col.checkbox("Final decision",
+                                                      help=cs.HELP_FINAL_DECISION)
 
             submit = submit_col.button("submit")
 
             if submit:
-                st.session_state.review.loc[
-                    st.session_state.review.id == selected_df.loc[0, 'id'],
-                    'reviewed'
-                ] = True
-                st.session_state.review.loc[
-                    st.session_state.review.id == selected_df.loc[0, 'id'],
-                    'decision'
-                ] = not exclude
-
-        
-
+                if prioritize and not decisions.reviewed.iloc[row]:
+                    st.session_state.screening_history.append((row, relevance[row]))
+                apply_decisions(decisions, pd.DataFrame({'id': [selected_df.loc[0, 'id']],
+                                                         'reviewed': [True],
+                                                         'decision': [not exclude]}))
+                if reviewer:
+                    log.record(review_id, reviewer, [paper_keys.iloc[row]], [not exclude],
+                               criteria=', '.join(criterias) if exclude else None,
+                               final=bool(final))
+
+    # merged decisions of the team
+    events = log.events(review_id)
+    if not events.empty:
+        with st.expander("Team decisions"):
+            merged = consolidate(events)
+            st.write(merged['status'].value_counts().to_dict())
+            st.dataframe(agreement(events))
+            st.dataframe(merged.loc[merged['status'] == 'conflict'])
+            if st.button("Use team decisions"):
+                decided = merged.loc[merged['decision'].notna()]
+                rows, positions = match_keys(paper_keys, decided.index)
+                apply_decisions(decisions, pd.DataFrame({
+                    'id': decisions.id.values[rows],
+                    'reviewed': True,
+                    'decision': decided['decision'].values[positions].astype(bool)}))
@@ -0,0 +1,25 @@
+"""Console entry point of the batch search.
+
+The app imports its helpers as the package ``utils``. It is installed
+inside this package, so it does not shadow other packages named utils,
+and only added to the import path of the console script.
+"""
+
+import sys
+
+from pathlib import Path
+
+
+def main(argv: list = None) -> int:
+    """Runs utils.cli.main with the bundled helpers.
+
+    Args:
+        argv (list, optional): command line arguments. Defaults to sys.argv.
+
+    Returns:
+        int: exit code.
+    """
+    if (Path(__file__).parent / 'utils').is_dir():
+        sys.path.insert(0, str(Path(__file__).parent))
+    from utils.cli import main as cli_main
+    return cli_main(argv)
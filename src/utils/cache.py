@@ -0,0 +1,208 @@
+"""Persistent search result cache."""
+
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+
+from contextlib import contextmanager
+from pathlib import Path
+from utils.query import QuerySyntaxError, canonical_query
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a search string, so equivalent searches share a key.
+
+    Args:
+        query (str): search string.
+
+    Returns:
+        str: canonical search string, only whitespace normalized if the
+            search string cannot be parsed.
+    """
+    try:
+        return canonical_query(query)
+    except QuerySyntaxError:
+        return ' '.join(query.split())
+
+
+def make_cache_key(query: str,
+                   databases: list,
+                   since=None,
+                   until=None,
+                   publication_types: list = None,
+                   limit: int = None,
+                   **options) -> str:
+    """Creates the cache key of a search.
+
+    Args:
+        query (str): search string.
+        databases (list): searched databases.
+        since (datetime.date, optional): start date. Defaults to None.
+        until (datetime.date, optional): end date. Defaults to None.
+        publication_types (list, optional): publication types.
+            Defaults to None.
+        limit (int, optional): limit per database. Defaults to None.
+        **options: further search settings that change the results.
+
+    Returns:
+        str: hex digest identifying the search.
+    """
+    payload = {
+        'query': normalize_query(query),
+        'databases': sorted(db.lower() for db in databases),
+        'since': str(since) if since is not None else None,
+        'until': str(until) if until is not None else None,
+        'publication_types': (sorted(pt.lower() for pt in publication_types)
+                              if publication_types else None),
+        'limit': limit,
+        'options': options
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class SearchCache:
+    """SQLite backed cache with TTL and LRU eviction."""
+
+    def __init__(self, path, ttl: float, max_entries: int):
+        """Opens the cache and creates the table if needed.
+
+        Args:
+            path (str or Path): location of the SQLite file.
+            ttl (float): time to live of an entry in seconds.
+            max_entries (int): maximum number of stored entries.
+        """
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, "
+                "value BLOB NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "accessed_at REAL NOT NULL)"
+            )
+            con.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed "
+                "ON entries (accessed_at)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(str(self.path), timeout=30)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def get(self, key: str, newer_than: float = None):
+        """Returns a cached value.
+
+        Args:
+            key (str): cache key.
+            newer_than (float, optional): ignore values stored before this
+                timestamp. Defaults to None.
+
+        Returns:
+            object: the stored value or None if missing or expired.
+        """
+        now = time.time()
+        with self._connect() as con:
+            row = con.execute(
+                "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (newer_than is not None and row[1] < newer_than):
+                return None
+            if now - row[1] > self.ttl:
+                con.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            con.execute("UPDATE entries SET accessed_at = ? WHERE key = ?",
+                        (now, key))
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def get_many(self, keys: list) -> dict:
+        """Returns the cached values of several keys at once.
+
+        Args:
+            keys (list): cache keys.
+
+        Returns:
+            dict: stored values of the keys that are present and not expired.
+        """
+        now = time.time()
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        with self._connect() as con:
+            # stay below the SQLite limit of bound parameters
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                marks = ", ".join("?" * len(batch))
+                rows = con.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({marks}) "
+                    "AND created_at >= ?", (*batch, now - self.ttl)
+                ).fetchall()
+                con.execute(f"UPDATE entries SET accessed_at = ? WHERE key IN ({marks})",
+                            (now, *batch))
+                found.update((key, json.loads(zlib.decompress(value).decode('utf-8')))
+                             for key, value in rows)
+        return found
+
+    def put(self, key: str, value):
+        """Stores a JSON serializable value and evicts old entries.
+
+        Args:
+            key (str): cache key.
+            value (object): value to store.
+        """
+        self.put_many({key: value})
+
+    def put_many(self, items: dict, ttl: float = None):
+        """Stores several JSON serializable values and evicts old entries.
+
+        Args:
+            items (dict): values by cache key.
+            ttl (float, optional): shorter time to live of these entries.
+                Defaults to the time to live of the cache.
+        """
+        now = time.time()
+        # entries with a shorter time to live are stored as if older
+        created_at = now if ttl is None else now - max(self.ttl - ttl, 0)
+        rows = [(key, zlib.compress(json.dumps(value).encode('utf-8')), created_at, now)
+                for key, value in items.items()]
+        with self._connect() as con:
+            con.executemany(
+                "INSERT OR REPLACE INTO entries "
+                "(key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            con.execute("DELETE FROM entries WHERE created_at < ?",
+                        (now - self.ttl,))
+            con.execute(
+                "DELETE FROM entries WHERE key NOT IN ("
+                "SELECT key FROM entries ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+
+    def invalidate(self, key: str):
+        """Removes an entry.
+
+        Args:
+            key (str): cache key.
+        """
+        with self._connect() as con:
+            con.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        """Removes all entries."""
+        with self._connect() as con:
+            con.execute("DELETE FROM entries")
+
+    def __len__(self) -> int:
+        with self._connect() as con:
+            return con.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
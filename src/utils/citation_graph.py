@@ -0,0 +1,255 @@
+"""Bounded breadth-first expansion of the citation graph."""
+
+import logging
+import time
+import pandas as pd
+import utils.consts as cs
+
+from collections import Counter
+from utils.cache import SearchCache
+from utils.enrichment import cached_lookup, content_key, crossref_metadata
+
+OPENCITATIONS_URL = "https://opencitations.net/index/coci/api/v1/citations"
+
+
+class CitationGraph:
+    """Citation edges collected by expand_citations."""
+
+    def __init__(self):
+        self.depth = {}
+        self.edges = set()
+        self.complete = True
+
+    def in_degree(self) -> Counter:
+        """Number of citing papers of each DOI within the graph.
+
+        Returns:
+            Counter: in-degree by DOI.
+        """
+        return Counter(cited for _, cited in self.edges)
+
+    def edge_frame(self) -> pd.DataFrame:
+        """Edge list of the graph.
+
+        Returns:
+            pd.DataFrame: citing and cited DOI of each edge.
+        """
+        return pd.DataFrame(sorted(self.edges), columns=['citing', 'cited'])
+
+    def node_frame(self) -> pd.DataFrame:
+        """Papers of the graph, most cited first.
+
+        Returns:
+            pd.DataFrame: DOI, depth (0 for the seeds) and in-degree.
+        """
+        in_degree = self.in_degree()
+        nodes = pd.DataFrame({'doi': list(self.depth),
+                              'depth': list(self.depth.values()),
+                              'in_degree': [in_degree[doi] for doi in self.depth]},
+                             columns=['doi', 'depth', 'in_degree'])
+        return nodes.sort_values(['in_degree', 'depth', 'doi'],
+                                 ascending=[False, True, True], ignore_index=True)
+
+    def to_dict(self) -> dict:
+        """JSON serializable form of the graph.
+
+        Returns:
+            dict: depth of each DOI, edges and completeness.
+        """
+        return {'depth': self.depth, 'edges': sorted(map(list, self.edges)),
+                'complete': self.complete}
+
+    @classmethod
+    def from_dict(cls, graph_dict: dict):
+        """Restores a graph written by to_dict.
+
+        Args:
+            graph_dict (dict): graph as dict.
+
+        Returns:
+            CitationGraph: the graph.
+        """
+        graph = cls()
+        graph.depth = dict(graph_dict['depth'])
+        graph.edges = set(map(tuple, graph_dict['edges']))
+        graph.complete = graph_dict['complete']
+        return graph
+
+    def inherit(self, values: dict) -> dict:
+        """Passes values of the seeds on to the papers reached from them.
+
+        Args:
+            values (dict): set of values of each seed DOI, e.g. the
+                databases it was found in.
+
+        Returns:
+            dict: union of the values of the papers one level closer to
+                the seeds that each paper shares an edge with.
+        """
+        neighbours = {}
+        for citing, cited in self.edges:
+            neighbours.setdefault(citing, set()).add(cited)
+            neighbours.setdefault(cited, set()).add(citing)
+        inherited = {}
+        for doi in sorted(self.depth, key=self.depth.get):
+            if self.depth[doi] == 0:
+                inherited[doi] = set(values.get(doi, ()))
+            else:
+                inherited[doi] = set().union(*(inherited[other] for other in neighbours.get(doi, ())
+                                               if self.depth[other] < self.depth[doi]))
+        return inherited
+
+
+def expand_citations(seeds: list,
+                     fetch_level,
+                     depth: int = cs.CITATION_DEPTH,
+                     max_nodes: int = cs.CITATION_MAX_NODES,
+                     time_budget: float = cs.CITATION_TIME_BUDGET) -> CitationGraph:
+    """Expands the citation graph of the seeds level by level.
+
+    Each level is fetched at once. Of the unseen neighbours, the ones
+    with the most edges from the current level are added first, until
+    max_nodes papers are in the graph. The expansion stops early when
+    the time budget is used up; the graph is then marked incomplete.
+
+    Args:
+        seeds (list): DOIs to start from.
+        fetch_level (callable): called with a list of DOIs and a timeout,
+            returns the (citing, cited) edges of each fetched DOI.
+        depth (int, optional): maximum distance from the seeds.
+            Defaults to cs.CITATION_DEPTH.
+        max_nodes (int, optional): maximum number of papers, seeds
+            included. Defaults to cs.CITATION_MAX_NODES.
+        time_budget (float, optional): wall clock budget in seconds.
+            Defaults to cs.CITATION_TIME_BUDGET.
+
+    Returns:
+        CitationGraph: collected papers and edges.
+    """
+    deadline = time.monotonic() + time_budget
+    graph = CitationGraph()
+    frontier = list(dict.fromkeys(seed.lower() for seed in seeds if seed))
+    graph.depth.update((doi, 0) for doi in frontier)
+
+    for level in range(1, depth + 1):
+        remaining = deadline - time.monotonic()
+        if not frontier or remaining <= 0:
+            graph.complete = graph.complete and not frontier
+            break
+        edges = fetch_level(frontier, remaining)
+        if len(edges) < len(frontier):
+            graph.complete = False
+
+        candidates = Counter()
+        for node_edges in edges.values():
+            for citing, cited in node_edges:
+                citing, cited = citing.lower(), cited.lower()
+                graph.edges.add((citing, cited))
+                for doi in (citing, cited):
+                    if doi not in graph.depth:
+                        candidates[doi] += 1
+
+        budget = max_nodes - len(graph.depth)
+        if len(candidates) > budget:
+            graph.complete = False
+        ranked = sorted(candidates, key=lambda doi: (-candidates[doi], doi))[:max(budget, 0)]
+        for doi in ranked:
+            graph.depth[doi] = level
+        frontier = ranked
+
+    # edges to papers that were not admitted are not part of the graph
+    graph.edges = {(a, b) for a, b in graph.edges if a in graph.depth and b in graph.depth}
+    return graph
+
+
+def opencitations_citing(doi: str, session=None) -> list:
+    """DOIs of the papers citing a DOI, from the OpenCitations index.
+
+    Args:
+        doi (str): cited DOI.
+        session (requests.Session, optional): HTTP session. Defaults to
+            the findpapers session.
+
+    Returns:
+        list: citing DOIs, None if the request failed.
+    """
+    if session is None:
+        from findpapers.utils.requests_util import DefaultSession
+        session = DefaultSession()
+    try:
+        response = session.get(f'{OPENCITATIONS_URL}/{doi}')
+        response.raise_for_status()
+        return sorted({row['citing'].lower() for row in response.json() if row.get('citing')})
+    except Exception:
+        logging.debug("OpenCitations lookup of %s failed", doi, exc_info=True)
+        return None
+
+
+def _crossref_work(doi: str) -> dict:
+    """CrossRef payload of a DOI, None if the request failed."""
+    return crossref_metadata((doi, None))
+
+
+def cached_fetch_level(cache: SearchCache,
+                       works=_crossref_work,
+                       citations=opencitations_citing,
+                       max_workers: int = cs.CITATION_WORKERS):
+    """Level fetcher of expand_citations backed by the enrichment cache.
+
+    The metadata of the fetched papers is cached with their references,
+    see node_metadata.
+
+    Args:
+        cache (SearchCache): shared enrichment cache.
+        works (callable, optional): payload with the referenced DOIs of
+            a DOI. Defaults to CrossRef.
+        citations (callable, optional): citing DOIs of a DOI.
+            Defaults to OpenCitations.
+        max_workers (int, optional): concurrent requests.
+            Defaults to cs.CITATION_WORKERS.
+
+    Returns:
+        callable: fetch_level function.
+    """
+    def fetch_level(dois: list, timeout: float) -> dict:
+        start = time.monotonic()
+        items = {content_key(doi): doi for doi in dois}
+        cited, _ = cached_lookup(cache, 'crossref', items, works,
+                                 max_workers=max_workers, timeout=timeout)
+        remaining = max(timeout - (time.monotonic() - start), 0)
+        citing, _ = cached_lookup(cache, 'citations', items, citations,
+                                  max_workers=max_workers, timeout=remaining)
+        return {
+            doi: ([(doi, other) for other in cited[key].get('references', [])] +
+                  [(other, doi) for other in citing[key]])
+            for key, doi in items.items() if key in cited and key in citing
+        }
+    return fetch_level
+
+
+def node_metadata(graph: CitationGraph,
+                  cache: SearchCache,
+                  timeout: float = None,
+                  works=_crossref_work,
+                  max_workers: int = cs.CITATION_WORKERS) -> dict:
+    """Metadata of the papers the expansion added to the seeds.
+
+    Papers of the expanded levels are already cached by
+    cached_fetch_level, only the last level is fetched.
+
+    Args:
+        graph (CitationGraph): expanded graph.
+        cache (SearchCache): shared enrichment cache.
+        timeout (float, optional): seconds to wait for the fetches.
+            Defaults to None.
+        works (callable, optional): payload of a DOI. Defaults to CrossRef.
+        max_workers (int, optional): concurrent requests.
+            Defaults to cs.CITATION_WORKERS.
+
+    Returns:
+        dict: payload by DOI, papers that could not be fetched are missing.
+    """
+    items = {content_key(doi): doi for doi, depth in graph.depth.items() if depth > 0}
+    payloads, _ = cached_lookup(cache, 'crossref', items, works,
+                                max_workers=max_workers, timeout=timeout)
+    return {items[key]: payload for key, payload in payloads.items()}
@@ -0,0 +1,191 @@
+"""Headless batch search from the console."""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import re
+import sys
+import utils.consts as cs
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from utils.query import canonical_query
+
+SEARCH_OPTIONS = ('databases', 'since', 'until', 'limit', 'publication_types',
+                  'similarity_threshold', 'enrich', 'incremental', 'force_refresh')
+CITATION_OPTIONS = ('cross_reference_search', 'citation_depth', 'citation_max_nodes')
+
+
+def load_queries(path) -> list:
+    """Loads the queries of a YAML or JSON batch file.
+
+    The file either contains a list of queries or a mapping with the
+    optional keys ``defaults`` and ``queries``. A query is a search
+    string or a mapping with ``query`` and optionally ``name`` and any
+    search option, which overrides the defaults.
+
+    Args:
+        path (str or Path): batch file.
+
+    Raises:
+        ValueError: if a query is invalid or the names of two queries
+            map to the same output directory.
+
+    Returns:
+        list: one dict of search arguments per query.
+    """
+    path = Path(path)
+    text = path.read_text(encoding='utf-8')
+    if path.suffix.lower() in ('.yml', '.yaml'):
+        import yaml
+        config = yaml.safe_load(text)
+    else:
+        config = json.loads(text)
+
+    if isinstance(config, list):
+        config = {'queries': config}
+    defaults = {
+        'databases': cs.AVAILABLE_DATABASES,
+        'since': None,
+        'until': datetime.date.today(),
+        'limit': cs.RESULTS_DEFAULT_SLIDER,
+        'publication_types': cs.DEFAULT_PUBTYPES,
+        'similarity_threshold': 0.95,
+    }
+    defaults.update(config.get('defaults', {}))
+
+    queries, directories = [], {}
+    for i, entry in enumerate(config.get('queries', [])):
+        if isinstance(entry, str):
+            entry = {'query': entry}
+        unknown = set(entry) - set(SEARCH_OPTIONS) - set(CITATION_OPTIONS) - {'query', 'name'}
+        if 'query' not in entry or unknown:
+            raise ValueError(f"Invalid query {i + 1} in {path}: {entry}")
+        params = dict(defaults, **entry)
+        params.setdefault('name', f"query_{i + 1}")
+        # the exports of each query are written to a directory named after it
+        directory = slugify(str(params['name'])).lower()
+        if directory in directories:
+            raise ValueError(f"Queries {directories[directory]} and {params['name']} in {path} "
+                             "would write to the same output directory")
+        directories[directory] = params['name']
+        try:
+            params['query'] = canonical_query(params['query'])
+        except ValueError as error:
+            raise ValueError(f"Invalid query {params['name']} in {path}: {error}") from error
+        for key in ('since', 'until'):
+            if isinstance(params[key], str):
+                params[key] = datetime.date.fromisoformat(params[key])
+        queries.append(params)
+    return queries
+
+
+def slugify(name: str) -> str:
+    """Converts a query name into a directory name.
+
+    Args:
+        name (str): query name.
+
+    Returns:
+        str: file system friendly name.
+    """
+    return re.sub(r'[^0-9A-Za-z_-]+', '_', name).strip('_') or 'query'
+
+
+def run_query(params: dict, output, scopus_api_token: str = None,
+              ieee_api_token: str = None) -> tuple:
+    """Runs a single query and writes its exports.
+
+    Args:
+        params (dict): query as returned by load_queries.
+        output (str or Path): output directory.
+        scopus_api_token (str, optional): Scopus API key. Defaults to None.
+        ieee_api_token (str, optional): IEEE API key. Defaults to None.
+
+    Returns:
+        tuple: number of papers, failed databases and dropped papers
+            (list of messages) and written paths.
+    """
+    from utils.exports import write_exports, export_citations
+    from utils.pipeline import run_search, expand_search_citations, new_run_profile
+    from utils.pipeline import snowball_search, snowballed_papers
+
+    kwargs = {key: params[key] for key in SEARCH_OPTIONS if key in params}
+    profile = new_run_profile()
+    search, results, dropped = run_search(params['query'],
+                                          scopus_api_token=scopus_api_token,
+                                          ieee_api_token=ieee_api_token,
+                                          profile=profile,
+                                          **kwargs)
+    failed = [f"{r.database}: {r.error}" for r in results if r.error is not None]
+    if dropped:
+        failed.append(f"{dropped} papers dropped while merging the databases")
+    directory = Path(output) / slugify(params['name'])
+    graph = None
+    if params.get('cross_reference_search'):
+        graph = expand_search_citations(
+            search,
+            depth=params.get('citation_depth', cs.CITATION_DEPTH),
+            max_nodes=params.get('citation_max_nodes', cs.CITATION_MAX_NODES),
+            profile=profile)
+        search = snowball_search(search, snowballed_papers(search, graph, profile=profile))
+    with profile.span('export', papers_in=len(search.papers)) as span:
+        paths = write_exports(search, directory)
+        span['bytes'] = sum(path.stat().st_size for path in paths)
+    if graph is not None:
+        paths.append(export_citations(graph, directory))
+    paths.append(profile.write_jsonl(directory / cs.EXPORT_PROFILE, append=False))
+    return len(search.papers), failed, paths
+
+
+def main(argv: list = None) -> int:
+    """Entry point of the set-you-free command.
+
+    Args:
+        argv (list, optional): command line arguments. Defaults to None.
+
+    Returns:
+        int: exit code.
+    """
+    parser = argparse.ArgumentParser(
+        prog='set-you-free',
+        description="Run a batch of literature searches and export the results.")
+    parser.add_argument('queries', help="YAML or JSON file with the queries")
+    parser.add_argument('-o', '--output', default='results',
+                        help="output directory (default: %(default)s)")
+    parser.add_argument('-w', '--workers', type=int, default=cs.CLI_WORKERS,
+                        help="queries run concurrently (default: %(default)s)")
+    parser.add_argument('--scopus-api-key',
+                        default=os.getenv('FINDPAPERS_SCOPUS_API_TOKEN'))
+    parser.add_argument('--ieee-api-key',
+                        default=os.getenv('FINDPAPERS_IEEE_API_TOKEN'))
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    queries = load_queries(args.queries)
+    n_failed = 0
+    with ThreadPoolExecutor(max_workers=max(args.workers, 1)) as executor:
+        futures = {
+            executor.submit(run_query, params, args.output,
+                            args.scopus_api_key, args.ieee_api_key): params['name']
+            for params in queries
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                n_papers, failed, paths = future.result()
+            except Exception as error:
+                n_failed += 1
+                print(f"{name}: failed ({error})", file=sys.stderr)
+                continue
+            print(f"{name}: {n_papers} papers -> {paths[0].parent}")
+            for message in failed:
+                print(f"{name}: {message}", file=sys.stderr)
+    return 1 if n_failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -26,7 +26,8 @@ JOIN_TYPES = [
 ]
 SEARCH_STRING_TYPE = [
     "Insert search string directly",
-    "Build search string"
+    "Build search string",
+    "Compare search string variants"
 ]
 AVAILABLE_PUBTYPES = ['journal', 'preprint', 'conference', 'book']
 DEFAULT_PUBTYPES = ['journal', 'preprint']
@@ -36,8 +37,119 @@ HELP_ENRICH = (
 )
 HELP_CROSS_REF = (
     "The cross-reference option uses the reference list and the citations "
-    "of the found publications to extend the search results."
+    "of the found publications to build a citation graph, bounded by depth, "
+    "number of papers and time."
 )
 HELP_SEARCH_STRING = (
     "[term a] OR ([term b] AND ([term c] OR [term d]"
-)
\ No newline at end of file
+)
+CACHE_PATH = ".cache/set_you_free.sqlite"
+RESULT_STORE_PATH = ".cache/results.sqlite"
+RESULT_DIR = ".cache/results"
+RESULT_TTL = 7 * 24 * 60 * 60
+RESULT_MAX_ENTRIES = 64
+RESULT_MEMORY_ENTRIES = 8
+RESULT_LEASE_SECONDS = 15 * 60
+ENRICHMENT_CACHE_PATH = ".cache/enrichment.sqlite"
+ENRICHMENT_CACHE_TTL = 30 * 24 * 60 * 60
+ENRICHMENT_MISSING_TTL = 24 * 60 * 60
+ENRICHMENT_CACHE_MAX_ENTRIES = 200000
+ENRICHMENT_WORKERS = 4
+ENRICHMENT_CHECKPOINT = 50
+CITATION_DEPTH = 1
+CITATION_MAX_DEPTH = 3
+CITATION_MAX_NODES = 500
+CITATION_TIME_BUDGET = 120
+CITATION_WORKERS = 8
+EXPORT_CITATIONS = "set_you_free_citations.csv"
+EXPORT_PROFILE = "set_you_free_profile.jsonl"
+PROFILE_PATH = ".cache/run_profiles.jsonl"
+IMPORT_TIME_BUDGET = 0.25
+CACHE_TTL = 7 * 24 * 60 * 60
+CACHE_MAX_ENTRIES = 256
+DATABASE_TIMEOUT = 10 * 60
+JOB_WORKERS = 2
+CLI_WORKERS = 4
+EXPORT_CHUNK_SIZE = 500
+EXPORT_JSON = "set_you_free_results.json"
+EXPORT_JSONL = "set_you_free_results.jsonl"
+EXPORT_RIS = "set_you_free_cadima.ris"
+EXPORT_RAYYAN = "set_you_free_rayyan.csv"
+DEDUP_NUM_PERM = 64
+DEDUP_BANDS = 16
+DEDUP_MAX_BUCKET = 50
+DEDUP_CHUNK_SHINGLES = 2 ** 16
+DEDUP_MIN_SHINGLE_SIMILARITY = 0.2
+REVIEW_PAGE_SIZES = [25, 50, 100, 250]
+SCREENING_SHARDS = 8
+SCREENING_REVIEWERS_PER_PAPER = 2
+PRIORITY_MAX_FEATURES = 2 ** 15
+PRIORITY_MIN_DF = 2
+PRIORITY_L2 = 1e-3
+PRIORITY_EPOCHS = 50
+PRIORITY_RECALL_WINDOW = 100
+PRIORITY_TARGET_RECALL = 0.95
+UPSET_MAX_BARS = 30
+HTTP_HOSTS = {
+    "dl.acm.org": "acm",
+    "export.arxiv.org": "arxiv",
+    "api.biorxiv.org": "rxiv",
+    "www.biorxiv.org": "rxiv",
+    "www.medrxiv.org": "rxiv",
+    "ieeexploreapi.ieee.org": "ieee",
+    "eutils.ncbi.nlm.nih.gov": "pubmed",
+    "api.crossref.org": "crossref",
+    "api.elsevier.com": "scopus",
+    "opencitations.net": "opencitations",
+    "www.scopus.com": "scopus"
+}
+HTTP_RATE_LIMITS = {  # requests per second and burst size
+    "acm": (0.5, 2),
+    "arxiv": (1 / 3, 1),
+    "crossref": (5.0, 5),
+    "rxiv": (1.0, 2),
+    "ieee": (10.0, 10),
+    "opencitations": (3.0, 3),
+    "pubmed": (3.0, 3),
+    "scopus": (9.0, 9)
+}
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+HTTP_MAX_RETRIES = 4
+HTTP_BACKOFF = 1.0
+HTTP_MAX_BACKOFF = 60.0
+HTTP_RETRY_RATIO = 0.2
+HTTP_MIN_RETRIES = 10
+HTTP_POOL_SIZE = 10
+HELP_FORCE_REFRESH = (
+    "Ignore cached results and fetch the papers again from the databases."
+)
+HELP_INCREMENTAL = (
+    "Only fetch papers published since the last completed search with the "
+    "same search string and start date, and merge them into its results."
+)
+HELP_BACKGROUND = (
+    "Run the search as a background job. The page stays responsive and the "
+    "results can be loaded once the job is finished."
+)
+HELP_JSONL = (
+    "Export the papers as compact JSON Lines, one paper per line."
+)
+HELP_COMPRESS = (
+    "Compress the downloads with gzip."
+)
+HELP_REVIEWER = (
+    "Screen as a member of a team. Papers are split into shards that are "
+    "assigned to the reviewers, every decision is logged for the whole team."
+)
+HELP_FINAL_DECISION = (
+    "Resolve the decisions of all reviewers of this paper, e.g. as third reviewer."
+)
+HELP_PRIORITIZE = (
+    "Show the unreviewed papers most likely to be included first. The order "
+    "is learned from your decisions and updated after each one."
+)
+HELP_QUERY_SET = (
+    "One search string per line. The largest clauses the variants share are "
+    "fetched once and the papers of every variant are computed from the papers "
+    "of its clauses."
+)
@@ -0,0 +1,253 @@
+"""Blocked near-duplicate detection of papers."""
+
+import re
+
+import edlib
+import numpy as np
+import utils.consts as cs
+
+_SHIFT = np.uint64(32)
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_title(title: str) -> str:
+    """Normalizes a title for blocking.
+
+    Args:
+        title (str): paper title.
+
+    Returns:
+        str: lower case title without punctuation, at least three characters.
+    """
+    return _NON_ALNUM.sub(' ', (title or '').lower()).strip().ljust(3)
+
+
+def minhash_signatures(titles: list,
+                       num_perm: int = cs.DEDUP_NUM_PERM,
+                       chunk_shingles: int = cs.DEDUP_CHUNK_SHINGLES,
+                       seed: int = 0) -> np.ndarray:
+    """MinHash signatures of the character trigrams of normalized titles.
+
+    Titles are processed in chunks so that memory is bounded by
+    chunk_shingles * num_perm.
+
+    Args:
+        titles (list): normalized titles.
+        num_perm (int, optional): number of permutations.
+            Defaults to cs.DEDUP_NUM_PERM.
+        chunk_shingles (int, optional): trigrams hashed at once.
+            Defaults to cs.DEDUP_CHUNK_SHINGLES.
+        seed (int, optional): seed of the permutations. Defaults to 0.
+
+    Returns:
+        np.ndarray: signatures of shape (len(titles), num_perm).
+    """
+    # multiply-shift hashing, one odd multiplier per permutation
+    rng = np.random.RandomState(seed)
+    a = rng.randint(0, 2 ** 63, size=(num_perm, 1), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.randint(0, 2 ** 63, size=(num_perm, 1), dtype=np.uint64)
+    signatures = np.empty((len(titles), num_perm), dtype=np.uint32)
+
+    start = 0
+    while start < len(titles):
+        # select as many titles as fit into the chunk (at least one)
+        stop, n_shingles = start, 0
+        while stop < len(titles) and (stop == start or
+                                      n_shingles + len(titles[stop]) <= chunk_shingles):
+            n_shingles += len(titles[stop])
+            stop += 1
+
+        encoded = [title.encode('utf-8') for title in titles[start:stop]]
+        lengths = np.array([len(e) for e in encoded], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        n_grams = lengths - 2
+        gram_offsets = np.concatenate(([0], np.cumsum(n_grams)[:-1]))
+        buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.uint64)
+
+        # position of each trigram within the concatenated titles
+        positions = (np.repeat(offsets, n_grams) +
+                     np.arange(n_grams.sum()) - np.repeat(gram_offsets, n_grams))
+        shingles = (buffer[positions] << np.uint64(16) |
+                    buffer[positions + 1] << np.uint64(8) |
+                    buffer[positions + 2])
+        hashed = ((a * shingles[np.newaxis, :] + b) >> _SHIFT).astype(np.uint32)
+        signatures[start:stop] = np.minimum.reduceat(hashed, gram_offsets, axis=1).T
+        start = stop
+    return signatures
+
+
+def _candidate_pairs(signatures: np.ndarray,
+                     years: np.ndarray,
+                     bands: int,
+                     max_bucket: int) -> np.ndarray:
+    """Pairs sharing at least one LSH band within the same year.
+
+    Args:
+        signatures (np.ndarray): MinHash signatures.
+        years (np.ndarray): publication years.
+        bands (int): number of LSH bands.
+        max_bucket (int): buckets larger than this are only compared
+            against their first member.
+
+    Returns:
+        np.ndarray: unique (i, j) pairs with i < j.
+    """
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    pairs = []
+    for band in range(bands):
+        keys = years.astype(np.uint64)
+        for col in range(band * rows, (band + 1) * rows):
+            keys = keys * np.uint64(1000003) ^ signatures[:, col].astype(np.uint64)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        sizes = np.diff(np.r_[starts, n])
+        for start, size in zip(starts[sizes > 1].tolist(), sizes[sizes > 1].tolist()):
+            group = order[start:start + size]
+            if len(group) > max_bucket:
+                pairs.append(np.column_stack((np.full(len(group) - 1, group[0]), group[1:])))
+            else:
+                i, j = np.triu_indices(len(group), k=1)
+                pairs.append(np.column_stack((group[i], group[j])))
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    return _unique_pairs(np.concatenate(pairs), n)
+
+
+def _unique_pairs(pairs: np.ndarray, n: int) -> np.ndarray:
+    """Sorts and deduplicates index pairs.
+
+    Args:
+        pairs (np.ndarray): (i, j) pairs.
+        n (int): number of items.
+
+    Returns:
+        np.ndarray: unique pairs with i < j in lexical order.
+    """
+    pairs = np.sort(pairs.astype(np.int64), axis=1)
+    codes = np.unique(pairs[:, 0] * n + pairs[:, 1])
+    return np.column_stack((codes // n, codes % n))
+
+
+def find_duplicate_pairs(titles: list,
+                         years: list,
+                         dois: list,
+                         similarity_threshold: float = 0.95,
+                         num_perm: int = cs.DEDUP_NUM_PERM,
+                         bands: int = cs.DEDUP_BANDS,
+                         max_bucket: int = cs.DEDUP_MAX_BUCKET) -> list:
+    """Finds pairs of papers that describe the same publication.
+
+    Candidates are blocked by DOI and by MinHash LSH buckets of the
+    normalized title within the same year. Only candidates are scored,
+    using the rule of findpapers: same year, no conflicting DOIs and a
+    title edit distance of at most (1 - similarity_threshold) of the
+    longer title, or an equal DOI.
+
+    Args:
+        titles (list): paper titles.
+        years (list): publication years, None if unknown.
+        dois (list): paper DOIs, None if unknown.
+        similarity_threshold (float, optional): duplication threshold.
+            Defaults to 0.95.
+        num_perm (int, optional): MinHash permutations.
+            Defaults to cs.DEDUP_NUM_PERM.
+        bands (int, optional): LSH bands. Defaults to cs.DEDUP_BANDS.
+        max_bucket (int, optional): maximum bucket size compared pairwise.
+            Defaults to cs.DEDUP_MAX_BUCKET.
+
+    Returns:
+        list: (i, j) index pairs of duplicates with i < j.
+    """
+    n = len(titles)
+    if n < 2:
+        return []
+    years = np.array([-1 if y is None else y for y in years], dtype=np.int64)
+    doi_ids = {}
+    doi_codes = np.array([-1 if d is None else doi_ids.setdefault(d.lower(), len(doi_ids))
+                          for d in dois], dtype=np.int64)
+    lowered = [(title or '').lower() for title in titles]
+
+    signatures = minhash_signatures([normalize_title(t) for t in lowered], num_perm)
+    candidates = [_candidate_pairs(signatures, years, bands, max_bucket)]
+
+    # DOI blocking
+    with_doi = np.flatnonzero(doi_codes >= 0)
+    order = with_doi[np.argsort(doi_codes[with_doi], kind='stable')]
+    same_doi = doi_codes[order[1:]] == doi_codes[order[:-1]]
+    candidates.append(np.column_stack((order[:-1][same_doi], order[1:][same_doi])))
+
+    pairs = _unique_pairs(np.concatenate(candidates), n)
+    if len(pairs) == 0:
+        return []
+    i, j = pairs[:, 0], pairs[:, 1]
+
+    # vectorized filters
+    lengths = np.array([len(t) for t in lowered], dtype=np.int64)
+    max_length = np.maximum(lengths[i], lengths[j])
+    max_edit_distance = (max_length * (1 - similarity_threshold)).astype(np.int64)
+    both_doi = (doi_codes[i] >= 0) & (doi_codes[j] >= 0)
+    equal_doi = both_doi & (doi_codes[i] == doi_codes[j])
+    shingle_similarity = (signatures[i] == signatures[j]).mean(axis=1)
+    valid = (years[i] >= 0) & (years[i] == years[j]) & ~(both_doi & ~equal_doi)
+    possible = (valid & ~equal_doi &
+                (np.abs(lengths[i] - lengths[j]) <= max_edit_distance) &
+                (shingle_similarity >= cs.DEDUP_MIN_SHINGLE_SIMILARITY))
+
+    duplicates = [(a, b) for a, b in pairs[valid & equal_doi].tolist()]
+    for (a, b), k in zip(pairs[possible].tolist(), max_edit_distance[possible].tolist()):
+        distance = edlib.align(lowered[a], lowered[b], k=k)['editDistance']
+        if distance != -1 and distance <= k:
+            duplicates.append((a, b))
+    return sorted(duplicates)
+
+
+def merge_duplicate_papers(search, similarity_threshold: float = 0.95) -> int:
+    """Merges near-duplicate papers of a search in place.
+
+    Replacement of findpapers.models.search.Search.merge_duplications
+    that avoids comparing all pairs of papers.
+
+    Args:
+        search (findpapers.models.search): search results.
+        similarity_threshold (float, optional): duplication threshold.
+            Defaults to 0.95.
+
+    Returns:
+        int: number of removed papers.
+    """
+    papers = [search.paper_by_key[key] for key in sorted(search.paper_by_key)]
+    pairs = find_duplicate_pairs(
+        [paper.title for paper in papers],
+        [None if paper.publication_date is None else paper.publication_date.year
+         for paper in papers],
+        [paper.doi for paper in papers],
+        similarity_threshold)
+
+    # union find, the first paper of each group is kept
+    parent = list(range(len(papers)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for a, b in pairs:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    removed = 0
+    for i, paper in enumerate(papers):
+        root = find(i)
+        if root != i:
+            kept = papers[root]
+            kept.enrich(paper)
+            for database in paper.databases:
+                kept.add_database(database)
+                search.papers_by_database.setdefault(database, set()).add(kept)
+            search.remove_paper(paper)
+            removed += 1
+    return removed
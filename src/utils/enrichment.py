@@ -0,0 +1,282 @@
+"""Shared cache of paper metadata and citation edges."""
+
+import hashlib
+import logging
+import re
+import utils.consts as cs
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from utils.cache import SearchCache
+from utils.dedup import normalize_title
+
+CROSSREF_URL = "https://api.crossref.org/works"
+BIBLIOGRAPHIC_FIELDS = ('title', 'doi', 'abstract', 'authors', 'keywords', 'publication')
+_TAGS = re.compile(r'<[^>]+>')
+
+
+def content_key(doi: str = None, title: str = None) -> str:
+    """Content address of a paper, by DOI or by normalized title.
+
+    Args:
+        doi (str, optional): paper DOI. Defaults to None.
+        title (str, optional): paper title. Defaults to None.
+
+    Returns:
+        str: hex digest identifying the paper, None without DOI and title.
+    """
+    if doi:
+        content = 'doi:' + doi.strip().lower()
+    elif title and title.strip():
+        content = 'title:' + normalize_title(title).strip()
+    else:
+        return None
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def cached_lookup(cache: SearchCache, kind: str, items: dict, fetch,
+                  max_workers: int = cs.ENRICHMENT_WORKERS, timeout: float = None,
+                  checkpoint: int = cs.ENRICHMENT_CHECKPOINT,
+                  missing_ttl: float = None) -> tuple:
+    """Looks up payloads in the cache and fetches the missing ones.
+
+    Fetched payloads are stored, including empty ones for papers that
+    are unknown to the provider. Failed fetches (None) are not stored.
+    Payloads are stored in batches as they arrive, so an interrupted
+    lookup keeps the payloads fetched so far.
+
+    Args:
+        cache (SearchCache): shared cache.
+        kind (str): payload kind, e.g. 'paper' or 'crossref'.
+        items (dict): argument of fetch by content key.
+        fetch (callable): returns the JSON serializable payload of an
+            item, None if it failed.
+        max_workers (int, optional): concurrent fetches.
+            Defaults to cs.ENRICHMENT_WORKERS.
+        timeout (float, optional): seconds to wait for the fetches, the
+            unfinished ones count as failed. Defaults to None.
+        checkpoint (int, optional): payloads stored at once.
+            Defaults to cs.ENRICHMENT_CHECKPOINT.
+        missing_ttl (float, optional): shorter time to live of the empty
+            payloads, so unknown papers are looked up again sooner.
+            Defaults to the time to live of the cache.
+
+    Returns:
+        tuple: payloads by content key and the set of fetched keys.
+    """
+    cached = cache.get_many([f'{kind}:{key}' for key in items])
+    payloads = {key: cached[f'{kind}:{key}'] for key in items if f'{kind}:{key}' in cached}
+    missing = [key for key in items if key not in payloads]
+    fetched = {}
+    if missing:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        futures = {executor.submit(fetch, items[key]): key for key in missing}
+        batch, empty = {}, {}
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                if future.exception() is None and future.result() is not None:
+                    key = futures[future]
+                    target = batch if future.result() or missing_ttl is None else empty
+                    fetched[key] = target[f'{kind}:{key}'] = future.result()
+                if len(batch) + len(empty) >= checkpoint:
+                    cache.put_many(batch)
+                    cache.put_many(empty, ttl=missing_ttl)
+                    batch, empty = {}, {}
+        except TimeoutError:
+            pass
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+            if batch:
+                cache.put_many(batch)
+            if empty:
+                cache.put_many(empty, ttl=missing_ttl)
+        payloads.update(fetched)
+    return payloads, set(fetched)
+
+
+def _crossref_payload(message: dict) -> dict:
+    """Converts a CrossRef work into an enrichment payload."""
+    container = (message.get('container-title') or [None])[0]
+    category = {'journal-article': 'Journal',
+                'proceedings-article': 'Conference Proceedings',
+                'book-chapter': 'Book',
+                'book': 'Book'}.get(message.get('type'))
+    authors = [' '.join(filter(None, [author.get('given'), author.get('family')]))
+               for author in message.get('author', [])]
+    # missing month and day count as the first
+    parts = ((message.get('issued') or {}).get('date-parts') or [[None]])[0]
+    date = None if not parts or parts[0] is None else \
+        '{:04d}-{:02d}-{:02d}'.format(*(list(parts) + [1, 1])[:3])
+    return {
+        'doi': message.get('DOI'),
+        'title': (message.get('title') or [None])[0],
+        'date': date,
+        'abstract': _TAGS.sub('', message.get('abstract', '')).strip() or None,
+        'authors': [author for author in authors if author],
+        'keywords': message.get('subject', []),
+        'citations': message.get('is-referenced-by-count'),
+        'url': message.get('URL'),
+        'publication': None if container is None else {
+            'title': container,
+            'issn': (message.get('ISSN') or [None])[0],
+            'isbn': (message.get('ISBN') or [None])[0],
+            'publisher': message.get('publisher'),
+            'category': category,
+        },
+        'references': sorted({reference['DOI'].lower()
+                              for reference in message.get('reference', [])
+                              if reference.get('DOI')}),
+    }
+
+
+def crossref_metadata(paper: tuple, session=None) -> dict:
+    """Fetches the metadata of a paper from CrossRef.
+
+    Args:
+        paper (tuple): DOI and title of the paper.
+        session (requests.Session, optional): HTTP session. Defaults to
+            the findpapers session.
+
+    Returns:
+        dict: enrichment payload, empty if the paper is unknown and None
+            if the request failed.
+    """
+    if session is None:
+        from findpapers.utils.requests_util import DefaultSession
+        session = DefaultSession()
+    doi, title = paper
+    try:
+        if doi:
+            response = session.get(f'{CROSSREF_URL}/{doi}')
+            if response.status_code == 404:
+                return {}
+            response.raise_for_status()
+            return _crossref_payload(response.json()['message'])
+        response = session.get(CROSSREF_URL, params={'query.bibliographic': title, 'rows': 1})
+        response.raise_for_status()
+        items = response.json()['message'].get('items', [])
+        # only accept the best match if it is the same title
+        if items and normalize_title((items[0].get('title') or [''])[0]) == normalize_title(title):
+            return _crossref_payload(items[0])
+        return {}
+    except Exception:
+        logging.debug("CrossRef lookup of %s failed", doi or title, exc_info=True)
+        return None
+
+
+def crossref_paper(payload: dict, databases: set, comments: str = None):
+    """Paper of a CrossRef payload, e.g. one found by citation snowballing.
+
+    Args:
+        payload (dict): enrichment payload of CrossRef.
+        databases (set): findpapers databases to list the paper under.
+        comments (str, optional): comment of the paper. Defaults to None.
+
+    Returns:
+        findpapers.models.paper: the paper, None without title or date.
+    """
+    import datetime
+    import findpapers as fp
+
+    if not payload or not payload.get('title') or not payload.get('date'):
+        return None
+    publication = payload.get('publication')
+    return fp.models.paper.Paper(
+        payload['title'], payload.get('abstract'), payload.get('authors') or [],
+        None if publication is None else fp.models.publication.Publication(**publication),
+        datetime.date.fromisoformat(payload['date']),
+        {payload['url']} if payload.get('url') else set(),
+        payload.get('doi'), payload.get('citations'), set(payload.get('keywords') or []),
+        comments=comments, databases=set(databases))
+
+
+def findpapers_metadata(paper, scopus_api_token: str = None) -> dict:
+    """Bibliographic fields of a paper found by the enrichment of findpapers.
+
+    The fields are read from the page of the paper, publications are
+    completed from Scopus with an API key and flagged if potentially
+    predatory. Only fields of the paper itself are kept, not the ones
+    of a search such as its databases, so the payload can be shared by
+    searches of other databases.
+
+    Args:
+        paper (findpapers.models.paper): paper to enrich.
+        scopus_api_token (str, optional): Scopus API key. Defaults to None.
+
+    Returns:
+        dict: enriched fields, see BIBLIOGRAPHIC_FIELDS, empty if
+            nothing was found.
+    """
+    import findpapers as fp
+    from findpapers.tools import search_runner_tool
+
+    original = fp.models.paper.Paper.to_dict(paper)
+    enriched = fp.models.paper.Paper.from_dict(original)
+    search = fp.models.search.Search('enrich')
+    search.add_paper(enriched)
+    search_runner_tool._enrich(search, scopus_api_token)
+    search_runner_tool._flag_potentially_predatory_publications(search)
+    payload = {field: value for field, value in fp.models.paper.Paper.to_dict(enriched).items()
+               if field in BIBLIOGRAPHIC_FIELDS}
+    # findpapers does not tell failed requests apart from unknown papers
+    unchanged = all(payload[field] == original[field] for field in BIBLIOGRAPHIC_FIELDS)
+    return {} if unchanged else payload
+
+
+def apply_metadata(paper, payload: dict):
+    """Takes over the bibliographic fields findpapers found for a paper.
+
+    As in the enrichment of findpapers, the page metadata replaces
+    title, DOI, abstract, authors and keywords, the publication is
+    merged. Fields of the search, e.g. the databases, are kept.
+
+    Args:
+        paper (findpapers.models.paper): paper to enrich.
+        payload (dict): enriched fields, see findpapers_metadata.
+    """
+    import findpapers as fp
+
+    for field in ('title', 'doi', 'abstract', 'authors'):
+        if payload.get(field):
+            setattr(paper, field, payload[field])
+    if payload.get('keywords'):
+        paper.keywords = set(payload['keywords'])
+    if payload.get('publication'):
+        publication = fp.models.publication.Publication.from_dict(payload['publication'])
+        if paper.publication is None:
+            paper.publication = publication
+        else:
+            paper.publication.enrich(publication)
+
+
+def enrich_search(search, cache: SearchCache, scopus_api_token: str = None,
+                  fetch=findpapers_metadata) -> int:
+    """Enriches all papers of a search, cached papers are not fetched again.
+
+    Args:
+        search (findpapers.models.search): search results.
+        cache (SearchCache): shared enrichment cache.
+        scopus_api_token (str, optional): Scopus API key. Defaults to None.
+        fetch (callable, optional): returns the enriched fields of a
+            paper and the API key. Defaults to findpapers_metadata.
+
+    Returns:
+        int: number of papers served from the cache.
+    """
+    papers = {}
+    for paper in search.papers:
+        key = content_key(paper.doi, paper.title)
+        if key is not None:
+            papers.setdefault(key, []).append(paper)
+    items = {key: group[0] for key, group in papers.items()}
+    # cached payloads depend on the Scopus data
+    kind = 'paper' if scopus_api_token is None else 'paper+scopus'
+    payloads, fetched = cached_lookup(cache, kind, items,
+                                      lambda paper: fetch(paper, scopus_api_token),
+                                      missing_ttl=cs.ENRICHMENT_MISSING_TTL)
+
+    for key, payload in payloads.items():
+        for paper in papers[key]:
+            apply_metadata(paper, payload)
+    return len(payloads) - len(fetched)
@@ -0,0 +1,251 @@
+"""Streaming export of search results."""
+
+import gzip
+import json
+import math
+import pandas as pd
+import utils.consts as cs
+
+from pathlib import Path
+
+
+def _sorted_papers(search) -> list:
+    """Papers ordered by publication date, newest first, as in to_dict."""
+    return sorted(search.papers, key=lambda paper: paper.publication_date, reverse=True)
+
+
+def _chunks(search, chunk_size: int):
+    """Splits the papers of a search into small searches.
+
+    Args:
+        search (findpapers.models.search): search results.
+        chunk_size (int): number of papers per chunk.
+
+    Yields:
+        findpapers.models.search: search holding a chunk of papers.
+    """
+    import findpapers as fp
+
+    papers = _sorted_papers(search)
+    for start in range(0, len(papers), chunk_size):
+        yield fp.models.search.Search(search.query,
+                                      limit=search.limit,
+                                      limit_per_database=search.limit_per_database,
+                                      processed_at=search.processed_at,
+                                      papers=papers[start:start + chunk_size])
+
+
+def _search_meta(search) -> dict:
+    """Search dict of findpapers without the papers.
+
+    Args:
+        search (findpapers.models.search): search results.
+
+    Returns:
+        dict: search metadata.
+    """
+    import findpapers as fp
+
+    empty = fp.models.search.Search(search.query, search.since, search.until,
+                                    search.limit, search.limit_per_database,
+                                    search.processed_at, search.databases,
+                                    search.publication_types)
+    meta = fp.models.search.Search.to_dict(empty)
+    del meta['papers']
+    meta['number_of_papers'] = len(search.papers)
+    meta['number_of_papers_by_database'] = {
+        database: len(papers) for database, papers in search.papers_by_database.items()
+    }
+    return meta
+
+
+def iter_json(search):
+    """Encodes search results as JSON, one paper at a time.
+
+    Args:
+        search (findpapers.models.search): search results.
+
+    Yields:
+        str: parts of the JSON document.
+    """
+    import findpapers as fp
+
+    meta = _search_meta(search)
+    yield '{'
+    for n, key in enumerate(sorted(list(meta) + ['papers'])):
+        yield f"{', ' if n else ''}{json.dumps(key)}: "
+        if key != 'papers':
+            yield json.dumps(meta[key], sort_keys=True)
+            continue
+        yield '['
+        separator = '\n'
+        for paper in _sorted_papers(search):
+            yield separator + json.dumps(fp.models.paper.Paper.to_dict(paper), sort_keys=True)
+            separator = ',\n'
+        yield '\n]'
+    yield '}\n'
+
+
+def iter_jsonl(search):
+    """Encodes the papers as JSON Lines.
+
+    Args:
+        search (findpapers.models.search): search results.
+
+    Yields:
+        str: one line per paper.
+    """
+    import findpapers as fp
+
+    for paper in _sorted_papers(search):
+        yield json.dumps(fp.models.paper.Paper.to_dict(paper), sort_keys=True) + '\n'
+
+
+def _offset_ids(df, column: str, offset: int):
+    """Continues numeric ids of a chunk after the previous chunks."""
+    if column in df and df[column].dtype.kind in 'iu':
+        df[column] += offset
+    return df
+
+
+def iter_frames(search, chunk_size: int = cs.EXPORT_CHUNK_SIZE):
+    """RIS (CADIMA) and Rayyan tables of the search, chunk by chunk.
+
+    Args:
+        search (findpapers.models.search): search results.
+        chunk_size (int, optional): papers converted at once.
+            Defaults to cs.EXPORT_CHUNK_SIZE.
+
+    Yields:
+        tuple: RIS and Rayyan data frame of a chunk.
+    """
+    import findpapers as fp
+
+    offset = 0
+    for chunk in _chunks(search, chunk_size):
+        _, ris_df = fp.RisExport(chunk).generate_ris()
+        _, rayyan_df = fp.RayyanExport(chunk).generate_rayyan_csv()
+        yield _offset_ids(ris_df, 'id', offset), _offset_ids(rayyan_df, 'key', offset)
+        offset += len(chunk.papers)
+
+
+def _ris_records(ris_df) -> list:
+    """Converts a RIS data frame to rispy entries without missing values."""
+    return [
+        {key: value for key, value in record.items()
+         if not (isinstance(value, float) and math.isnan(value))}
+        for record in ris_df.to_dict('records')
+    ]
+
+
+def _open(path: Path, compress: bool):
+    if compress:
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def export_search(search,
+                  directory,
+                  compress: bool = False,
+                  jsonl: bool = False,
+                  chunk_size: int = cs.EXPORT_CHUNK_SIZE,
+                  on_chunk=None) -> dict:
+    """Writes the JSON, RIS (CADIMA) and CSV (Rayyan) exports incrementally.
+
+    Only chunk_size papers are converted at once, so memory does not
+    grow with the number of papers.
+
+    Args:
+        search (findpapers.models.search): search results.
+        directory (str or Path): output directory.
+        compress (bool, optional): gzip the files. Defaults to False.
+        jsonl (bool, optional): write compact JSON Lines instead of the
+            JSON document. Defaults to False.
+        chunk_size (int, optional): papers converted at once.
+            Defaults to cs.EXPORT_CHUNK_SIZE.
+        on_chunk (callable, optional): called with the RIS and Rayyan
+            data frame of each chunk. Defaults to None.
+
+    Returns:
+        dict: path of the 'json', 'ris' and 'rayyan' export.
+    """
+    import rispy
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    suffix = '.gz' if compress else ''
+    paths = {
+        'json': directory / ((cs.EXPORT_JSONL if jsonl else cs.EXPORT_JSON) + suffix),
+        'ris': directory / (cs.EXPORT_RIS + suffix),
+        'rayyan': directory / (cs.EXPORT_RAYYAN + suffix),
+    }
+
+    with _open(paths['json'], compress) as file:
+        for part in (iter_jsonl if jsonl else iter_json)(search):
+            file.write(part)
+
+    with _open(paths['ris'], compress) as ris_file, \
+            _open(paths['rayyan'], compress) as rayyan_file:
+        for n, (ris_df, rayyan_df) in enumerate(iter_frames(search, chunk_size)):
+            rispy.dump(_ris_records(ris_df), ris_file)
+            rayyan_df.to_csv(rayyan_file, header=n == 0, index=False)
+            if on_chunk is not None:
+                on_chunk(ris_df, rayyan_df)
+    return paths
+
+
+def export_search_frames(search, directory, **export_kwargs) -> tuple:
+    """Writes the exports and collects the RIS and Rayyan tables.
+
+    Args:
+        search (findpapers.models.search): search results.
+        directory (str or Path): output directory.
+        **export_kwargs: further arguments of export_search.
+
+    Returns:
+        tuple: paths of the exports, RIS and Rayyan data frame.
+    """
+    ris_dfs, rayyan_dfs = [], []
+
+    def collect(ris_df, rayyan_df):
+        ris_dfs.append(ris_df)
+        rayyan_dfs.append(rayyan_df)
+
+    paths = export_search(search, directory, on_chunk=collect, **export_kwargs)
+    if not ris_dfs:
+        return paths, pd.DataFrame(), pd.DataFrame()
+    return (paths,
+            pd.concat(ris_dfs, ignore_index=True),
+            pd.concat(rayyan_dfs, ignore_index=True))
+
+
+def write_exports(search, directory) -> list:
+    """Writes all exports of a search to a directory.
+
+    Args:
+        search (findpapers.models.search): search results.
+        directory (str or Path): output directory.
+
+    Returns:
+        list: paths of the written files.
+    """
+    return list(export_search(search, directory).values())
+
+
+def export_citations(graph, directory, compress: bool = False) -> Path:
+    """Writes the edge list of a citation graph.
+
+    Args:
+        graph (CitationGraph): citation graph.
+        directory (str or Path): output directory.
+        compress (bool, optional): gzip the file. Defaults to False.
+
+    Returns:
+        Path: path of the CSV file.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / (cs.EXPORT_CITATIONS + ('.gz' if compress else ''))
+    with _open(path, compress) as file:
+        graph.edge_frame().to_csv(file, index=False)
+    return path
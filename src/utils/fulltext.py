@@ -0,0 +1,139 @@
+"""Full-text index of titles and abstracts for the review."""
+
+import hashlib
+import re
+import sqlite3
+
+from contextlib import contextmanager
+from pathlib import Path
+
+_WORD = re.compile(r'\w+\*?')
+
+
+def match_expression(text: str) -> str:
+    """Converts free text into an FTS5 query.
+
+    Every word has to occur, a trailing * matches word prefixes.
+
+    Args:
+        text (str): words to search for.
+
+    Returns:
+        str: FTS5 match expression, empty if the text has no words.
+    """
+    terms = []
+    for word in _WORD.findall(text.lower()):
+        prefix = word.endswith('*')
+        terms.append(f'"{word.rstrip("*")}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+
+class FullTextIndex:
+    """SQLite FTS5 index keyed by paper key, ranked with BM25."""
+
+    def __init__(self, path):
+        """Opens the index and creates the tables if needed.
+
+        Args:
+            path (str or Path): location of the SQLite file.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5("
+                "title, abstract, tokenize = 'porter unicode61 remove_diacritics 2')"
+            )
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS papers ("
+                "key TEXT PRIMARY KEY, "
+                "document INTEGER NOT NULL, "
+                "digest TEXT NOT NULL)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS papers_document ON papers (document)")
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(str(self.path), timeout=30)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def update(self, keys: list, titles: list, abstracts: list) -> int:
+        """Indexes new papers and papers whose text changed.
+
+        Args:
+            keys (list): paper keys.
+            titles (list): paper titles.
+            abstracts (list): paper abstracts.
+
+        Returns:
+            int: number of (re)indexed papers.
+        """
+        with self._connect() as con:
+            indexed = {key: (document, digest) for key, document, digest
+                       in con.execute("SELECT key, document, digest FROM papers")}
+            changed = 0
+            for key, title, abstract in zip(keys, titles, abstracts):
+                title = title if isinstance(title, str) else ''
+                abstract = abstract if isinstance(abstract, str) else ''
+                digest = hashlib.sha1(f'{title}\0{abstract}'.encode('utf-8')).hexdigest()
+                document, old_digest = indexed.get(key, (None, None))
+                if old_digest == digest:
+                    continue
+                if document is not None:
+                    con.execute("DELETE FROM documents WHERE rowid = ?", (document,))
+                document = con.execute("INSERT INTO documents (title, abstract) VALUES (?, ?)",
+                                       (title, abstract)).lastrowid
+                con.execute("INSERT OR REPLACE INTO papers (key, document, digest) "
+                            "VALUES (?, ?, ?)", (key, document, digest))
+                indexed[key] = (document, digest)
+                changed += 1
+        return changed
+
+    def retain(self, keys: list) -> int:
+        """Removes the papers that are not among the given ones.
+
+        Args:
+            keys (list): paper keys to keep.
+
+        Returns:
+            int: number of removed papers.
+        """
+        keys = set(keys)
+        with self._connect() as con:
+            stale = [(key, document) for key, document
+                     in con.execute("SELECT key, document FROM papers") if key not in keys]
+            con.executemany("DELETE FROM documents WHERE rowid = ?",
+                            [(document,) for _, document in stale])
+            con.executemany("DELETE FROM papers WHERE key = ?", [(key,) for key, _ in stale])
+        return len(stale)
+
+    def search(self, text: str, limit: int = None) -> list:
+        """Finds the papers matching all words, best match first.
+
+        Args:
+            text (str): words to search for.
+            limit (int, optional): maximum number of results. Defaults to all.
+
+        Returns:
+            list: paper keys.
+        """
+        expression = match_expression(text)
+        if not expression:
+            return []
+        with self._connect() as con:
+            # matches in the title weigh twice as much as in the abstract
+            rows = con.execute(
+                "SELECT papers.key FROM documents "
+                "JOIN papers ON papers.document = documents.rowid "
+                "WHERE documents MATCH ? ORDER BY bm25(documents, 2.0, 1.0) LIMIT ?",
+                (expression, -1 if limit is None else limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def __len__(self) -> int:
+        with self._connect() as con:
+            return con.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
@@ -0,0 +1,290 @@
+"""Rate limited and retrying HTTP layer shared by all database connectors."""
+
+import email.utils
+import hashlib
+import logging
+import random
+import threading
+import time
+import requests
+import utils.consts as cs
+
+from collections import defaultdict
+from urllib.parse import urlsplit, parse_qsl
+from requests.adapters import HTTPAdapter
+
+API_KEY_PARAMS = ('apikey', 'api_key')
+API_KEY_HEADERS = ('X-ELS-APIKey', 'X-Api-Key')
+
+
+class TokenBucket:
+    """Thread safe token bucket, callers wait until a token is available."""
+
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic, sleep=time.sleep):
+        """Creates a full bucket.
+
+        Args:
+            rate (float): tokens added per second.
+            capacity (float): maximum number of tokens (burst size).
+            clock (callable, optional): monotonic clock. Defaults to time.monotonic.
+            sleep (callable, optional): sleep function. Defaults to time.sleep.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Takes a token, waiting if the bucket is empty.
+
+        Returns:
+            float: seconds waited.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # reserve the token, waiting callers queue up behind each other
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+class RetryBudget:
+    """Limits retries to a fraction of the requests of a database."""
+
+    def __init__(self, ratio: float = cs.HTTP_RETRY_RATIO,
+                 minimum: int = cs.HTTP_MIN_RETRIES):
+        """Creates a budget.
+
+        Args:
+            ratio (float, optional): retries earned per request.
+                Defaults to cs.HTTP_RETRY_RATIO.
+            minimum (int, optional): retries available from the start.
+                Defaults to cs.HTTP_MIN_RETRIES.
+        """
+        self.ratio = ratio
+        self._balance = float(minimum)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        """Records a request."""
+        with self._lock:
+            self._balance += self.ratio
+
+    def withdraw(self) -> bool:
+        """Takes a retry from the budget.
+
+        Returns:
+            bool: whether a retry is allowed.
+        """
+        with self._lock:
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+
+class RequestMetrics:
+    """Thread safe counters of the requests of each database."""
+
+    FIELDS = ('requests', 'retries', 'throttled', 'errors', 'wait_seconds', 'seconds', 'bytes')
+
+    def __init__(self):
+        self._counters = defaultdict(lambda: dict.fromkeys(self.FIELDS, 0))
+        self._lock = threading.Lock()
+
+    def add(self, database: str, **values):
+        """Adds values to the counters of a database.
+
+        Args:
+            database (str): database name.
+            **values: increments of the counters.
+        """
+        with self._lock:
+            counters = self._counters[database]
+            for field, value in values.items():
+                counters[field] += value
+
+    def snapshot(self) -> dict:
+        """Copy of all counters.
+
+        Returns:
+            dict: counters by database.
+        """
+        with self._lock:
+            return {database: dict(counters) for database, counters in self._counters.items()}
+
+
+def _retry_after(response) -> float:
+    """Seconds requested by a Retry-After header, None if absent."""
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        date = email.utils.parsedate_to_datetime(value)
+        return max(date.timestamp() - time.time(), 0.0) if date is not None else None
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """Pooled adapter with a token bucket per database and API key.
+
+    Responses with a status in cs.HTTP_RETRY_STATUSES and connection
+    errors are retried with full jitter exponential backoff (or the
+    Retry-After of the server), as long as the retry budget of the
+    database allows it.
+    """
+
+    def __init__(self,
+                 hosts: dict = None,
+                 rate_limits: dict = None,
+                 max_retries_per_request: int = cs.HTTP_MAX_RETRIES,
+                 backoff: float = cs.HTTP_BACKOFF,
+                 max_backoff: float = cs.HTTP_MAX_BACKOFF,
+                 retry_ratio: float = cs.HTTP_RETRY_RATIO,
+                 min_retries: int = cs.HTTP_MIN_RETRIES,
+                 pool_size: int = cs.HTTP_POOL_SIZE,
+                 sleep=time.sleep):
+        """Creates the adapter.
+
+        Args:
+            hosts (dict, optional): database of each host.
+                Defaults to cs.HTTP_HOSTS.
+            rate_limits (dict, optional): requests per second and burst of
+                each database. Defaults to cs.HTTP_RATE_LIMITS.
+            max_retries_per_request (int, optional): retries of a single
+                request. Defaults to cs.HTTP_MAX_RETRIES.
+            backoff (float, optional): base of the backoff in seconds.
+                Defaults to cs.HTTP_BACKOFF.
+            max_backoff (float, optional): maximum backoff in seconds.
+                Defaults to cs.HTTP_MAX_BACKOFF.
+            retry_ratio (float, optional): retries earned per request.
+                Defaults to cs.HTTP_RETRY_RATIO.
+            min_retries (int, optional): retries available from the start.
+                Defaults to cs.HTTP_MIN_RETRIES.
+            pool_size (int, optional): keep-alive connections per host.
+                Defaults to cs.HTTP_POOL_SIZE.
+            sleep (callable, optional): sleep function. Defaults to time.sleep.
+        """
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.hosts = cs.HTTP_HOSTS if hosts is None else hosts
+        self.rate_limits = cs.HTTP_RATE_LIMITS if rate_limits is None else rate_limits
+        self.max_retries_per_request = max_retries_per_request
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_ratio = retry_ratio
+        self.min_retries = min_retries
+        self.metrics = RequestMetrics()
+        self._sleep = sleep
+        self._buckets = {}
+        self._budgets = {}
+        self._lock = threading.Lock()
+
+    def database(self, url: str) -> str:
+        """Database of a URL, the host name for unknown hosts.
+
+        Args:
+            url (str): request URL.
+
+        Returns:
+            str: database name.
+        """
+        host = urlsplit(url).hostname or ''
+        return self.hosts.get(host, host)
+
+    @staticmethod
+    def _api_key(request) -> str:
+        """Fingerprint of the API key of a request, '' without a key."""
+        params = {name.lower(): value for name, value in parse_qsl(urlsplit(request.url).query)}
+        key = next((params[name] for name in API_KEY_PARAMS if name in params), None)
+        if key is None:
+            key = next((request.headers[name] for name in API_KEY_HEADERS
+                        if name in request.headers), '')
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16] if key else ''
+
+    def _limits(self, database: str, api_key: str) -> tuple:
+        """Token bucket and retry budget of a database and API key."""
+        with self._lock:
+            bucket = None
+            if database in self.rate_limits:
+                bucket = self._buckets.get((database, api_key))
+                if bucket is None:
+                    rate, capacity = self.rate_limits[database]
+                    bucket = TokenBucket(rate, capacity, sleep=self._sleep)
+                    self._buckets[(database, api_key)] = bucket
+            budget = self._budgets.get(database)
+            if budget is None:
+                budget = self._budgets[database] = RetryBudget(self.retry_ratio,
+                                                               self.min_retries)
+        return bucket, budget
+
+    def _delay(self, attempt: int, response) -> float:
+        """Backoff before the next attempt."""
+        delay = None if response is None else _retry_after(response)
+        if delay is None:
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        return min(delay, self.max_backoff)
+
+    def send(self, request, **kwargs):
+        """Sends a request within the rate limit and retries it if needed."""
+        database = self.database(request.url)
+        bucket, budget = self._limits(database, self._api_key(request))
+        budget.deposit()
+        attempt = 0
+        while True:
+            wait = bucket.acquire() if bucket is not None else 0.0
+            start = time.monotonic()
+            response, error = None, None
+            try:
+                response = super().send(request, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as exception:
+                error = exception
+            retry = error is not None or response.status_code in cs.HTTP_RETRY_STATUSES
+            size = 0
+            if not retry and not kwargs.get('stream'):
+                # the session reads the body right away unless it streams
+                size = len(response.content)
+            self.metrics.add(database, requests=1, wait_seconds=wait,
+                             seconds=time.monotonic() - start, bytes=size,
+                             throttled=int(response is not None and response.status_code == 429),
+                             errors=int(retry))
+            if not retry:
+                return response
+            if attempt >= self.max_retries_per_request or not budget.withdraw():
+                logging.warning("Giving up on %s after %d retries", database, attempt)
+                if error is not None:
+                    raise error
+                return response
+            delay = self._delay(attempt, response)
+            if response is not None:
+                response.close()
+            self.metrics.add(database, retries=1)
+            self._sleep(delay)
+            attempt += 1
+
+
+def install(session: requests.Session, adapter: RateLimitedAdapter = None) -> RateLimitedAdapter:
+    """Mounts the rate limited adapter for HTTP and HTTPS on a session.
+
+    Args:
+        session (requests.Session): session, e.g. the findpapers DefaultSession.
+        adapter (RateLimitedAdapter, optional): adapter to mount.
+            Defaults to a new adapter.
+
+    Returns:
+        RateLimitedAdapter: the mounted adapter.
+    """
+    current = session.get_adapter('https://')
+    if adapter is None and isinstance(current, RateLimitedAdapter):
+        return current
+    adapter = adapter or RateLimitedAdapter()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return adapter
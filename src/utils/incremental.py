@@ -0,0 +1,160 @@
+"""Incremental search windows for living reviews."""
+
+import datetime
+import json
+import sqlite3
+import time
+import zlib
+
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def delta_window(stored_since, stored_until, since, until):
+    """Determines which part of a date window still has to be fetched.
+
+    The last stored day is fetched again, since databases keep adding
+    papers of that day after it ended.
+
+    Args:
+        stored_since (datetime.date): start of the completed window or None.
+        stored_until (datetime.date): end of the completed window or None.
+        since (datetime.date): requested start date.
+        until (datetime.date): requested end date.
+
+    Returns:
+        tuple: (since, until) to fetch, (None, None) if nothing is new.
+        bool: whether the result extends the stored window.
+    """
+    if (stored_since is None or stored_until is None or
+            since != stored_since or until < stored_since):
+        return (since, until), False
+    if until <= stored_until:
+        return (None, None), True
+    return (stored_until, until), True
+
+
+def merge_into(base, delta):
+    """Merges newly fetched papers into a stored search.
+
+    Uses the paper keys of findpapers to detect papers that are already
+    part of the stored search.
+
+    Args:
+        base (findpapers.models.search): stored search.
+        delta (findpapers.models.search): papers of the delta window.
+
+    Returns:
+        findpapers.models.search: the updated stored search.
+    """
+    n_new = len(delta.papers)
+    if base.limit is not None:
+        base.limit += n_new
+    if base.limit_per_database is not None:
+        base.limit_per_database += n_new
+    base.until = delta.until
+
+    for paper in delta.papers:
+        key = base.get_paper_key(paper.title, paper.publication_date, paper.doi)
+        existing = base.paper_by_key.get(key, None)
+        if existing is None:
+            try:
+                base.add_paper(paper)
+            except (ValueError, OverflowError):
+                pass
+        else:
+            for database in paper.databases:
+                existing.add_database(database)
+            existing.enrich(paper)
+    return base
+
+
+def clip_window(search, until):
+    """Papers of a stored search published until a date.
+
+    Args:
+        search (findpapers.models.search): stored search.
+        until (datetime.date): requested end date.
+
+    Returns:
+        findpapers.models.search: search ending at until, papers without
+            a publication date are kept.
+    """
+    import findpapers as fp
+
+    clipped = fp.models.search.Search(search.query, search.since, until,
+                                      search.limit, search.limit_per_database,
+                                      processed_at=search.processed_at,
+                                      databases=search.databases,
+                                      publication_types=search.publication_types)
+    for paper in search.papers:
+        if paper.publication_date is None or paper.publication_date <= until:
+            clipped.add_paper(paper)
+    return clipped
+
+
+class SearchWindowStore:
+    """Remembers the last completed window of each query and database."""
+
+    def __init__(self, path):
+        """Opens the store and creates the table if needed.
+
+        Args:
+            path (str or Path): location of the SQLite file.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS windows ("
+                "key TEXT PRIMARY KEY, "
+                "since TEXT NOT NULL, "
+                "until TEXT NOT NULL, "
+                "search BLOB NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(str(self.path), timeout=30)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def get(self, key: str):
+        """Returns the stored window of a query.
+
+        Args:
+            key (str): window key.
+
+        Returns:
+            tuple: since, until and the search dict or Nones if missing.
+        """
+        with self._connect() as con:
+            row = con.execute(
+                "SELECT since, until, search FROM windows WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None, None, None
+        return (datetime.date.fromisoformat(row[0]),
+                datetime.date.fromisoformat(row[1]),
+                json.loads(zlib.decompress(row[2]).decode('utf-8')))
+
+    def put(self, key: str, since, until, search_dict: dict):
+        """Stores the completed window of a query.
+
+        Args:
+            key (str): window key.
+            since (datetime.date): start of the window.
+            until (datetime.date): end of the window.
+            search_dict (dict): search results as dict.
+        """
+        blob = zlib.compress(json.dumps(search_dict).encode('utf-8'))
+        with self._connect() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO windows "
+                "(key, since, until, search, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (key, since.isoformat(), until.isoformat(), blob, time.time())
+            )
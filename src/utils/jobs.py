@@ -0,0 +1,285 @@
+"""Background search jobs that survive page reruns."""
+
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from pathlib import Path
+
+QUEUED = "queued"
+RUNNING = "running"
+FINISHED = "finished"
+FAILED = "failed"
+
+
+def process_alive(pid: int) -> bool:
+    """Whether a process of this machine is still running.
+
+    Args:
+        pid (int): process id.
+
+    Returns:
+        bool: False if the process does not exist anymore.
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """SQLite table holding status, progress and results of jobs.
+
+    Each job records the id of the server process that submitted it, so
+    jobs of processes sharing the store are left alone while they run.
+    """
+
+    def __init__(self, path):
+        """Opens the store and creates the table if needed.
+
+        Args:
+            path (str or Path): location of the SQLite file.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, "
+                "status TEXT NOT NULL, "
+                "progress REAL NOT NULL DEFAULT 0, "
+                "message TEXT, "
+                "params TEXT NOT NULL, "
+                "result BLOB, "
+                "error TEXT, "
+                "created_at REAL NOT NULL, "
+                "updated_at REAL NOT NULL, "
+                "owner INTEGER)"
+            )
+            columns = [row[1] for row in con.execute("PRAGMA table_info(jobs)")]
+            if 'owner' not in columns:
+                con.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(str(self.path), timeout=30)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def create(self, params: dict, owner: int = None) -> str:
+        """Adds a queued job.
+
+        Args:
+            params (dict): JSON serializable job parameters.
+            owner (int, optional): id of the submitting process.
+                Defaults to the current process.
+
+        Returns:
+            str: job id.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as con:
+            con.execute(
+                "INSERT INTO jobs (id, status, params, created_at, updated_at, owner) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(params, default=str), now, now,
+                 os.getpid() if owner is None else owner)
+            )
+        return job_id
+
+    def update(self, job_id: str, **fields):
+        """Updates status, progress, message or error of a job.
+
+        Args:
+            job_id (str): job id.
+            **fields: columns to update.
+        """
+        fields['updated_at'] = time.time()
+        columns = ", ".join(f"{column} = ?" for column in fields)
+        with self._connect() as con:
+            con.execute(f"UPDATE jobs SET {columns} WHERE id = ?",
+                        (*fields.values(), job_id))
+
+    def finish(self, job_id: str, result):
+        """Stores the JSON serializable result of a job.
+
+        Args:
+            job_id (str): job id.
+            result (object): job result.
+        """
+        blob = zlib.compress(json.dumps(result).encode('utf-8'))
+        self.update(job_id, status=FINISHED, progress=1.0, result=blob)
+
+    def status(self, job_id: str) -> dict:
+        """Returns the status of a job.
+
+        Args:
+            job_id (str): job id.
+
+        Returns:
+            dict: id, status, progress, message, params and error or None.
+        """
+        with self._connect() as con:
+            row = con.execute(
+                "SELECT id, status, progress, message, params, error, created_at "
+                "FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'id': row[0], 'status': row[1], 'progress': row[2],
+                'message': row[3], 'params': json.loads(row[4]),
+                'error': row[5], 'created_at': row[6]}
+
+    def result(self, job_id: str):
+        """Returns the result of a finished job.
+
+        Args:
+            job_id (str): job id.
+
+        Returns:
+            object: job result or None.
+        """
+        with self._connect() as con:
+            row = con.execute("SELECT result FROM jobs WHERE id = ?",
+                              (job_id,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def fail_unfinished(self, message: str = "interrupted", alive=process_alive):
+        """Marks unfinished jobs of server processes that are gone as failed.
+
+        Args:
+            message (str, optional): error message. Defaults to "interrupted".
+            alive (callable, optional): whether the process of an id is
+                running. Defaults to process_alive.
+
+        Returns:
+            list: ids of the failed jobs.
+        """
+        with self._connect() as con:
+            rows = con.execute("SELECT id, owner FROM jobs WHERE status IN (?, ?)",
+                               (QUEUED, RUNNING)).fetchall()
+            failed = [job_id for job_id, owner in rows if owner is None or not alive(owner)]
+            con.executemany(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? "
+                "WHERE id = ? AND status IN (?, ?)",
+                [(FAILED, message, time.time(), job_id, QUEUED, RUNNING) for job_id in failed]
+            )
+        return failed
+
+
+class JobQueue:
+    """Runs search jobs in a process pool.
+
+    A crashed worker breaks the whole pool, its jobs are marked as failed
+    and the pool is replaced on the next submit.
+    """
+
+    def __init__(self, path, max_workers: int):
+        """Creates the job store and the process pool.
+
+        Args:
+            path (str or Path): location of the SQLite file.
+            max_workers (int): number of jobs running in parallel.
+        """
+        self.store = JobStore(path)
+        self.store.fail_unfinished()
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.max_workers,
+                                   mp_context=multiprocessing.get_context('spawn'))
+
+    def _on_done(self, job_id: str, future):
+        # run_search_job handles its own errors, so this is a crashed worker
+        error = None if future.cancelled() else future.exception()
+        if future.cancelled() or error is not None:
+            self.store.update(job_id, status=FAILED,
+                              error=repr(error) if error else "cancelled")
+
+    def submit(self, params: dict, secrets: dict = None) -> str:
+        """Submits a search job.
+
+        Args:
+            params (dict): arguments of the search, stored with the job.
+            secrets (dict, optional): arguments that are passed to the job
+                but not stored, e.g. API keys. Defaults to None.
+
+        Returns:
+            str: job id.
+        """
+        job_id = self.store.create(params)
+        args = (run_search_job, str(self.store.path), job_id, params, secrets or {})
+        with self._lock:
+            try:
+                future = self._executor.submit(*args)
+            except BrokenProcessPool:
+                self._executor.shutdown(wait=False)
+                self._executor = self._new_executor()
+                future = self._executor.submit(*args)
+        future.add_done_callback(lambda done: self._on_done(job_id, done))
+        return job_id
+
+    def status(self, job_id: str) -> dict:
+        """See JobStore.status."""
+        return self.store.status(job_id)
+
+    def result(self, job_id: str):
+        """See JobStore.result."""
+        return self.store.result(job_id)
+
+
+def run_search_job(path: str, job_id: str, params: dict, secrets: dict):
+    """Runs a search in a worker process and stores its progress.
+
+    Args:
+        path (str): location of the SQLite file.
+        job_id (str): job id.
+        params (dict): arguments of search_databases, dates as ISO strings.
+        secrets (dict): API keys.
+    """
+    import datetime
+    import utils.consts as cs
+    from utils.pipeline import new_run_profile, shared_search
+
+    store = JobStore(path)
+    store.update(job_id, status=RUNNING, message="searching")
+    try:
+        kwargs = dict(params)
+        kwargs['since'] = datetime.date.fromisoformat(kwargs['since'])
+        kwargs['until'] = datetime.date.fromisoformat(kwargs['until'])
+        kwargs.update(secrets)
+        n_databases, done = len(kwargs['databases']), []
+
+        def on_result(result, finished):
+            done.append(result.database)
+            n_done = len(done)
+            store.update(job_id, progress=n_done / (n_databases + 1),
+                         message=f"{n_done} of {n_databases} databases finished")
+
+        profile = new_run_profile(job_id)
+        key, failed, _ = shared_search(on_result=on_result, profile=profile, **kwargs)
+        profile.write_jsonl(cs.PROFILE_PATH)
+        store.update(job_id, message="; ".join(failed) or None)
+        # the results are kept in the shared result store
+        store.finish(job_id, {'key': key})
+    except Exception as error:
+        store.update(job_id, status=FAILED, error=repr(error))
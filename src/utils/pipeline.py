@@ -0,0 +1,1006 @@
+"""Search pipeline independent of the user interface."""
+
+import datetime
+import functools
+import hashlib
+import json
+import logging
+import time
+import uuid
+import pandas as pd
+import utils.consts as cs
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.cache import SearchCache, make_cache_key
+from utils.citation_graph import CitationGraph, cached_fetch_level, expand_citations, node_metadata
+from utils.dedup import merge_duplicate_papers
+from utils.enrichment import content_key, crossref_paper, enrich_search
+from utils.http_client import RateLimitedAdapter, RequestMetrics, install
+from utils.incremental import SearchWindowStore, clip_window, delta_window, merge_into
+from utils.profiling import RunProfile
+from utils.query_set import evaluate, split_query_set
+from utils.result_store import ResultStore
+from utils.review_store import ReviewStore
+
+DatabaseResult = namedtuple('DatabaseResult', ['database', 'search', 'from_cache', 'error'])
+QuerySetResult = namedtuple('QuerySetResult', ['variants', 'clauses', 'papers', 'failed', 'truncated'])
+
+
+@functools.lru_cache(maxsize=None)
+def get_search_cache() -> SearchCache:
+    """Returns the search cache shared by all sessions.
+
+    Returns:
+        SearchCache: persistent search cache.
+    """
+    return SearchCache(cs.CACHE_PATH, cs.CACHE_TTL, cs.CACHE_MAX_ENTRIES)
+
+
+@functools.lru_cache(maxsize=None)
+def get_enrichment_cache() -> SearchCache:
+    """Returns the cache of paper metadata and citation edges shared by all sessions.
+
+    Returns:
+        SearchCache: persistent enrichment cache.
+    """
+    return SearchCache(cs.ENRICHMENT_CACHE_PATH, cs.ENRICHMENT_CACHE_TTL,
+                       cs.ENRICHMENT_CACHE_MAX_ENTRIES)
+
+
+@functools.lru_cache(maxsize=None)
+def get_result_store() -> ResultStore:
+    """Returns the store of merged results and exports shared by all sessions.
+
+    Returns:
+        ResultStore: persistent result store.
+    """
+    return ResultStore(cs.RESULT_STORE_PATH, cs.RESULT_DIR, cs.RESULT_TTL,
+                       cs.RESULT_MAX_ENTRIES, cs.RESULT_LEASE_SECONDS)
+
+
+@functools.lru_cache(maxsize=None)
+def get_http_adapter() -> RateLimitedAdapter:
+    """Installs the rate limited HTTP layer on the findpapers session.
+
+    Returns:
+        RateLimitedAdapter: adapter shared by all database connectors.
+    """
+    from findpapers.utils.requests_util import DefaultSession
+    return install(DefaultSession())
+
+
+def record_errors(run):
+    """Wraps a database connector to keep its error on the search.
+
+    Args:
+        run (callable): run function of a findpapers searcher.
+
+    Returns:
+        callable: connector that appends its exception to
+            search.database_errors before raising it.
+    """
+    @functools.wraps(run)
+    def recorded(search, *args, **kwargs):
+        try:
+            return run(search, *args, **kwargs)
+        except Exception as error:
+            search.database_errors = getattr(search, 'database_errors', []) + [error]
+            raise
+    return recorded
+
+
+@functools.lru_cache(maxsize=None)
+def track_database_errors():
+    """Keeps the errors of the findpapers connectors on their search.
+
+    findpapers only logs the exception of a database, so an outage looks
+    like a database without papers. See raise_database_error.
+    """
+    import importlib
+    import pkgutil
+    import findpapers.searchers as searchers
+
+    for module_info in pkgutil.iter_modules(searchers.__path__):
+        module = importlib.import_module(f'{searchers.__name__}.{module_info.name}')
+        if callable(getattr(module, 'run', None)):
+            module.run = record_errors(module.run)
+
+
+def raise_database_error(search):
+    """Raises the error a connector recorded on the search.
+
+    Args:
+        search (findpapers.models.search): search results.
+
+    Raises:
+        Exception: the last error of a database.
+    """
+    errors = getattr(search, 'database_errors', None)
+    if errors:
+        raise errors[-1]
+
+
+def new_run_profile(run_id: str = None) -> RunProfile:
+    """Profile of a run that counts the requests of the shared HTTP layer.
+
+    Args:
+        run_id (str, optional): trace id. Defaults to a random id.
+
+    Returns:
+        RunProfile: empty profile.
+    """
+    return RunProfile(get_http_adapter().metrics, run_id)
+
+
+def request_metrics() -> pd.DataFrame:
+    """Request counters of each database since the process started.
+
+    Returns:
+        pd.DataFrame: one row per database.
+    """
+    metrics = get_http_adapter().metrics.snapshot()
+    return pd.DataFrame.from_dict(metrics, orient='index',
+                                  columns=list(RequestMetrics.FIELDS))
+
+
+def cached_search(query: str,
+                  since,
+                  until,
+                  limit: int,
+                  databases: list,
+                  publication_types: list = None,
+                  scopus_api_token: str = None,
+                  ieee_api_token: str = None,
+                  enrich: bool = False,
+                  similarity_threshold: float = 0.95,
+                  force_refresh: bool = False,
+                  fresh_since: float = None,
+                  cache: SearchCache = None,
+                  profile: RunProfile = None):
+    """Runs the search or loads its results from the cache.
+
+    With enrichment, the raw results are checkpointed before they are
+    enriched, so a failed enrichment does not search the database again.
+    Failed and empty searches are not cached.
+
+    Args:
+        query (str): search string.
+        since (datetime.date): start date.
+        until (datetime.date): end date.
+        limit (int): maximum number of papers per database.
+        databases (list): databases to search.
+        publication_types (list, optional): publication types.
+            Defaults to None.
+        scopus_api_token (str, optional): Scopus API key. Defaults to None.
+        ieee_api_token (str, optional): IEEE API key. Defaults to None.
+        enrich (bool, optional): complete papers from the shared
+            enrichment cache or the enrichment of findpapers.
+            Defaults to False.
+        similarity_threshold (float, optional): duplication threshold.
+            Defaults to 0.95.
+        force_refresh (bool, optional): ignore cached results.
+            Defaults to False.
+        fresh_since (float, optional): with force_refresh, still use
+            results cached after this timestamp, e.g. by an interrupted
+            run that is resumed. Defaults to None.
+        cache (SearchCache, optional): cache to use. Defaults to the
+            shared search cache.
+        profile (RunProfile, optional): records the enrichment.
+            Defaults to None.
+
+    Raises:
+        Exception: error of a database that findpapers only logged.
+
+    Returns:
+        tuple: search results (findpapers.models.search) and whether
+            they were loaded from the cache.
+    """
+    import findpapers as fp
+
+    if cache is None:
+        cache = get_search_cache()
+    if profile is None:
+        profile = RunProfile()
+    key, raw_key = [make_cache_key(query, databases, since, until, publication_types, limit,
+                                   scopus=scopus_api_token is not None,
+                                   ieee=ieee_api_token is not None,
+                                   enrich=enriched,
+                                   similarity_threshold=similarity_threshold)
+                    for enriched in (enrich, False)]
+
+    def lookup(cache_key):
+        if force_refresh and fresh_since is None:
+            return None
+        return cache.get(cache_key, newer_than=fresh_since if force_refresh else None)
+
+    cached = lookup(key)
+    if cached is not None:
+        return fp.models.search.Search.from_dict(cached), True
+
+    raw = lookup(raw_key) if enrich else None
+    if raw is not None:
+        search = fp.models.search.Search.from_dict(raw)
+    else:
+        get_http_adapter()
+        track_database_errors()
+        search = fp.search(None,
+                           query,
+                           since,
+                           until,
+                           limit=limit * len(databases),
+                           limit_per_database=limit,
+                           databases=databases,
+                           publication_types=publication_types,
+                           scopus_api_token=scopus_api_token,
+                           ieee_api_token=ieee_api_token,
+                           cross_reference_search=False,
+                           enrich=False,
+                           similarity_threshold=similarity_threshold)
+        raise_database_error(search)
+        if enrich and search.papers:
+            cache.put(raw_key, fp.models.search.Search.to_dict(search))
+    if enrich:
+        with profile.span('enrich', database=databases[0],
+                          papers_in=len(search.papers)) as span:
+            span['cache_hits'] = enrich_search(search, get_enrichment_cache(),
+                                               scopus_api_token=scopus_api_token)
+    # an empty result may be an unnoticed outage, it is not worth keeping
+    if search.papers:
+        cache.put(key, fp.models.search.Search.to_dict(search))
+    return search, False
+
+
+@functools.lru_cache(maxsize=None)
+def get_window_store() -> SearchWindowStore:
+    """Returns the store of completed search windows.
+
+    Returns:
+        SearchWindowStore: persistent window store.
+    """
+    return SearchWindowStore(cs.CACHE_PATH)
+
+
+def incremental_search(query: str,
+                       since,
+                       until,
+                       limit: int,
+                       databases: list,
+                       publication_types: list = None,
+                       force_refresh: bool = False,
+                       window_store: SearchWindowStore = None,
+                       **search_kwargs):
+    """Only fetches the papers published since the last completed window.
+
+    Args:
+        query (str): search string.
+        since (datetime.date): start date.
+        until (datetime.date): end date.
+        limit (int): maximum number of papers per database.
+        databases (list): databases to search.
+        publication_types (list, optional): publication types.
+            Defaults to None.
+        force_refresh (bool, optional): ignore stored windows and cached
+            results. Defaults to False.
+        window_store (SearchWindowStore, optional): store to use.
+            Defaults to the shared window store.
+        **search_kwargs: further arguments of cached_search.
+
+    Returns:
+        tuple: search results (findpapers.models.search) and whether
+            nothing had to be fetched.
+    """
+    import findpapers as fp
+
+    if since is None:
+        return cached_search(query, since, until, limit, databases,
+                             publication_types=publication_types,
+                             force_refresh=force_refresh, **search_kwargs)
+    if window_store is None:
+        window_store = get_window_store()
+    options = {k: v for k, v in search_kwargs.items()
+               if k not in ('cache', 'profile', 'fresh_since',
+                             'scopus_api_token', 'ieee_api_token')}
+    key = make_cache_key(query, databases, None, None, publication_types, limit,
+                         scopus=search_kwargs.get('scopus_api_token') is not None,
+                         ieee=search_kwargs.get('ieee_api_token') is not None,
+                         **options)
+
+    stored_since, stored_until, stored = (None, None, None)
+    if not force_refresh:
+        stored_since, stored_until, stored = window_store.get(key)
+    (fetch_since, fetch_until), extends = delta_window(stored_since, stored_until,
+                                                       since, until)
+    if fetch_since is None:
+        search = fp.models.search.Search.from_dict(stored)
+        if until < stored_until:
+            search = clip_window(search, until)
+        return search, True
+
+    # raises if a database failed, so an outage never completes a window
+    fetched, _ = cached_search(query, fetch_since, fetch_until, limit, databases,
+                               publication_types=publication_types,
+                               force_refresh=force_refresh,
+                               **search_kwargs)
+    if extends:
+        search = merge_into(fp.models.search.Search.from_dict(stored), fetched)
+    else:
+        search = fetched
+    window_store.put(key, since, until, fp.models.search.Search.to_dict(search))
+    return search, False
+
+
+def search_databases(query: str,
+                     since,
+                     until,
+                     limit: int,
+                     databases: list,
+                     timeout: float = cs.DATABASE_TIMEOUT,
+                     incremental: bool = False,
+                     profile: RunProfile = None,
+                     **search_kwargs):
+    """Searches each database concurrently.
+
+    Results are yielded as soon as a database finishes. Databases that
+    fail or exceed the timeout are reported with an error instead of
+    aborting the whole run.
+
+    Args:
+        query (str): search string.
+        since (datetime.date): start date.
+        until (datetime.date): end date.
+        limit (int): maximum number of papers per database.
+        databases (list): databases to search.
+        timeout (float, optional): seconds granted to each database.
+            Defaults to cs.DATABASE_TIMEOUT.
+        incremental (bool, optional): only fetch papers published since
+            the last completed window. Defaults to False.
+        profile (RunProfile, optional): records a span per database.
+            Defaults to None.
+        **search_kwargs: further arguments of cached_search.
+
+    Yields:
+        DatabaseResult: result of a single database.
+    """
+    if search_kwargs.get('cache') is None:
+        search_kwargs['cache'] = get_search_cache()
+    run = cached_search
+    if incremental:
+        if search_kwargs.get('window_store') is None:
+            search_kwargs['window_store'] = get_window_store()
+        run = incremental_search
+    if profile is None:
+        profile = RunProfile()
+
+    def search_database(database):
+        with profile.span('database', http=database, database=database) as span:
+            try:
+                search, from_cache = run(query, since, until, limit, [database],
+                                         profile=profile, **search_kwargs)
+            except Exception as error:
+                span['error'] = type(error).__name__
+                raise
+            span.update(papers_out=len(search.papers), cache_hits=int(from_cache))
+        return search, from_cache
+
+    executor = ThreadPoolExecutor(max_workers=max(len(databases), 1))
+    futures = {executor.submit(search_database, database): database for database in databases}
+    deadline = time.monotonic() + timeout
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending,
+                                 timeout=max(deadline - time.monotonic(), 0),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                try:
+                    search, from_cache = future.result()
+                    yield DatabaseResult(futures[future], search, from_cache, None)
+                except Exception as error:
+                    yield DatabaseResult(futures[future], None, False, error)
+        for future in pending:
+            future.cancel()
+            yield DatabaseResult(futures[future], None, False,
+                                 TimeoutError(f"no response within {timeout:.0f} seconds"))
+    finally:
+        executor.shutdown(wait=False)
+
+
+def merge_searches(searches: list,
+                   query: str,
+                   since,
+                   until,
+                   limit: int,
+                   databases: list,
+                   publication_types: list = None,
+                   similarity_threshold: float = 0.95,
+                   profile: RunProfile = None):
+    """Merges the results of single database searches.
+
+    Args:
+        searches (list): findpapers.models.search of each database.
+        query (str): search string.
+        since (datetime.date): start date.
+        until (datetime.date): end date.
+        limit (int): maximum number of papers per database.
+        databases (list): searched databases.
+        publication_types (list, optional): publication types.
+            Defaults to None.
+        similarity_threshold (float, optional): duplication threshold.
+            Defaults to 0.95.
+        profile (RunProfile, optional): records merging and
+            deduplication. Defaults to None.
+
+    Returns:
+        tuple: merged search results (findpapers.models.search) and the
+            number of papers that could not be added, e.g. beyond the
+            limit of a database.
+    """
+    import findpapers as fp
+
+    if profile is None:
+        profile = RunProfile()
+    merged = fp.models.search.Search(
+        query, since, until,
+        limit=limit * len(databases),
+        limit_per_database=limit,
+        databases=[database.lower() for database in databases],
+        publication_types=(None if publication_types is None
+                           else [pt.lower() for pt in publication_types]))
+    dropped = 0
+    with profile.span('merge', papers_in=sum(len(search.papers) for search in searches)) as span:
+        for search in searches:
+            for paper in search.papers:
+                # papers also listed under other databases keep the searched ones
+                searched = {database for database in paper.databases
+                            if database.lower() in merged.databases}
+                if searched and searched != paper.databases:
+                    paper.databases = searched
+                try:
+                    merged.add_paper(paper)
+                except (ValueError, OverflowError) as error:
+                    logging.warning("Dropped %r while merging %s: %s", paper.title, query, error)
+                    dropped += 1
+        span['papers_out'] = len(merged.papers)
+        span['dropped'] = dropped
+    with profile.span('dedup', papers_in=len(merged.papers)) as span:
+        merge_duplicate_papers(merged, similarity_threshold)
+        span['papers_out'] = len(merged.papers)
+    return merged, dropped
+
+
+def search_view(search, excluded_keys: set):
+    """Search results without the excluded papers.
+
+    The search itself is not modified, so the view can be rebuilt after
+    every change of the review decisions.
+
+    Args:
+        search (findpapers.models.search): search results.
+        excluded_keys (set): paper keys to leave out.
+
+    Returns:
+        findpapers.models.search: filtered search results.
+    """
+    import findpapers as fp
+
+    # dates and limits were already enforced when the papers were collected
+    view = fp.models.search.Search(search.query,
+                                   processed_at=search.processed_at,
+                                   databases=search.databases,
+                                   publication_types=search.publication_types)
+    for key, paper in search.paper_by_key.items():
+        if key not in excluded_keys:
+            view.add_paper(paper)
+    view.since, view.until = search.since, search.until
+    view.limit, view.limit_per_database = search.limit, search.limit_per_database
+    return view
+
+
+def expand_search_citations(search,
+                            depth: int = cs.CITATION_DEPTH,
+                            max_nodes: int = cs.CITATION_MAX_NODES,
+                            time_budget: float = cs.CITATION_TIME_BUDGET,
+                            cache: SearchCache = None,
+                            profile: RunProfile = None) -> CitationGraph:
+    """Citation graph around the papers of a search.
+
+    Args:
+        search (findpapers.models.search): search results.
+        depth (int, optional): maximum distance from the found papers.
+            Defaults to cs.CITATION_DEPTH.
+        max_nodes (int, optional): maximum number of papers.
+            Defaults to cs.CITATION_MAX_NODES.
+        time_budget (float, optional): wall clock budget in seconds.
+            Defaults to cs.CITATION_TIME_BUDGET.
+        cache (SearchCache, optional): cache of citation edges. Defaults
+            to the shared enrichment cache.
+        profile (RunProfile, optional): records the expansion.
+            Defaults to None.
+
+    Returns:
+        CitationGraph: papers and citation edges.
+    """
+    if cache is None:
+        cache = get_enrichment_cache()
+    if profile is None:
+        profile = RunProfile()
+    get_http_adapter()
+    seeds = sorted(paper.doi for paper in search.papers if paper.doi)
+    with profile.span('citations', papers_in=len(seeds)) as span:
+        graph = expand_citations(seeds, cached_fetch_level(cache), depth, max_nodes, time_budget)
+        span['papers_out'] = len(graph.depth)
+    return graph
+
+
+def snowballed_papers(search,
+                      graph: CitationGraph,
+                      time_budget: float = cs.CITATION_TIME_BUDGET,
+                      cache: SearchCache = None,
+                      profile: RunProfile = None) -> list:
+    """Papers the citation graph adds to the search results.
+
+    Snowballed papers are listed under the databases of the papers they
+    were reached from, and their comment tells the distance. Papers
+    without title or date at CrossRef are left out.
+
+    Args:
+        search (findpapers.models.search): search results.
+        graph (CitationGraph): graph expanded from the search.
+        time_budget (float, optional): seconds to fetch the metadata.
+            Defaults to cs.CITATION_TIME_BUDGET.
+        cache (SearchCache, optional): cache of the metadata. Defaults
+            to the shared enrichment cache.
+        profile (RunProfile, optional): records the metadata lookup.
+            Defaults to None.
+
+    Returns:
+        list: findpapers.models.paper instances.
+    """
+    if cache is None:
+        cache = get_enrichment_cache()
+    if profile is None:
+        profile = RunProfile()
+    databases = graph.inherit({paper.doi.lower(): paper.databases
+                               for paper in search.papers if paper.doi})
+    with profile.span('snowball', papers_in=len(graph.depth)) as span:
+        payloads = node_metadata(graph, cache, timeout=time_budget)
+        papers = [crossref_paper(payload, databases[doi],
+                                 f"Citation snowballing, depth {graph.depth[doi]}")
+                  for doi, payload in sorted(payloads.items())]
+        papers = [paper for paper in papers if paper is not None and paper.databases]
+        span['papers_out'] = len(papers)
+    return papers
+
+
+def snowball_search(search, papers: list):
+    """Search results extended by the papers found by citation snowballing.
+
+    Args:
+        search (findpapers.models.search): search results.
+        papers (list): snowballed findpapers.models.paper instances,
+            their dates and number are not limited by the search.
+
+    Returns:
+        findpapers.models.search: new search holding both.
+    """
+    import findpapers as fp
+
+    extended = fp.models.search.Search(search.query,
+                                       processed_at=search.processed_at,
+                                       databases=search.databases,
+                                       publication_types=search.publication_types)
+    for paper in list(search.papers) + list(papers):
+        extended.add_paper(paper)
+    extended.since, extended.until = search.since, search.until
+    extended.limit, extended.limit_per_database = search.limit, search.limit_per_database
+    return extended
+
+
+def shared_citations(key: str,
+                     depth: int = cs.CITATION_DEPTH,
+                     max_nodes: int = cs.CITATION_MAX_NODES,
+                     time_budget: float = cs.CITATION_TIME_BUDGET,
+                     store: ResultStore = None,
+                     cache: SearchCache = None,
+                     profile: RunProfile = None) -> tuple:
+    """Citation graph and snowballed papers of stored search results, created once.
+
+    Args:
+        key (str): result key of the search.
+        depth (int, optional): maximum distance from the found papers.
+            Defaults to cs.CITATION_DEPTH.
+        max_nodes (int, optional): maximum number of papers.
+            Defaults to cs.CITATION_MAX_NODES.
+        time_budget (float, optional): wall clock budget in seconds of
+            the expansion and of fetching the metadata each.
+            Defaults to cs.CITATION_TIME_BUDGET.
+        store (ResultStore, optional): store to use. Defaults to the
+            shared result store.
+        cache (SearchCache, optional): cache of citation edges and
+            metadata. Defaults to the shared enrichment cache.
+        profile (RunProfile, optional): records expansion and metadata.
+            Defaults to None.
+
+    Returns:
+        tuple: CitationGraph and the snowballed papers (list).
+    """
+    import findpapers as fp
+
+    if store is None:
+        store = get_result_store()
+    if cache is None:
+        cache = get_enrichment_cache()
+    if profile is None:
+        profile = RunProfile()
+
+    def create():
+        search = load_search(key, store)
+        graph = expand_search_citations(search, depth, max_nodes, time_budget,
+                                        cache=cache, profile=profile)
+        papers = snowballed_papers(search, graph, time_budget, cache=cache, profile=profile)
+        return {'graph': graph.to_dict(),
+                'papers': [fp.models.paper.Paper.to_dict(paper) for paper in papers]}
+
+    value, _ = store.get_or_create(f"{key}:citations:{depth}:{max_nodes}", create)
+    return (CitationGraph.from_dict(value['graph']),
+            [fp.models.paper.Paper.from_dict(paper) for paper in value['papers']])
+
+
+def papers_to_frame(searches: list) -> pd.DataFrame:
+    """Lightweight overview of (partial) search results.
+
+    Args:
+        searches (list): findpapers.models.search instances.
+
+    Returns:
+        pd.DataFrame: title, date, doi and databases of each paper.
+    """
+    rows = [
+        {'title': paper.title,
+         'date': paper.publication_date,
+         'doi': paper.doi,
+         'databases': ', '.join(sorted(paper.databases))}
+        for search in searches for paper in search.papers
+    ]
+    return pd.DataFrame(rows, columns=['title', 'date', 'doi', 'databases'])
+
+
+def run_search(query: str,
+               since,
+               until,
+               limit: int,
+               databases: list,
+               publication_types: list = None,
+               similarity_threshold: float = 0.95,
+               on_result=None,
+               profile: RunProfile = None,
+               **search_kwargs):
+    """Searches all databases and merges their results.
+
+    Args:
+        query (str): search string.
+        since (datetime.date): start date.
+        until (datetime.date): end date.
+        limit (int): maximum number of papers per database.
+        databases (list): databases to search.
+        publication_types (list, optional): publication types.
+            Defaults to None.
+        similarity_threshold (float, optional): duplication threshold.
+            Defaults to 0.95.
+        on_result (callable, optional): called with the DatabaseResult
+            and the list of finished searches once a database finished.
+            Defaults to None.
+        profile (RunProfile, optional): records the stages of the run.
+            Defaults to None.
+        **search_kwargs: further arguments of search_databases.
+
+    Returns:
+        tuple: merged search results (findpapers.models.search), the
+            DatabaseResult of each database and the number of papers
+            dropped while merging.
+    """
+    finished, results = [], []
+    for result in search_databases(query, since, until, limit, databases,
+                                   publication_types=publication_types,
+                                   similarity_threshold=similarity_threshold,
+                                   profile=profile,
+                                   **search_kwargs):
+        results.append(result)
+        if result.error is None:
+            finished.append(result.search)
+        if on_result is not None:
+            on_result(result, finished)
+    search, dropped = merge_searches(finished, query, since, until, limit, databases,
+                                     publication_types=publication_types,
+                                     similarity_threshold=similarity_threshold,
+                                     profile=profile)
+    return search, results, dropped
+
+
+def shared_search(query: str,
+                  since,
+                  until,
+                  limit: int,
+                  databases: list,
+                  publication_types: list = None,
+                  similarity_threshold: float = 0.95,
+                  force_refresh: bool = False,
+                  on_result=None,
+                  profile: RunProfile = None,
+                  store: ResultStore = None,
+                  **search_kwargs) -> tuple:
+    """Runs a search once for all sessions asking for the same results.
+
+    The merged results are stored by the content hash of the search
+    parameters, so sessions only need to keep the key. Identical
+    searches wait for a running one instead of starting their own.
+    Results with failed databases are only shared with the searches
+    that waited for them.
+
+    Failed or cancelled runs stay recorded in the store. Running them
+    again resumes them: databases and enrichment batches finished
+    before are loaded from the cache, even when the run was forced to
+    refresh its results.
+
+    Args:
+        query (str): search string.
+        since (datetime.date): start date.
+        until (datetime.date): end date.
+        limit (int): maximum number of papers per database.
+        databases (list): databases to search.
+        publication_types (list, optional): publication types.
+            Defaults to None.
+        similarity_threshold (float, optional): duplication threshold.
+            Defaults to 0.95.
+        force_refresh (bool, optional): search again even if results are
+            stored. Defaults to False.
+        on_result (callable, optional): see run_search, only called if
+            this call runs the search. Defaults to None.
+        profile (RunProfile, optional): records the stages of the run.
+            Defaults to None.
+        store (ResultStore, optional): store to use. Defaults to the
+            shared result store.
+        **search_kwargs: further arguments of search_databases.
+
+    Returns:
+        tuple: result key, the failed databases and whether this call
+            ran the search.
+    """
+    import findpapers as fp
+
+    if store is None:
+        store = get_result_store()
+    key = make_cache_key(query, databases, since, until, publication_types, limit,
+                         scopus=search_kwargs.get('scopus_api_token') is not None,
+                         ieee=search_kwargs.get('ieee_api_token') is not None,
+                         enrich=search_kwargs.get('enrich', False),
+                         similarity_threshold=similarity_threshold)
+
+    params = {'query': query,
+              'since': None if since is None else since.isoformat(),
+              'until': None if until is None else until.isoformat(),
+              'limit': limit,
+              'databases': databases,
+              'publication_types': publication_types,
+              'similarity_threshold': similarity_threshold,
+              'force_refresh': force_refresh,
+              'enrich': search_kwargs.get('enrich', False),
+              'incremental': search_kwargs.get('incremental', False)}
+
+    def create():
+        started_at = store.start_run(key, params)
+        try:
+            search, results, dropped = run_search(
+                query, since, until, limit, databases,
+                publication_types=publication_types,
+                similarity_threshold=similarity_threshold,
+                force_refresh=force_refresh,
+                fresh_since=started_at if force_refresh else None,
+                on_result=on_result,
+                profile=profile,
+                **search_kwargs)
+        except BaseException as error:
+            # also cancelled runs, e.g. a stopped Streamlit script
+            store.finish_run(key, repr(error))
+            raise
+        failed = [f"{r.database}: {r.error}" for r in results if r.error is not None]
+        store.finish_run(key, '; '.join(failed) or None)
+        return {'search': fp.models.search.Search.to_dict(search), 'failed': failed,
+                'dropped': dropped}
+
+    value, created = store.get_or_create(key, create, refresh=force_refresh,
+                                         reusable=lambda value: not value['failed'])
+    return key, value['failed'], created
+
+
+def compare_queries(queries: list,
+                    since,
+                    until,
+                    limit: int,
+                    databases: list,
+                    on_clause=None,
+                    store: ResultStore = None,
+                    **search_kwargs) -> QuerySetResult:
+    """Compares search string variants, fetching each shared clause once.
+
+    The variants are split into the largest clauses they share, see
+    split_query_set, and every clause is searched once with
+    shared_search, so its results are also shared with other sessions.
+    The papers of each variant are computed locally from the papers of
+    its clauses. They match the results of searching the variant itself
+    as long as no clause reaches the limit of a database.
+
+    Args:
+        queries (list): search string variants.
+        since (datetime.date): start date.
+        until (datetime.date): end date.
+        limit (int): maximum number of papers per database and clause.
+        databases (list): databases to search.
+        on_clause (callable, optional): called with the number of
+            finished and of all clauses. Defaults to None.
+        store (ResultStore, optional): store to use. Defaults to the
+            shared result store.
+        **search_kwargs: further arguments of shared_search.
+
+    Raises:
+        QuerySyntaxError: if a search string is invalid.
+
+    Returns:
+        QuerySetResult: paper keys of each canonical variant, result key
+            of each clause, papers by key, failed databases and the
+            clauses that reached the limit of a database.
+    """
+    query_set = split_query_set(queries)
+    clause_results, clause_keys, papers, failed, truncated = {}, {}, {}, [], []
+    for n, clause in enumerate(query_set.clauses):
+        key, clause_failed, _ = shared_search(clause, since, until, limit, databases,
+                                              store=store, **search_kwargs)
+        search = load_search(key, store)
+        clause_results[clause] = key
+        clause_keys[clause] = set()
+        counts = {}
+        for paper in search.papers:
+            paper_key = content_key(paper.doi, paper.title)
+            if paper_key is None:
+                continue
+            clause_keys[clause].add(paper_key)
+            papers.setdefault(paper_key, paper)
+            for database in paper.databases:
+                counts[database] = counts.get(database, 0) + 1
+        failed.extend(f"{clause} {failure}" for failure in clause_failed)
+        if any(count >= limit for count in counts.values()):
+            truncated.append(clause)
+        if on_clause is not None:
+            on_clause(n + 1, len(query_set.clauses))
+    variants = {variant: evaluate(node, clause_keys)
+                for variant, node in query_set.variants.items()}
+    return QuerySetResult(variants, clause_results, papers, failed, truncated)
+
+
+def variant_search(result: QuerySetResult, variant: str):
+    """Search results of a variant of a query set.
+
+    Args:
+        result (QuerySetResult): compared variants.
+        variant (str): canonical search string of the variant.
+
+    Returns:
+        findpapers.models.search: papers of the variant.
+    """
+    import findpapers as fp
+
+    papers = [result.papers[key] for key in sorted(result.variants[variant])]
+    search = fp.models.search.Search(variant, databases=sorted(
+        {database.lower() for paper in papers for database in paper.databases}))
+    for paper in papers:
+        search.add_paper(paper)
+    return search
+
+
+def resume_arguments(run: dict) -> dict:
+    """Arguments of shared_search that resume an interrupted run.
+
+    Args:
+        run (dict): run as listed by ResultStore.interrupted_runs.
+
+    Returns:
+        dict: search parameters of the run, without API keys.
+    """
+    arguments = dict(run['params'])
+    for name in ('since', 'until'):
+        if arguments[name] is not None:
+            arguments[name] = datetime.date.fromisoformat(arguments[name])
+    return arguments
+
+
+@functools.lru_cache(maxsize=cs.RESULT_MEMORY_ENTRIES)
+def _load_search(key: str, version: float, store: ResultStore):
+    import findpapers as fp
+
+    value = store.get(key)
+    return None if value is None else fp.models.search.Search.from_dict(value['search'])
+
+
+def dropped_papers(key: str, store: ResultStore = None) -> int:
+    """Papers of a search that were dropped while merging the databases.
+
+    Args:
+        key (str): result key.
+        store (ResultStore, optional): store to use. Defaults to the
+            shared result store.
+
+    Returns:
+        int: number of dropped papers, 0 if the results expired.
+    """
+    if store is None:
+        store = get_result_store()
+    value = store.get(key)
+    return 0 if value is None else value.get('dropped', 0)
+
+
+def load_search(key: str, store: ResultStore = None):
+    """Search results of a key, shared by all sessions of the process.
+
+    Args:
+        key (str): result key.
+        store (ResultStore, optional): store to use. Defaults to the
+            shared result store.
+
+    Returns:
+        findpapers.models.search: search results, None if they expired.
+    """
+    if store is None:
+        store = get_result_store()
+    version = store.version(key)
+    return None if version is None else _load_search(key, version, store)
+
+
+def shared_exports(key: str, export_options: dict, citations: dict = None,
+                   previous: ReviewStore = None, store: ResultStore = None) -> tuple:
+    """Exports and review store of stored search results, created once.
+
+    Args:
+        key (str): result key of the search.
+        export_options (dict): arguments of export_search.
+        citations (dict, optional): arguments of shared_citations to add
+            the snowballed papers and export the citation edges.
+            Defaults to None.
+        previous (ReviewStore, optional): review store of earlier
+            results, e.g. of the session, only its new or changed papers
+            are indexed again. Defaults to None.
+        store (ResultStore, optional): store to use. Defaults to the
+            shared result store.
+
+    Returns:
+        tuple: paths of the exports (dict) and the ReviewStore.
+    """
+    from utils.exports import export_citations, export_search_frames
+
+    if store is None:
+        store = get_result_store()
+    options = json.dumps([export_options, citations], sort_keys=True)
+    export_key = f"{key}:exports:{hashlib.sha256(options.encode('utf-8')).hexdigest()[:16]}"
+
+    def create():
+        directory = store.directory(key) / uuid.uuid4().hex
+        search = load_search(key, store)
+        if citations is not None:
+            graph, papers = shared_citations(key, store=store, **citations)
+            search = snowball_search(search, papers)
+        paths, ris_df, rayyan_df = export_search_frames(search, directory, **export_options)
+        if citations is not None:
+            paths['citations'] = export_citations(graph, directory,
+                                                  compress=export_options.get('compress', False))
+        review = ReviewStore.create(ris_df, rayyan_df, directory, previous=previous)
+        return {'paths': {name: str(path.relative_to(store.root)) for name, path in paths.items()},
+                'review': str(review.directory.relative_to(store.root))}
+
+    # files of evicted entries are gone, those exports are created again
+    value = store.get(export_key)
+    refresh = value is not None and not (store.root / value['review']).exists()
+    value, _ = store.get_or_create(export_key, create, refresh=refresh)
+    return ({name: store.root / path for name, path in value['paths'].items()},
+            ReviewStore(store.root / value['review']))
@@ -0,0 +1,185 @@
+"""Screening queue ordered by the predicted relevance of the papers."""
+
+import re
+import numpy as np
+import pandas as pd
+import utils.consts as cs
+
+from collections import namedtuple
+
+_TOKEN = re.compile(r'[a-z][a-z0-9]+')
+
+TfidfMatrix = namedtuple('TfidfMatrix', ['rows', 'columns', 'values', 'shape'])
+
+
+def tfidf_matrix(documents: list, max_features: int = cs.PRIORITY_MAX_FEATURES,
+                 min_df: int = cs.PRIORITY_MIN_DF) -> TfidfMatrix:
+    """Sparse TF-IDF vectors of the documents.
+
+    Term frequencies are dampened with log(1 + tf) and every row is
+    scaled to unit length.
+
+    Args:
+        documents (list): text of each document, e.g. title and abstract.
+        max_features (int, optional): most frequent words kept.
+            Defaults to cs.PRIORITY_MAX_FEATURES.
+        min_df (int, optional): documents a word has to occur in.
+            Defaults to cs.PRIORITY_MIN_DF.
+
+    Returns:
+        TfidfMatrix: coordinates and values of the non-zero entries and
+            the shape (documents, features).
+    """
+    tokens = pd.Series([_TOKEN.findall(str(document).lower()) for document in documents],
+                       dtype=object).explode().dropna()
+    counts = tokens.groupby([tokens.index, tokens.values]).size()
+    document_frequency = counts.groupby(level=1).size()
+    document_frequency = document_frequency[document_frequency >= min_df] \
+        .sort_values(ascending=False, kind='stable')[:max_features]
+    vocabulary = pd.Index(document_frequency.index)
+
+    columns = vocabulary.get_indexer(counts.index.get_level_values(1))
+    keep = columns >= 0
+    rows = counts.index.get_level_values(0).values[keep].astype(np.int64)
+    columns = columns[keep].astype(np.int64)
+    idf = np.log((1 + len(documents)) / (1 + document_frequency.values)) + 1
+    values = np.log1p(counts.values[keep]) * idf[columns]
+    norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=len(documents)))
+    values = values / np.where(norms > 0, norms, 1)[rows]
+    return TfidfMatrix(rows, columns, values, (len(documents), len(vocabulary)))
+
+
+def _scores(matrix: TfidfMatrix, weights: np.ndarray, bias: float) -> np.ndarray:
+    """Linear score of every document."""
+    return np.bincount(matrix.rows, weights=matrix.values * weights[matrix.columns],
+                       minlength=matrix.shape[0]) + bias
+
+
+class RelevanceModel:
+    """Logistic regression on TF-IDF vectors, warm started on each fit.
+
+    Includes and excludes are weighted to the same total, since reviews
+    usually include few papers, and the predictions are shifted back to
+    the share of includes among the decided papers. Fitting starts from
+    the previous weights, so a new decision only needs a few gradient
+    steps.
+    """
+
+    def __init__(self, n_features: int, l2: float = cs.PRIORITY_L2,
+                 epochs: int = cs.PRIORITY_EPOCHS):
+        """Creates an untrained model.
+
+        Args:
+            n_features (int): columns of the TF-IDF matrix.
+            l2 (float, optional): strength of the L2 penalty.
+                Defaults to cs.PRIORITY_L2.
+            epochs (int, optional): gradient steps per fit.
+                Defaults to cs.PRIORITY_EPOCHS.
+        """
+        self.weights = np.zeros(n_features)
+        self.bias = 0.0
+        self.prior = 0.0
+        self.l2 = l2
+        self.epochs = epochs
+        self.trained = False
+
+    def fit(self, matrix: TfidfMatrix, labeled: np.ndarray, labels: np.ndarray):
+        """Updates the model with the decisions made so far.
+
+        Nothing is learned until there are includes and excludes.
+
+        Args:
+            matrix (TfidfMatrix): TF-IDF vectors of all papers.
+            labeled (np.ndarray): rows of the decided papers.
+            labels (np.ndarray): whether each of them is included.
+
+        Returns:
+            RelevanceModel: the model.
+        """
+        labels = np.asarray(labels, dtype=float)
+        if labels.size == 0 or labels.min() == labels.max():
+            return self
+        # entries of the decided papers, with rows renumbered 0..n-1
+        position = np.full(matrix.shape[0], -1)
+        position[labeled] = np.arange(len(labeled))
+        keep = position[matrix.rows] >= 0
+        subset = TfidfMatrix(position[matrix.rows[keep]], matrix.columns[keep],
+                             matrix.values[keep], (len(labeled), matrix.shape[1]))
+        n_included = labels.sum()
+        sample_weights = np.where(labels == 1, len(labels) / (2 * n_included),
+                                  len(labels) / (2 * (len(labels) - n_included)))
+        # rows have unit length, so this step size keeps gradient descent stable
+        step = 1 / (0.25 * sample_weights.max() + self.l2)
+        weights, bias = self.weights.copy(), self.bias
+        for epoch in range(self.epochs):
+            # Nesterov momentum
+            momentum = epoch / (epoch + 3)
+            look_weights = weights + momentum * (weights - self.weights)
+            look_bias = bias + momentum * (bias - self.bias)
+            self.weights, self.bias = weights, bias
+            probabilities = 1 / (1 + np.exp(-_scores(subset, look_weights, look_bias)))
+            residuals = sample_weights * (probabilities - labels) / len(labels)
+            gradient = np.bincount(subset.columns, weights=subset.values * residuals[subset.rows],
+                                   minlength=matrix.shape[1]) + self.l2 * look_weights
+            weights = look_weights - step * gradient
+            bias = look_bias - step * residuals.sum()
+        self.weights, self.bias = weights, bias
+        self.prior = np.log(n_included / (len(labels) - n_included))
+        self.trained = True
+        return self
+
+    def predict(self, matrix: TfidfMatrix) -> np.ndarray:
+        """Predicted probability that each paper is included.
+
+        Args:
+            matrix (TfidfMatrix): TF-IDF vectors of the papers.
+
+        Returns:
+            np.ndarray: probabilities, 0.5 for all papers if untrained.
+        """
+        return 1 / (1 + np.exp(-_scores(matrix, self.weights, self.bias + self.prior)))
+
+
+def screening_queue(probabilities: np.ndarray, reviewed: np.ndarray) -> np.ndarray:
+    """Unreviewed papers, most likely includes first.
+
+    Args:
+        probabilities (np.ndarray): predicted relevance of each paper.
+        reviewed (np.ndarray): whether each paper was reviewed.
+
+    Returns:
+        np.ndarray: rows of the unreviewed papers, ties in store order.
+    """
+    rows = np.flatnonzero(~np.asarray(reviewed, dtype=bool))
+    return rows[np.argsort(-probabilities[rows], kind='stable')]
+
+
+def estimated_recall(probabilities: np.ndarray, reviewed: np.ndarray, included: np.ndarray,
+                     recent_included: np.ndarray, recent_predicted: np.ndarray) -> dict:
+    """Share of all includes that were found, to decide when to stop.
+
+    The includes left among the unreviewed papers are the sum of their
+    probabilities, calibrated by the includes found among the recently
+    screened papers compared to the probabilities these papers had when
+    they were screened. The most likely includes are screened first, so
+    the recall is rather underestimated.
+
+    Args:
+        probabilities (np.ndarray): predicted relevance of each paper.
+        reviewed (np.ndarray): whether each paper was reviewed.
+        included (np.ndarray): decision of each paper.
+        recent_included (np.ndarray): decisions of the recently screened
+            papers.
+        recent_predicted (np.ndarray): their predicted relevance when
+            they were screened.
+
+    Returns:
+        dict: includes found, estimated includes left and estimated
+            recall (None before the first include).
+    """
+    reviewed = np.asarray(reviewed, dtype=bool)
+    found = int(np.sum(reviewed & np.asarray(included, dtype=bool)))
+    calibration = (np.sum(recent_included) + 0.5) / (np.sum(recent_predicted) + 0.5)
+    remaining = float(calibration * probabilities[~reviewed].sum())
+    recall = found / (found + remaining) if found else None
+    return {'found': found, 'remaining': remaining, 'recall': recall}
@@ -0,0 +1,175 @@
+"""Timed spans of the stages of a search run."""
+
+import json
+import threading
+import time
+import uuid
+import pandas as pd
+
+from contextlib import contextmanager
+from pathlib import Path
+
+COUNTERS = ('requests', 'bytes')
+COLUMNS = ['name', 'database', 'seconds', 'requests', 'bytes',
+           'papers_in', 'papers_out', 'cache_hits']
+
+
+def http_database(database: str) -> str:
+    """Name of a findpapers database in the request metrics.
+
+    Args:
+        database (str): findpapers database, e.g. 'medRxiv'.
+
+    Returns:
+        str: database of the HTTP layer, e.g. 'rxiv'.
+    """
+    database = database.lower()
+    return 'rxiv' if database.endswith('rxiv') else database
+
+
+class RunProfile:
+    """Spans of a single run in the OpenTelemetry span layout.
+
+    Each span has a name, start and end time and flat attributes, e.g.
+    the number of papers going in and out, cache hits and the requests
+    and bytes sent while the span was open.
+    """
+
+    def __init__(self, metrics=None, run_id: str = None):
+        """Creates an empty profile.
+
+        Args:
+            metrics (RequestMetrics, optional): counters of the HTTP layer
+                used for the requests and bytes of each span. They are
+                process wide, so concurrent runs are included.
+                Defaults to None.
+            run_id (str, optional): trace id. Defaults to a random id.
+        """
+        self.metrics = metrics
+        self.run_id = run_id or uuid.uuid4().hex
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def _counters(self, http: str = None) -> dict:
+        """Requests and bytes so far, of one database or in total."""
+        totals = dict.fromkeys(COUNTERS, 0)
+        if self.metrics is None:
+            return totals
+        snapshot = self.metrics.snapshot()
+        if http is not None:
+            snapshot = {http: snapshot.get(http_database(http), {})}
+        for counters in snapshot.values():
+            for field in COUNTERS:
+                totals[field] += counters.get(field, 0)
+        return totals
+
+    @contextmanager
+    def span(self, name: str, http: str = None, **attributes):
+        """Records the enclosed block as a span.
+
+        Args:
+            name (str): stage, e.g. 'database' or 'export'.
+            http (str, optional): only count the requests and bytes of
+                this database. Defaults to all databases.
+            **attributes: attributes of the span.
+
+        Yields:
+            dict: attributes, which the block can extend.
+        """
+        before = self._counters(http)
+        start = time.time_ns()
+        try:
+            yield attributes
+        finally:
+            end = time.time_ns()
+            after = self._counters(http)
+            if self.metrics is not None:
+                for field in COUNTERS:
+                    attributes.setdefault(field, after[field] - before[field])
+            self.add(name, start, end, **attributes)
+
+    def add(self, name: str, start: int, end: int, **attributes):
+        """Adds a span that was timed elsewhere.
+
+        Args:
+            name (str): stage.
+            start (int): start in nanoseconds since the epoch.
+            end (int): end in nanoseconds since the epoch.
+            **attributes: attributes of the span.
+        """
+        record = {
+            'trace_id': self.run_id,
+            'span_id': uuid.uuid4().hex[:16],
+            'name': name,
+            'start_time_unix_nano': start,
+            'end_time_unix_nano': end,
+            'attributes': {key: value for key, value in attributes.items()
+                           if value is not None},
+        }
+        with self._lock:
+            self.spans.append(record)
+
+    def frame(self) -> pd.DataFrame:
+        """Spans in the order they started.
+
+        Returns:
+            pd.DataFrame: one row per span with its seconds and attributes.
+        """
+        return spans_to_frame(self.spans)
+
+    def write_jsonl(self, path, append: bool = True) -> Path:
+        """Writes the spans to a JSON Lines file.
+
+        Args:
+            path (str or Path): JSON Lines file.
+            append (bool, optional): keep the spans of earlier runs.
+                Defaults to True.
+
+        Returns:
+            Path: the file.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            lines = ''.join(json.dumps(span, sort_keys=True) + '\n' for span in self.spans)
+        with open(path, 'a' if append else 'w', encoding='utf-8') as file:
+            file.write(lines)
+        return path
+
+
+def spans_to_frame(spans: list) -> pd.DataFrame:
+    """Flattens spans into a table.
+
+    Args:
+        spans (list): span dicts as written by RunProfile.
+
+    Returns:
+        pd.DataFrame: run id, start, seconds and attributes of each span.
+    """
+    rows = [
+        dict(span['attributes'],
+             run_id=span['trace_id'],
+             name=span['name'],
+             start=pd.Timestamp(span['start_time_unix_nano'], unit='ns'),
+             seconds=(span['end_time_unix_nano'] - span['start_time_unix_nano']) / 1e9)
+        for span in sorted(spans, key=lambda span: span['start_time_unix_nano'])
+    ]
+    frame = pd.DataFrame(rows)
+    columns = ['run_id', 'start'] + COLUMNS
+    return frame.reindex(columns=columns + [c for c in frame.columns if c not in columns])
+
+
+def load_profiles(path) -> pd.DataFrame:
+    """Reads the spans of all runs written to a JSON Lines file.
+
+    Args:
+        path (str or Path): JSON Lines file.
+
+    Returns:
+        pd.DataFrame: spans as returned by spans_to_frame.
+    """
+    path = Path(path)
+    if not path.exists():
+        return spans_to_frame([])
+    with open(path, encoding='utf-8') as file:
+        return spans_to_frame([json.loads(line) for line in file if line.strip()])
@@ -0,0 +1,207 @@
+"""Search string helpers."""
+
+import re
+
+from collections import namedtuple
+
+Term = namedtuple('Term', ['text'])
+Not = namedtuple('Not', ['operand'])
+Group = namedtuple('Group', ['operator', 'operands'])
+
+_TOKEN = re.compile(r'\s*(?:\[(?P<term>[^\[\]]*)\]|(?P<paren>[()])|'
+                    r'(?P<operator>AND|OR|NOT)(?![A-Za-z0-9])|(?P<error>\S))',
+                    re.IGNORECASE)
+
+
+class QuerySyntaxError(ValueError):
+    """Raised for search strings that findpapers cannot process."""
+
+    def __init__(self, message: str, position: int):
+        super().__init__(f"{message} at position {position + 1}")
+        self.position = position
+
+
+def join_string_in_list(list_of_string: list) -> str:
+    """Joins the list of queries into one complete query.
+
+    Args:
+        list_of_string (list): List of queries.
+
+    Returns:
+        str: All queries combined.
+    """
+    return ' '.join(list_of_string)
+
+
+def _tokenize(query: str) -> list:
+    """Splits a search string into (kind, value, position) tokens."""
+    tokens, position, end = [], 0, len(query.rstrip())
+    while position < end:
+        match = _TOKEN.match(query, position)
+        kind = match.lastgroup
+        if kind == 'error':
+            start = match.start('error')
+            if query[start] in '[]':
+                raise QuerySyntaxError("Unbalanced square bracket", start)
+            raise QuerySyntaxError("Search terms must be put in square brackets", start)
+        value = match.group(kind)
+        if kind == 'operator':
+            value = value.upper()
+        start = match.start() + len(match.group()) - len(match.group().lstrip())
+        tokens.append((kind, value, start))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive descent parser, AND and OR are only mixed in parentheses."""
+
+    def __init__(self, query: str):
+        self.query = query
+        self.tokens = _tokenize(query)
+        self.index = 0
+
+    def _peek(self):
+        if self.index < len(self.tokens):
+            return self.tokens[self.index]
+        return None, None, len(self.query)
+
+    def _next(self):
+        token = self._peek()
+        self.index += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise QuerySyntaxError("The search string is empty", 0)
+        node = self._or()
+        kind, value, position = self._peek()
+        if kind is not None:
+            shown = f"[{value}]" if kind == 'term' else value
+            raise QuerySyntaxError(f"Unexpected '{shown}'", position)
+        return node
+
+    def _or(self):
+        node, conjunction = self._and()
+        operands = [node]
+        while self._peek()[:2] == ('operator', 'OR'):
+            _, _, position = self._next()
+            node, next_conjunction = self._and()
+            operands.append(node)
+            # databases differ in the precedence of AND and OR, e.g. Scopus
+            if conjunction is not None or next_conjunction is not None:
+                raise QuerySyntaxError("AND and OR can only be combined with parentheses",
+                                       position)
+        return operands[0] if len(operands) == 1 else Group('OR', operands)
+
+    def _and(self):
+        """Parses AND operands, also returns the position of the first AND."""
+        operands, conjunction = [self._operand()], None
+        while self._peek()[:2] == ('operator', 'AND'):
+            _, _, position = self._next()
+            if conjunction is None:
+                conjunction = position
+            if self._peek()[:2] == ('operator', 'NOT'):
+                self._next()
+                operands.append(Not(self._operand()))
+            else:
+                operands.append(self._operand())
+        node = operands[0] if len(operands) == 1 else Group('AND', operands)
+        return node, conjunction
+
+    def _operand(self):
+        kind, value, position = self._next()
+        if kind == 'term':
+            text = ' '.join(value.split()).lower()
+            if not text:
+                raise QuerySyntaxError("Empty search term", position)
+            if text[0] in '*?':
+                raise QuerySyntaxError("Search terms cannot start with a wildcard", position)
+            return Term(text)
+        if kind == 'paren' and value == '(':
+            node = self._or()
+            kind, value, position = self._next()
+            if (kind, value) != ('paren', ')'):
+                raise QuerySyntaxError("Missing closing parenthesis", position)
+            return node
+        if kind is None:
+            raise QuerySyntaxError("Incomplete search string", position)
+        if kind == 'operator' and value == 'NOT':
+            raise QuerySyntaxError("NOT is only supported as AND NOT", position)
+        raise QuerySyntaxError(f"Expected a search term instead of '{value}'", position)
+
+
+def _normalize(node):
+    """Flattens nested groups, removes duplicates and orders operands."""
+    if isinstance(node, Term):
+        return node
+    if isinstance(node, Not):
+        return Not(_normalize(node.operand))
+    operands = []
+    for operand in map(_normalize, node.operands):
+        if isinstance(operand, Group) and operand.operator == node.operator:
+            operands.extend(operand.operands)
+        else:
+            operands.append(operand)
+    # negations last, the remaining operands in canonical order
+    unique = {to_query(operand): operand for operand in operands}
+    ordered = [unique[key] for key in sorted(unique, key=lambda k: (k.startswith('NOT '), k))]
+    if len(ordered) == 1:
+        return ordered[0]
+    return Group(node.operator, ordered)
+
+
+def parse_query(query: str):
+    """Parses and normalizes a findpapers search string.
+
+    Terms are case folded, nested groups of the same operator are
+    flattened, duplicate operands are removed and the operands of AND
+    and OR are ordered, so equivalent search strings have one form.
+
+    Args:
+        query (str): search string, e.g. "[ASD] AND ([fMRI] OR [fNIRS])".
+
+    Raises:
+        QuerySyntaxError: if the search string is invalid.
+
+    Returns:
+        Term or Group: root of the syntax tree.
+    """
+    return _normalize(_Parser(query).parse())
+
+
+def to_query(node, nested: bool = False) -> str:
+    """Compiles a syntax tree into a findpapers search string.
+
+    Parentheses are only added around nested groups.
+
+    Args:
+        node (Term, Not or Group): syntax tree.
+        nested (bool, optional): whether the node is an operand of a
+            group. Defaults to False.
+
+    Returns:
+        str: search string.
+    """
+    if isinstance(node, Term):
+        return f"[{node.text}]"
+    if isinstance(node, Not):
+        return f"NOT {to_query(node.operand, nested=True)}"
+    query = f" {node.operator} ".join(to_query(operand, nested=True)
+                                      for operand in node.operands)
+    return f"({query})" if nested else query
+
+
+def canonical_query(query: str) -> str:
+    """Canonical form of a search string.
+
+    Args:
+        query (str): search string.
+
+    Raises:
+        QuerySyntaxError: if the search string is invalid.
+
+    Returns:
+        str: canonical search string.
+    """
+    return to_query(parse_query(query))
@@ -0,0 +1,202 @@
+"""Comparison of search string variants by set algebra over their clauses."""
+
+import itertools
+import pandas as pd
+
+from collections import namedtuple
+from utils.query import Group, Not, Term, parse_query, to_query
+
+QuerySet = namedtuple('QuerySet', ['variants', 'clauses'])
+
+
+def _subtrees(node) -> list:
+    """Terms and groups of a syntax tree, negated operands included."""
+    if isinstance(node, Not):
+        return _subtrees(node.operand)
+    if isinstance(node, Term):
+        return [node]
+    return [node] + [subtree for operand in node.operands for subtree in _subtrees(operand)]
+
+
+def shared_clauses(variants: list) -> set:
+    """Sub-clauses that at least two variants contain.
+
+    Besides terms and groups, the operands two AND or OR groups have in
+    common are shared as a group of their own, e.g. [asd] AND [fnirs] of
+    [asd] AND [fnirs] AND [infants] and [asd] AND [fnirs] AND [adults].
+
+    Args:
+        variants (list): syntax trees of the variants.
+
+    Returns:
+        set: search strings of the shared sub-clauses.
+    """
+    counts = {}
+    for node in variants:
+        for query in {to_query(subtree) for subtree in _subtrees(node)}:
+            counts[query] = counts.get(query, 0) + 1
+    shared = {query for query, count in counts.items() if count > 1}
+    groups = [[subtree for subtree in _subtrees(node) if isinstance(subtree, Group)]
+              for node in variants]
+    for first, second in itertools.combinations(groups, 2):
+        for a, b in itertools.product(first, second):
+            others = {to_query(operand) for operand in b.operands}
+            common = [operand for operand in a.operands if to_query(operand) in others]
+            # AND NOT alone is no valid search string
+            if (a.operator == b.operator and len(common) > 1
+                    and not all(isinstance(operand, Not) for operand in common)):
+                shared.add(to_query(Group(a.operator, common)))
+    return shared
+
+
+def _contains(node, shared: set) -> bool:
+    """Whether a syntax tree contains a shared sub-clause."""
+    return any(to_query(subtree) in shared for subtree in _subtrees(node))
+
+
+def split_clauses(node, shared: set):
+    """Splits a syntax tree into its largest shared sub-clauses.
+
+    Shared sub-clauses and parts without any are kept whole. Groups
+    with shared parts are split into the largest group of operands that
+    is shared, the operands containing shared parts and one group of the
+    remaining operands.
+
+    Args:
+        node (Term, Not or Group): syntax tree.
+        shared (set): search strings of the shared sub-clauses.
+
+    Returns:
+        Term, Not or Group: equivalent syntax tree whose operands are
+            the clauses to fetch.
+    """
+    if isinstance(node, Not):
+        return Not(split_clauses(node.operand, shared))
+    if isinstance(node, Term) or to_query(node) in shared or not _contains(node, shared):
+        return node
+    operands = list(node.operands)
+    queries = {to_query(operand): operand for operand in operands}
+    groups = [parse_query(query) for query in shared if f" {node.operator} " in query]
+    groups = [group for group in groups if isinstance(group, Group)
+              and group.operator == node.operator and len(group.operands) < len(operands)
+              and all(to_query(operand) in queries for operand in group.operands)]
+    if groups:
+        largest = max(groups, key=lambda group: (len(group.operands), to_query(group)))
+        common = {to_query(operand) for operand in largest.operands}
+        operands = [largest] + [operand for query, operand in queries.items()
+                                if query not in common]
+    split = [split_clauses(operand, shared) for operand in operands
+             if _contains(operand, shared)]
+    rest = [operand for operand in operands if not _contains(operand, shared)]
+    if len(rest) > 1 and not all(isinstance(operand, Not) for operand in rest):
+        rest = [Group(node.operator, rest)]
+    return Group(node.operator, split + rest)
+
+
+def clauses(node, shared: set = frozenset()) -> set:
+    """Clauses a split syntax tree is evaluated from.
+
+    Args:
+        node (Term, Not or Group): syntax tree, see split_clauses.
+        shared (set, optional): search strings of the shared sub-clauses.
+            Defaults to none, which keeps the tree whole.
+
+    Returns:
+        set: search strings of the clauses, e.g. '[asd] AND [fnirs]'.
+    """
+    if isinstance(node, Not):
+        return clauses(node.operand, shared)
+    if isinstance(node, Term) or to_query(node) in shared or not _contains(node, shared):
+        return {to_query(node)}
+    return set().union(*(clauses(operand, shared) for operand in node.operands))
+
+
+def split_query_set(queries: list) -> QuerySet:
+    """Splits search string variants into the largest clauses they share.
+
+    Clauses only one variant contains are fetched as large as possible,
+    so the variants only combine the papers of separate searches where
+    they actually share a clause.
+
+    Args:
+        queries (list): search strings, equivalent ones are merged.
+
+    Raises:
+        QuerySyntaxError: if a search string is invalid.
+
+    Returns:
+        QuerySet: split syntax tree of each canonical variant and the
+            sorted clauses to fetch once for all variants.
+    """
+    variants = {}
+    for query in queries:
+        node = parse_query(query)
+        variants.setdefault(to_query(node), node)
+    shared = shared_clauses(list(variants.values()))
+    variants = {variant: split_clauses(node, shared) for variant, node in variants.items()}
+    fetched = set().union(*(clauses(node, shared) for node in variants.values()))
+    return QuerySet(variants, sorted(fetched))
+
+
+def evaluate(node, clause_keys: dict) -> set:
+    """Papers matching a syntax tree, computed from the papers of its clauses.
+
+    Fetched clauses are looked up, other groups are combined from their
+    operands. OR is the union and AND the intersection of the operands,
+    AND NOT removes the papers of the negated operand.
+
+    Args:
+        node (Term or Group): syntax tree.
+        clause_keys (dict): paper keys found by each clause.
+
+    Returns:
+        set: paper keys.
+    """
+    if isinstance(node, Term) or to_query(node) in clause_keys:
+        return set(clause_keys[to_query(node)])
+    if node.operator == 'OR':
+        return set().union(*(evaluate(operand, clause_keys) for operand in node.operands))
+    positive = [evaluate(operand, clause_keys) for operand in node.operands
+                if not isinstance(operand, Not)]
+    keys = set.intersection(*positive)
+    for operand in node.operands:
+        if isinstance(operand, Not):
+            keys -= evaluate(operand.operand, clause_keys)
+    return keys
+
+
+def variant_summary(variant_keys: dict) -> pd.DataFrame:
+    """Size of each variant and how much of all found papers it covers.
+
+    Args:
+        variant_keys (dict): paper keys of each variant.
+
+    Returns:
+        pd.DataFrame: papers, papers no other variant found and share of
+            the papers found by any variant, indexed by variant.
+    """
+    union = set().union(*variant_keys.values()) if variant_keys else set()
+    rows = []
+    for variant, keys in variant_keys.items():
+        others = set().union(*(other for name, other in variant_keys.items() if name != variant))
+        rows.append({'variant': variant,
+                     'papers': len(keys),
+                     'unique': len(keys - others),
+                     'coverage': len(keys) / len(union) if union else 0.0})
+    return pd.DataFrame(rows, columns=['variant', 'papers', 'unique', 'coverage']) \
+        .set_index('variant')
+
+
+def overlap_matrix(variant_keys: dict) -> pd.DataFrame:
+    """Papers found by both variants of each pair.
+
+    Args:
+        variant_keys (dict): paper keys of each variant.
+
+    Returns:
+        pd.DataFrame: shared papers, the diagonal holds the size of
+            each variant.
+    """
+    names = list(variant_keys)
+    return pd.DataFrame([[len(variant_keys[row] & variant_keys[column]) for column in names]
+                         for row in names], index=names, columns=names)
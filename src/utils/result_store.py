@@ -0,0 +1,362 @@
+"""Server-wide store of search results shared by all sessions."""
+
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class _Flight:
+    """Computation of an entry that other threads can wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+
+class ResultStore:
+    """SQLite backed store of results addressed by content hash.
+
+    A key like '<hash>:<name>' marks a result derived from the entry
+    '<hash>', e.g. its exports. Derived results are dropped when their
+    entry is replaced or evicted, together with the files in the
+    directory of the entry.
+
+    Concurrent requests of a missing entry are single-flight: one caller
+    creates it, the others wait for its result. Threads of a process
+    share the result directly, other processes wait for a lease in the
+    database to be released and read the stored entry.
+
+    Runs creating an entry are recorded until they succeed, so failed or
+    cancelled runs can be listed and resumed.
+
+    Entries that are under review are pinned and not evicted, even if
+    more than max_entries are stored then.
+    """
+
+    def __init__(self, path, root, ttl: float, max_entries: int,
+                 lease_seconds: float, poll_interval: float = 0.5,
+                 pin_seconds: float = None):
+        """Opens the store and creates the tables if needed.
+
+        Args:
+            path (str or Path): location of the SQLite file.
+            root (str or Path): directory holding the files of the entries.
+            ttl (float): time to live of an entry in seconds.
+            max_entries (int): maximum number of entries, derived
+                results not counted.
+            lease_seconds (float): time after which the lease of a
+                crashed process expires, running processes renew it.
+            poll_interval (float, optional): seconds between checks for
+                a result of another process. Defaults to 0.5.
+            pin_seconds (float, optional): time a pin lasts after it was
+                last renewed. Defaults to the ttl.
+        """
+        self.path = Path(path)
+        self.root = Path(root)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.pin_seconds = ttl if pin_seconds is None else pin_seconds
+        self.owner = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, "
+                "value BLOB NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "accessed_at REAL NOT NULL)"
+            )
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "key TEXT PRIMARY KEY, "
+                "owner TEXT NOT NULL, "
+                "expires_at REAL NOT NULL)"
+            )
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "key TEXT PRIMARY KEY, "
+                "params TEXT NOT NULL, "
+                "started_at REAL NOT NULL, "
+                "updated_at REAL NOT NULL, "
+                "error TEXT)"
+            )
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS pins ("
+                "key TEXT PRIMARY KEY, "
+                "pinned_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(str(self.path), timeout=30)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def directory(self, key: str) -> Path:
+        """Directory for the files of an entry and its derived results.
+
+        Args:
+            key (str): entry or derived key.
+
+        Returns:
+            Path: directory, created on demand by the caller.
+        """
+        return self.root / key.split(':', 1)[0]
+
+    def get(self, key: str):
+        """Returns a stored result.
+
+        Args:
+            key (str): result key.
+
+        Returns:
+            Any: the JSON value or None if missing or expired.
+        """
+        now = time.time()
+        with self._connect() as con:
+            row = con.execute(
+                "SELECT value, created_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                return None
+            con.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def version(self, key: str) -> float:
+        """Creation time of a stored result.
+
+        Args:
+            key (str): result key.
+
+        Returns:
+            float: creation timestamp or None if missing or expired.
+        """
+        with self._connect() as con:
+            row = con.execute("SELECT created_at FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row[0] > self.ttl:
+            return None
+        return row[0]
+
+    def put(self, key: str, value):
+        """Stores a result, removes expired and least recently used entries.
+
+        Replacing an entry removes its derived results, and their files
+        unless the entry is pinned.
+
+        Args:
+            key (str): result key.
+            value (Any): JSON serializable value.
+        """
+        blob = zlib.compress(json.dumps(value).encode('utf-8'))
+        now = time.time()
+        removed = []
+        with self._connect() as con:
+            con.execute("DELETE FROM pins WHERE pinned_at < ?", (now - self.pin_seconds,))
+            if ':' not in key:
+                # results derived from the previous version are stale, their
+                # files are kept while the entry is reviewed
+                con.execute("DELETE FROM results WHERE key LIKE ?", (key + ':%',))
+                if con.execute("SELECT 1 FROM results WHERE key = ? "
+                               "AND key NOT IN (SELECT key FROM pins)", (key,)).fetchone():
+                    removed.append(key)
+            con.execute(
+                "INSERT OR REPLACE INTO results (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)", (key, blob, now, now)
+            )
+            expired = [row[0] for row in con.execute(
+                "SELECT key FROM results WHERE key NOT LIKE '%:%' AND created_at < ? "
+                "AND key NOT IN (SELECT key FROM pins)", (now - self.ttl,)
+            )]
+            for old_key in expired:
+                con.execute("DELETE FROM results WHERE key = ? OR key LIKE ?",
+                            (old_key, old_key + ':%'))
+            n_pinned = con.execute(
+                "SELECT COUNT(*) FROM results WHERE key IN (SELECT key FROM pins)"
+            ).fetchone()[0]
+            evicted = [row[0] for row in con.execute(
+                "SELECT key FROM results WHERE key NOT LIKE '%:%' "
+                "AND key NOT IN (SELECT key FROM pins) "
+                "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?",
+                (max(self.max_entries - n_pinned, 0),)
+            )]
+            for old_key in evicted:
+                con.execute("DELETE FROM results WHERE key = ? OR key LIKE ?",
+                            (old_key, old_key + ':%'))
+        for old_key in removed + expired + evicted:
+            shutil.rmtree(self.directory(old_key), ignore_errors=True)
+
+    def pin(self, key: str):
+        """Keeps an entry from being evicted, e.g. while it is reviewed.
+
+        Pins last pin_seconds and are renewed by pinning again.
+
+        Args:
+            key (str): entry or derived key, derived keys pin their entry.
+        """
+        with self._connect() as con:
+            con.execute("INSERT OR REPLACE INTO pins (key, pinned_at) VALUES (?, ?)",
+                        (key.split(':', 1)[0], time.time()))
+
+    def _acquire_lease(self, key: str) -> bool:
+        """Takes the lease of a key unless another process holds it."""
+        now = time.time()
+        with self._connect() as con:
+            con.execute("DELETE FROM leases WHERE key = ? AND expires_at < ?", (key, now))
+            return con.execute(
+                "INSERT OR IGNORE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, self.owner, now + self.lease_seconds)
+            ).rowcount == 1
+
+    def _release_lease(self, key: str):
+        with self._connect() as con:
+            con.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+
+    def _renew_lease(self, key: str, stop: threading.Event):
+        """Extends the lease of a key until stop is set."""
+        while not stop.wait(self.lease_seconds / 3):
+            with self._connect() as con:
+                con.execute("UPDATE leases SET expires_at = ? WHERE key = ? AND owner = ?",
+                            (time.time() + self.lease_seconds, key, self.owner))
+
+    def start_run(self, key: str, params: dict) -> float:
+        """Records the start of a run creating an entry.
+
+        A run of the same key that did not succeed is resumed and keeps
+        its start time.
+
+        Args:
+            key (str): result key.
+            params (dict): JSON serializable parameters of the run.
+
+        Returns:
+            float: start time of the (resumed) run.
+        """
+        now = time.time()
+        with self._connect() as con:
+            row = con.execute("SELECT started_at FROM runs WHERE key = ?", (key,)).fetchone()
+            started_at = now if row is None else row[0]
+            con.execute(
+                "INSERT OR REPLACE INTO runs (key, params, started_at, updated_at, error) "
+                "VALUES (?, ?, ?, ?, NULL)", (key, json.dumps(params), started_at, now)
+            )
+        return started_at
+
+    def finish_run(self, key: str, error: str = None):
+        """Records the end of a run, successful runs are removed.
+
+        Args:
+            key (str): result key.
+            error (str, optional): why the run failed. Defaults to None.
+        """
+        with self._connect() as con:
+            if error is None:
+                con.execute("DELETE FROM runs WHERE key = ?", (key,))
+            else:
+                con.execute("UPDATE runs SET updated_at = ?, error = ? WHERE key = ?",
+                            (time.time(), error, key))
+
+    def interrupted_runs(self) -> list:
+        """Runs that failed or stopped and are not running anymore.
+
+        Returns:
+            list: dicts with key, params, started_at, updated_at and
+                error, most recent first.
+        """
+        with self._connect() as con:
+            rows = con.execute(
+                "SELECT key, params, started_at, updated_at, error FROM runs "
+                "WHERE key NOT IN (SELECT key FROM leases WHERE expires_at >= ?) "
+                "ORDER BY updated_at DESC", (time.time(),)
+            ).fetchall()
+        return [{'key': key, 'params': json.loads(params), 'started_at': started_at,
+                 'updated_at': updated_at, 'error': error}
+                for key, params, started_at, updated_at, error in rows]
+
+    def get_or_create(self, key: str, create, refresh: bool = False,
+                      reusable=None, timeout: float = None) -> tuple:
+        """Returns a stored result or creates it exactly once.
+
+        Args:
+            key (str): result key.
+            create (callable): returns the JSON serializable value.
+            refresh (bool, optional): create the value even if it is
+                stored, callers arriving during the creation share it.
+                Defaults to False.
+            reusable (callable, optional): whether a stored value can be
+                returned instead of creating it again, e.g. not for
+                partial results. Callers waiting for the creation always
+                share the value. Defaults to all values.
+            timeout (float, optional): seconds to wait for another
+                process. Defaults to waiting as long as its lease.
+
+        Raises:
+            TimeoutError: if another process did not finish in time.
+
+        Returns:
+            tuple: the value and whether this call created it.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if not refresh:
+                value = self.get(key)
+                if value is not None and (reusable is None or reusable(value)):
+                    return value, False
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+            if not leader:
+                flight.done.wait()
+                if flight.value is not None:
+                    return flight.value, False
+                # the creation failed, try on our own
+                continue
+
+            try:
+                if self._acquire_lease(key):
+                    # creations may outlast the lease, which only expires if we crash
+                    stop = threading.Event()
+                    heartbeat = threading.Thread(target=self._renew_lease, args=(key, stop),
+                                                 daemon=True)
+                    heartbeat.start()
+                    try:
+                        # another process may have finished before the lease was free
+                        value = None if refresh else self.get(key)
+                        if value is not None and (reusable is None or reusable(value)):
+                            flight.value = value
+                            return value, False
+                        value = create()
+                        self.put(key, value)
+                    finally:
+                        stop.set()
+                        heartbeat.join()
+                        self._release_lease(key)
+                    flight.value = value
+                    return value, True
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+
+            # another process creates the value
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"result {key} was not created in time")
+            time.sleep(self.poll_interval)
+            refresh = False
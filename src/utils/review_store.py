@@ -0,0 +1,274 @@
+"""Columnar store of the papers under review."""
+
+import shutil
+import uuid
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from pathlib import Path
+from utils.fulltext import FullTextIndex
+
+DECISION_COLUMNS = ['reviewed', 'decision', 'criteria']
+EDITABLE_COLUMNS = ['custom1', 'custom2']
+
+
+def paper_keys(titles: pd.Series, dates: pd.Series, dois: pd.Series) -> pd.Series:
+    """Vectorized findpapers.models.search.Search.get_paper_key.
+
+    Args:
+        titles (pd.Series): paper titles.
+        dates (pd.Series): publication dates as 'YYYY-MM-DD'.
+        dois (pd.Series): paper DOIs, missing or empty if unknown.
+
+    Returns:
+        pd.Series: paper keys.
+    """
+    dois = dois.where(dois.notna() & (dois.astype(str) != ''))
+    years = dates.astype(str).str[:4].where(dates.notna(), '')
+    title_keys = titles.astype(str).str.lower() + '|' + years
+    return ('DOI-' + dois.astype(str)).where(dois.notna(), title_keys)
+
+
+def match_keys(paper_keys, keys) -> tuple:
+    """Rows of the papers with each key.
+
+    Papers can share a key, e.g. papers without DOI and with the same
+    title and year, so a key can match several rows.
+
+    Args:
+        paper_keys (iterable): paper key of each row.
+        keys (iterable): keys to look up.
+
+    Returns:
+        tuple: matching rows (np.ndarray) and the position of their key
+            in keys (np.ndarray), in the order of keys.
+    """
+    keys = np.asarray(list(keys), dtype=object)
+    paper_keys = np.asarray(list(paper_keys), dtype=object)
+    matches = pd.DataFrame({'key': keys, 'position': np.arange(len(keys))}) \
+        .merge(pd.DataFrame({'key': paper_keys, 'row': np.arange(len(paper_keys))}), on='key')
+    return matches['row'].to_numpy(), matches['position'].to_numpy()
+
+
+def _to_table(df: pd.DataFrame) -> pa.Table:
+    """Converts a data frame to Arrow, mixed columns are stored as text.
+
+    Args:
+        df (pd.DataFrame): data frame.
+
+    Returns:
+        pa.Table: Arrow table.
+    """
+    arrays = []
+    for column in df.columns:
+        try:
+            arrays.append(pa.array(df[column], from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arrays.append(pa.array(df[column].astype(str), from_pandas=True))
+    return pa.Table.from_arrays(arrays, names=[str(column) for column in df.columns])
+
+
+class ReviewStore:
+    """Paper records of a search, written once and read as projections.
+
+    The RIS (CADIMA) and Rayyan tables are stored as uncompressed Arrow
+    files that are memory mapped on read, so sessions only hold the
+    columns they display.
+    """
+
+    def __init__(self, directory):
+        """Opens an existing store.
+
+        Args:
+            directory (str or Path): directory of the store.
+        """
+        self.directory = Path(directory)
+
+    @classmethod
+    def create(cls, ris_df: pd.DataFrame, rayyan_df: pd.DataFrame, root, previous=None):
+        """Writes the tables of a search into a new store.
+
+        Args:
+            ris_df (pd.DataFrame): RIS table, one row per paper with id,
+                title, date and doi. The findpapers paper key is added.
+            rayyan_df (pd.DataFrame): Rayyan table.
+            root (str or Path): directory holding all stores.
+            previous (ReviewStore, optional): store of earlier results,
+                its full-text index is reused. Defaults to None.
+
+        Returns:
+            ReviewStore: the new store.
+        """
+        store = cls(Path(root) / uuid.uuid4().hex)
+        store.directory.mkdir(parents=True)
+        ris_df = ris_df.assign(paper_key=paper_keys(ris_df['title'], ris_df['date'],
+                                                    ris_df['doi']))
+        feather.write_feather(_to_table(ris_df), store.directory / 'ris.arrow',
+                              compression='uncompressed')
+        feather.write_feather(_to_table(rayyan_df), store.directory / 'rayyan.arrow',
+                              compression='uncompressed')
+
+        # only papers that are new or changed since the previous store are
+        # indexed, papers that are no longer found are removed
+        if previous is not None and previous.index_path.exists():
+            shutil.copyfile(previous.index_path, store.index_path)
+            store.index.retain(ris_df['paper_key'].tolist())
+        store.index.update(ris_df['paper_key'].tolist(), ris_df['title'].tolist(),
+                           ris_df.get('abstract', pd.Series('', index=ris_df.index)).tolist())
+        return store
+
+    @property
+    def index_path(self) -> Path:
+        return self.directory / 'fulltext.sqlite'
+
+    @property
+    def index(self) -> FullTextIndex:
+        """Full-text index of titles and abstracts."""
+        return FullTextIndex(self.index_path)
+
+    def search(self, text: str) -> list:
+        """Rows of the papers matching all words, best match first.
+
+        Args:
+            text (str): words to search for in titles and abstracts.
+
+        Returns:
+            list: row numbers.
+        """
+        keys = self.index.search(text)
+        if not keys:
+            return []
+        rows, _ = match_keys(self.read(['paper_key']).paper_key, keys)
+        return rows.tolist()
+
+    def read(self, columns: list = None, table: str = 'ris',
+             start: int = 0, stop: int = None, rows: list = None) -> pd.DataFrame:
+        """Reads a projection of a table.
+
+        Args:
+            columns (list, optional): columns to read. Defaults to all.
+            table (str, optional): 'ris' or 'rayyan'. Defaults to 'ris'.
+            start (int, optional): first row. Defaults to 0.
+            stop (int, optional): row after the last row. Defaults to all.
+            rows (list, optional): row numbers to read instead of the
+                range. Defaults to None.
+
+        Returns:
+            pd.DataFrame: requested columns, indexed by row number.
+        """
+        data = feather.read_table(self.directory / f'{table}.arrow', columns=columns,
+                                  memory_map=True)
+        if rows is not None:
+            df = data.take(pa.array(rows, type=pa.int64())).to_pandas()
+            df.index = pd.Index(rows, dtype='int64')
+            return df
+        stop = data.num_rows if stop is None else min(stop, data.num_rows)
+        df = data.slice(start, max(stop - start, 0)).to_pandas()
+        df.index = pd.RangeIndex(start, start + len(df))
+        return df
+
+    def columns(self, table: str = 'ris') -> list:
+        """Column names of a table.
+
+        Args:
+            table (str, optional): 'ris' or 'rayyan'. Defaults to 'ris'.
+
+        Returns:
+            list: column names.
+        """
+        return feather.read_table(self.directory / f'{table}.arrow',
+                                  memory_map=True).column_names
+
+    def __len__(self) -> int:
+        return feather.read_table(self.directory / 'ris.arrow', columns=['id'],
+                                  memory_map=True).num_rows
+
+    def delete(self):
+        """Removes the store from disk."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def new_decisions(store: ReviewStore) -> pd.DataFrame:
+    """Initial review decisions, every paper is included and not reviewed.
+
+    Args:
+        store (ReviewStore): papers under review.
+
+    Returns:
+        pd.DataFrame: id, decision and editable columns of each paper.
+    """
+    editable = [column for column in EDITABLE_COLUMNS if column in store.columns()]
+    decisions = store.read(['id'] + editable)
+    decisions.insert(1, 'criteria', 'default')
+    decisions.insert(1, 'decision', True)
+    decisions.insert(1, 'reviewed', False)
+    return decisions
+
+
+def review_view(store: ReviewStore, decisions: pd.DataFrame,
+                columns: list = None, start: int = 0, stop: int = None,
+                rows: list = None) -> pd.DataFrame:
+    """Papers joined with their review decisions.
+
+    Args:
+        store (ReviewStore): papers under review.
+        decisions (pd.DataFrame): review decisions in store order.
+        columns (list, optional): paper columns to read. Defaults to all.
+        start (int, optional): first row. Defaults to 0.
+        stop (int, optional): row after the last row. Defaults to all.
+        rows (list, optional): row numbers to show instead of the range,
+            in this order. Defaults to None.
+
+    Returns:
+        pd.DataFrame: review table with the decision columns after the
+            first paper column.
+    """
+    if columns is None:
+        columns = store.columns()
+    overlay = [column for column in decisions.columns if column != 'id']
+    papers = store.read(['id'] + [c for c in columns if c != 'id' and c not in overlay],
+                        start=start, stop=stop, rows=rows)
+    selected = decisions.iloc[start:stop] if rows is None else decisions.iloc[rows]
+    review = papers.merge(selected, on='id', how='left', validate='one_to_one')
+    first = papers.columns[:1].tolist()
+    rest = [c for c in review.columns if c not in first + DECISION_COLUMNS]
+    return review[first + DECISION_COLUMNS + rest]
+
+
+def changed_decisions(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Decisions that were edited, e.g. in a page of the review table.
+
+    Args:
+        before (pd.DataFrame): decisions sent to the table.
+        after (pd.DataFrame): decisions returned by the table, may hold
+            further columns.
+
+    Returns:
+        pd.DataFrame: rows of after that differ from before.
+    """
+    before = before.set_index('id')
+    after = after.set_index('id').reindex(index=before.index, columns=before.columns)
+    equal = (before == after) | (before.isna() & after.isna())
+    return after.loc[~equal.all(axis=1)].reset_index()
+
+
+def apply_decisions(decisions: pd.DataFrame, changes: pd.DataFrame) -> int:
+    """Writes changed decisions back in place.
+
+    Args:
+        decisions (pd.DataFrame): all review decisions.
+        changes (pd.DataFrame): changed rows with id and the changed columns.
+
+    Returns:
+        int: number of updated papers.
+    """
+    if changes.empty:
+        return 0
+    positions = pd.Index(decisions['id']).get_indexer(changes['id'])
+    changes = changes.loc[positions >= 0]
+    positions = positions[positions >= 0]
+    for column in changes.columns.drop('id'):
+        decisions.iloc[positions, decisions.columns.get_loc(column)] = changes[column].values
+    return len(positions)
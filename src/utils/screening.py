@@ -0,0 +1,269 @@
+"""Team screening with sharded assignments and an append-only decision log."""
+
+import hashlib
+import itertools
+import sqlite3
+import time
+import numpy as np
+import pandas as pd
+
+from contextlib import contextmanager
+from pathlib import Path
+from utils.review_store import match_keys
+
+EVENT_COLUMNS = ['id', 'paper_key', 'reviewer', 'decision', 'criteria', 'final', 'created_at']
+CONSOLIDATED_COLUMNS = ['votes', 'includes', 'excludes', 'status', 'decision']
+
+
+def shard_of(paper_keys, n_shards: int) -> np.ndarray:
+    """Shard of each paper, stable across searches and processes.
+
+    Args:
+        paper_keys (iterable): paper keys.
+        n_shards (int): number of shards.
+
+    Returns:
+        np.ndarray: shard number of each paper.
+    """
+    return np.array([int.from_bytes(hashlib.sha1(str(key).encode('utf-8')).digest()[:8], 'big')
+                     % n_shards for key in paper_keys], dtype=np.int64)
+
+
+class ScreeningLog:
+    """SQLite log of the screening decisions of a team.
+
+    Decisions are only appended, never updated, so reviewers screening
+    at the same time cannot overwrite each other. The latest decision of
+    each reviewer counts, decisions marked as final resolve conflicts.
+    Reviews are identified by the result key of their search and papers
+    by their paper key.
+    """
+
+    def __init__(self, path):
+        """Opens the log and creates the tables if needed.
+
+        Args:
+            path (str or Path): location of the SQLite file.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS screening_assignments ("
+                "review TEXT NOT NULL, "
+                "shard INTEGER NOT NULL, "
+                "reviewer TEXT NOT NULL, "
+                "n_shards INTEGER NOT NULL, "
+                "PRIMARY KEY (review, shard, reviewer))"
+            )
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS screening_events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "review TEXT NOT NULL, "
+                "paper_key TEXT NOT NULL, "
+                "reviewer TEXT NOT NULL, "
+                "decision INTEGER NOT NULL, "
+                "criteria TEXT, "
+                "final INTEGER NOT NULL DEFAULT 0, "
+                "created_at REAL NOT NULL)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS screening_events_review "
+                        "ON screening_events (review, reviewer)")
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(str(self.path), timeout=30)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def assign(self, review: str, reviewers: list, n_shards: int, per_shard: int = 2):
+        """Splits a review into shards and assigns them round robin.
+
+        Earlier assignments of the review are replaced, its decisions
+        are kept.
+
+        Args:
+            review (str): result key of the search.
+            reviewers (list): reviewer ids.
+            n_shards (int): number of shards.
+            per_shard (int, optional): reviewers screening each paper,
+                e.g. 2 for dual screening. Defaults to 2.
+        """
+        reviewers = list(dict.fromkeys(reviewers))
+        per_shard = min(per_shard, len(reviewers))
+        rows = [(review, shard, reviewers[(shard + offset) % len(reviewers)], n_shards)
+                for shard in range(n_shards) for offset in range(per_shard)]
+        with self._connect() as con:
+            con.execute("DELETE FROM screening_assignments WHERE review = ?", (review,))
+            con.executemany(
+                "INSERT INTO screening_assignments (review, shard, reviewer, n_shards) "
+                "VALUES (?, ?, ?, ?)", rows
+            )
+
+    def assignment(self, review: str) -> tuple:
+        """Shards of each reviewer.
+
+        Args:
+            review (str): result key of the search.
+
+        Returns:
+            tuple: number of shards (None if not assigned) and the shards
+                of each reviewer (dict).
+        """
+        with self._connect() as con:
+            rows = con.execute(
+                "SELECT shard, reviewer, n_shards FROM screening_assignments "
+                "WHERE review = ? ORDER BY shard", (review,)
+            ).fetchall()
+        shards = {}
+        for shard, reviewer, _ in rows:
+            shards.setdefault(reviewer, []).append(shard)
+        return (rows[0][2] if rows else None), shards
+
+    def record(self, review: str, reviewer: str, paper_keys: list, decisions: list,
+               criteria: str = None, final: bool = False) -> int:
+        """Appends decisions of a reviewer.
+
+        Args:
+            review (str): result key of the search.
+            reviewer (str): reviewer id.
+            paper_keys (list): decided papers.
+            decisions (list): whether each paper is included.
+            criteria (str, optional): exclusion criteria. Defaults to None.
+            final (bool, optional): resolves the decisions of all
+                reviewers, e.g. by a third reviewer. Defaults to False.
+
+        Returns:
+            int: number of recorded decisions.
+        """
+        now = time.time()
+        rows = [(review, str(key), reviewer, int(bool(decision)), criteria, int(final), now)
+                for key, decision in zip(paper_keys, decisions)]
+        with self._connect() as con:
+            con.executemany(
+                "INSERT INTO screening_events "
+                "(review, paper_key, reviewer, decision, criteria, final, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def events(self, review: str, reviewer: str = None) -> pd.DataFrame:
+        """Decisions in the order they were recorded.
+
+        Args:
+            review (str): result key of the search.
+            reviewer (str, optional): only the decisions of this reviewer.
+                Defaults to all reviewers.
+
+        Returns:
+            pd.DataFrame: one row per recorded decision.
+        """
+        query = f"SELECT {', '.join(EVENT_COLUMNS)} FROM screening_events WHERE review = ?"
+        params = (review,)
+        if reviewer is not None:
+            query += " AND reviewer = ?"
+            params += (reviewer,)
+        with self._connect() as con:
+            rows = con.execute(query + " ORDER BY id", params).fetchall()
+        events = pd.DataFrame(rows, columns=EVENT_COLUMNS)
+        return events.astype({'decision': bool, 'final': bool})
+
+
+def latest_votes(events: pd.DataFrame) -> pd.DataFrame:
+    """Latest decision of each reviewer on each paper, final ones excluded.
+
+    Args:
+        events (pd.DataFrame): decisions as returned by ScreeningLog.events.
+
+    Returns:
+        pd.DataFrame: one row per paper and reviewer.
+    """
+    votes = events.loc[~events['final']]
+    return votes.drop_duplicates(['paper_key', 'reviewer'], keep='last')
+
+
+def reviewer_decisions(events: pd.DataFrame, paper_keys: pd.Series, ids: pd.Series) -> pd.DataFrame:
+    """Latest decisions of one reviewer as changes of the review decisions.
+
+    Args:
+        events (pd.DataFrame): decisions of the reviewer.
+        paper_keys (pd.Series): paper key of each paper in store order.
+        ids (pd.Series): id of each paper in store order.
+
+    Returns:
+        pd.DataFrame: id, reviewed, decision and criteria of the decided
+            papers, see review_store.apply_decisions.
+    """
+    votes = latest_votes(events)
+    rows, positions = match_keys(paper_keys, votes['paper_key'])
+    return pd.DataFrame({'id': ids.values[rows],
+                         'reviewed': True,
+                         'decision': votes['decision'].values[positions],
+                         'criteria': votes['criteria'].fillna('default').values[positions]})
+
+
+def consolidate(events: pd.DataFrame) -> pd.DataFrame:
+    """Merges the decisions of all reviewers into one decision per paper.
+
+    The merge only depends on the set of events, so reviewers never
+    conflict on the log itself. Papers are 'single' with one vote,
+    'agreed' if all votes are equal and 'conflict' otherwise, until a
+    final decision marks them 'resolved'. Conflicts have no decision.
+
+    Args:
+        events (pd.DataFrame): decisions as returned by ScreeningLog.events.
+
+    Returns:
+        pd.DataFrame: votes, includes, excludes, status and decision,
+            indexed by paper key.
+    """
+    votes = latest_votes(events)
+    counts = votes.groupby('paper_key')['decision'].agg(['size', 'sum'])
+    merged = pd.DataFrame({'votes': counts['size'], 'includes': counts['sum'],
+                           'excludes': counts['size'] - counts['sum']},
+                          index=counts.index).astype(int)
+    merged['status'] = np.select([merged['includes'] == merged['votes'],
+                                  merged['excludes'] == merged['votes']],
+                                 ['agreed', 'agreed'], 'conflict')
+    merged.loc[merged['votes'] == 1, 'status'] = 'single'
+    merged['decision'] = pd.Series(merged['includes'] > 0, dtype=object) \
+        .where(merged['status'] != 'conflict', None)
+
+    final = events.loc[events['final']].drop_duplicates('paper_key', keep='last') \
+        .set_index('paper_key')['decision']
+    merged = merged.reindex(merged.index.union(final.index))
+    merged[['votes', 'includes', 'excludes']] = \
+        merged[['votes', 'includes', 'excludes']].fillna(0).astype(int)
+    merged.loc[final.index, 'status'] = 'resolved'
+    merged.loc[final.index, 'decision'] = final.astype(object)
+    return merged[CONSOLIDATED_COLUMNS]
+
+
+def agreement(events: pd.DataFrame) -> pd.DataFrame:
+    """Inter-rater agreement of each pair of reviewers.
+
+    Args:
+        events (pd.DataFrame): decisions as returned by ScreeningLog.events.
+
+    Returns:
+        pd.DataFrame: papers both reviewers decided, share of equal
+            decisions and Cohen's kappa (NaN if the chance agreement
+            is 1) of each pair.
+    """
+    votes = latest_votes(events).pivot(index='paper_key', columns='reviewer', values='decision')
+    rows = []
+    for first, second in itertools.combinations(sorted(votes.columns), 2):
+        both = votes[[first, second]].dropna()
+        if len(both) == 0:
+            continue
+        a, b = both[first].astype(bool).values, both[second].astype(bool).values
+        observed = np.mean(a == b)
+        chance = a.mean() * b.mean() + (1 - a.mean()) * (1 - b.mean())
+        kappa = (observed - chance) / (1 - chance) if chance < 1 else np.nan
+        rows.append({'reviewer_a': first, 'reviewer_b': second, 'papers': len(both),
+                     'agreement': observed, 'kappa': kappa})
+    return pd.DataFrame(rows, columns=['reviewer_a', 'reviewer_b', 'papers', 'agreement', 'kappa'])
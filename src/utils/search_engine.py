@@ -1,36 +1,249 @@
 """Search functionalities definition."""
 
-import json
+import tempfile
+import uuid
+import numpy as np
 import streamlit as st
-import findpapers as fp
 import utils.consts as cs
 
+from pathlib import Path
+from utils.jobs import JobQueue, FINISHED, FAILED
+from utils.pipeline import get_result_store, resume_arguments, papers_to_frame, variant_search
+from utils.query import join_string_in_list, canonical_query, QuerySyntaxError
+from utils.query_set import variant_summary, overlap_matrix
+from utils.review_store import ReviewStore, new_decisions
+from utils.screening import ScreeningLog
+from utils.prioritization import RelevanceModel, TfidfMatrix, tfidf_matrix, screening_queue
 
-@st.cache
-def convert_search_to_json(search: fp.models.search):
-    """Cachs the converted search results
+
+def get_export_dir(name: str) -> Path:
+    """Returns the export directory of the session.
+
+    Args:
+        name (str): name of the export, e.g. search or review.
+
+    Returns:
+        Path: directory for the export files.
+    """
+    if 'export_id' not in st.session_state:
+        st.session_state.export_id = uuid.uuid4().hex
+    return Path(tempfile.gettempdir()) / "set_you_free" / st.session_state.export_id / name
+
+
+def download_buttons(paths: dict):
+    """Shows the download buttons of the exports.
 
     Args:
-        search (findpapers.models.search): search results
+        paths (dict): path of the 'json', 'ris' and 'rayyan' export and
+            optionally of the 'citations' edge list and the run 'profile'.
+    """
+    buttons = [button for button in (('json', 'Details - JSON', 'application/json'),
+                                      ('ris', 'CADIMA - RIS', 'text/plain'),
+                                      ('rayyan', 'Rayyan - CSV', 'text/csv'),
+                                      ('citations', 'Citation graph - CSV', 'text/csv'),
+                                      ('profile', 'Run profile - JSONL', 'application/json'))
+               if button[0] in paths]
+    for col, (export, label, mime) in zip(st.columns(len(buttons)), buttons):
+        path = Path(paths[export])
+        with open(path, 'rb') as file:
+            col.download_button(label=label,
+                                data=file,
+                                file_name=path.name,
+                                mime='application/gzip' if path.suffix == '.gz' else mime)
+
+
+def store_review(result_key: str, store: ReviewStore, export_options: dict,
+                 citations: dict = None):
+    """Starts the review of search results, replacing earlier results.
+
+    Results and review stores are shared by all sessions, the session
+    only keeps references to them and the decisions of the reviewer.
+    The results are pinned in the result store while they are reviewed.
+
+    Args:
+        result_key (str): key of the results in the shared result store.
+        store (ReviewStore): shared review store of the results.
+        export_options (dict): arguments of export_search.
+        citations (dict, optional): arguments of shared_citations if
+            snowballed papers are reviewed as well. Defaults to None.
+    """
+    st.session_state.pop('review_export', None)
+    st.session_state.result_key = result_key
+    st.session_state.export_options = export_options
+    st.session_state.citations = citations
+    st.session_state.store = store
+    st.session_state.decisions = new_decisions(store)
+    get_result_store().pin(result_key)
+
+
+def review_available() -> bool:
+    """Whether the session has results to review that were not evicted.
+
+    Each check renews the pin of the results, so results that are
+    still reviewed are not evicted by other searches.
+
+    Returns:
+        bool: whether the review store of the session exists.
+    """
+    if 'store' not in st.session_state or not st.session_state.store.directory.exists():
+        return False
+    get_result_store().pin(st.session_state.result_key)
+    return True
+
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """Returns the queue of background searches.
+
+    Returns:
+        JobQueue: background job queue.
+    """
+    return JobQueue(cs.CACHE_PATH, cs.JOB_WORKERS)
+
+
+@st.cache_resource
+def get_screening_log() -> ScreeningLog:
+    """Returns the decision log shared by all reviewers.
 
     Returns:
-        json (meme): encoded json
+        ScreeningLog: persistent screening log.
     """
-    results = fp.models.search.Search.to_dict(search)
-    result = json.dumps(results, indent=2, sort_keys=True)
-    return result
+    return ScreeningLog(cs.CACHE_PATH)
 
 
-def join_string_in_list(list_of_string: list) -> str:
-    """Joins the list of queries into one complete query.
+@st.cache_resource
+def get_tfidf_matrix(directory: str) -> TfidfMatrix:
+    """TF-IDF vectors of the papers of a review store, shared by all sessions.
 
     Args:
-        list_of_string (list): List of queries.
+        directory (str): directory of the review store.
 
     Returns:
-        str: All queries combined.
+        TfidfMatrix: vectors of the titles and abstracts.
     """
-    return ' '.join(list_of_string)
+    store = ReviewStore(directory)
+    columns = [column for column in ('title', 'abstract') if column in store.columns()]
+    papers = store.read(columns).fillna('').astype(str)
+    return tfidf_matrix(papers.apply(' '.join, axis=1).tolist())
+
+
+def relevance_queue(store: ReviewStore, decisions) -> tuple:
+    """Predicted relevance of the papers, learned from the session's decisions.
+
+    The model of the session is only updated when decisions changed.
+
+    Args:
+        store (ReviewStore): papers under review.
+        decisions (pd.DataFrame): review decisions in store order.
+
+    Returns:
+        tuple: trained model, probability of each paper and the rows of
+            the unreviewed papers, most likely includes first.
+    """
+    matrix = get_tfidf_matrix(str(store.directory))
+    model = st.session_state.get('relevance_model')
+    if model is None or st.session_state.get('relevance_store') != store.directory:
+        model = st.session_state.relevance_model = RelevanceModel(matrix.shape[1])
+        st.session_state.relevance_store = store.directory
+        st.session_state.relevance_labels = None
+        st.session_state.screening_history = []
+    labeled = np.flatnonzero(decisions.reviewed.values.astype(bool))
+    labels = decisions.decision.values[labeled].astype(bool)
+    fingerprint = hash((labeled.tobytes(), labels.tobytes()))
+    if st.session_state.relevance_labels != fingerprint:
+        model.fit(matrix, labeled, labels)
+        st.session_state.relevance = model.predict(matrix)
+        st.session_state.relevance_labels = fingerprint
+    probabilities = st.session_state.relevance
+    return model, probabilities, screening_queue(probabilities, decisions.reviewed.values)
+
+
+def submit_search_job(query: str,
+                      since,
+                      until,
+                      limit: int,
+                      databases: list,
+                      scopus_api_token: str = None,
+                      ieee_api_token: str = None,
+                      **search_kwargs) -> str:
+    """Submits a search to the background queue.
+
+    Args:
+        query (str): search string.
+        since (datetime.date): start date.
+        until (datetime.date): end date.
+        limit (int): maximum number of papers per database.
+        databases (list): databases to search.
+        scopus_api_token (str, optional): Scopus API key. Defaults to None.
+        ieee_api_token (str, optional): IEEE API key. Defaults to None.
+        **search_kwargs: further arguments of search_databases.
+
+    Returns:
+        str: job id.
+    """
+    params = dict(query=query, since=since.isoformat(), until=until.isoformat(),
+                  limit=limit, databases=list(databases), **search_kwargs)
+    secrets = dict(scopus_api_token=scopus_api_token, ieee_api_token=ieee_api_token)
+    job_id = get_job_queue().submit(params, secrets)
+    if 'jobs' not in st.session_state:
+        st.session_state.jobs = []
+    st.session_state.jobs.append(job_id)
+    return job_id
+
+
+def show_background_jobs(loadable: bool = True):
+    """Shows the background searches of the session.
+
+    Args:
+        loadable (bool, optional): offer to load finished results.
+            Defaults to True.
+
+    Returns:
+        str: result key of the search selected for loading or None.
+    """
+    if not st.session_state.get('jobs'):
+        return None
+    queue = get_job_queue()
+    loaded = None
+    with st.expander("Background searches", expanded=True):
+        for job_id in reversed(st.session_state.jobs):
+            job = queue.status(job_id)
+            if job is None:
+                continue
+            info_col, action_col = st.columns([3, 1])
+            info_col.write(f"**{job['params']['query']}** - {job['status']}"
+                           + (f" ({job['message']})" if job['message'] else ""))
+            if job['status'] == FAILED:
+                info_col.error(job['error'])
+            elif job['status'] != FINISHED:
+                info_col.progress(job['progress'])
+            elif loadable and action_col.button("Load", key=f"load_{job_id}"):
+                loaded = queue.result(job_id).get('key')
+        st.button("Refresh status")
+    return loaded
+
+
+def show_interrupted_searches():
+    """Offers to resume searches that failed or were cancelled.
+
+    Returns:
+        dict: arguments of shared_search of the search to resume or None.
+    """
+    runs = get_result_store().interrupted_runs()
+    if not runs:
+        return None
+    resumed = None
+    with st.expander(f"Interrupted searches ({len(runs)})"):
+        st.caption("Resumed searches reuse the databases and enrichment batches "
+                   "that finished before. API keys are taken from the sidebar.")
+        for run in runs:
+            params = run['params']
+            info_col, action_col = st.columns([3, 1])
+            info_col.write(f"**{params['query']}** - {', '.join(params['databases'])}")
+            info_col.caption(run['error'])
+            if action_col.button("Resume", key=f"resume_{run['key']}"):
+                resumed = resume_arguments(run)
+    return resumed
 
 
 def get_search_str():
@@ -47,6 +260,24 @@ def get_search_str():
     return search_string
 
 
+def check_search_str(search_string: str) -> str:
+    """Validates the search string and shows its canonical form.
+
+    Args:
+        search_string (str): search string.
+
+    Returns:
+        str: canonical search string or None if it is invalid.
+    """
+    try:
+        canonical = canonical_query(search_string)
+    except QuerySyntaxError as error:
+        st.error(f"Invalid search string: {error}")
+        return None
+    st.caption(f"Canonical search string: {canonical}")
+    return canonical
+
+
 def build_search_str():
     """Builds the search string.
 
@@ -104,6 +335,52 @@ def single_search_str():
     return search_str_txt
 
 
+def query_set_str() -> tuple:
+    """Search string variants to compare, one per line.
+
+    Returns:
+        tuple: valid canonical variants (list) and the compare button state.
+    """
+    lines = st.text_area("Please enter one search string per line "
+                         "(e.g., [ASD] AND ([fMRI] OR [fNIRS]))",
+                         "", help=cs.HELP_QUERY_SET).splitlines()
+    compare_btn = st.button("Compare")
+
+    variants = []
+    for n, line in enumerate(lines):
+        if line.strip() == "":
+            continue
+        try:
+            variants.append(canonical_query(line))
+        except QuerySyntaxError as error:
+            st.error(f"Invalid search string in line {n + 1}: {error}")
+            compare_btn = False
+    if compare_btn and len(set(variants)) < 2:
+        st.error("Please enter at least two different search strings")
+        compare_btn = False
+    return variants, compare_btn
+
+
+def show_query_comparison(result):
+    """Shows how the variants of a query set overlap.
+
+    Args:
+        result (QuerySetResult): compared variants.
+    """
+    st.caption(f"{len(result.variants)} variants from {len(result.clauses)} "
+               f"searched clauses: {', '.join(result.clauses)}")
+    for failure in result.failed:
+        st.warning(failure)
+    if result.truncated:
+        st.warning("These clauses reached the maximum number of papers, so the "
+                   f"variants may miss papers: {', '.join(result.truncated)}")
+    st.dataframe(variant_summary(result.variants))
+    with st.expander("Shared papers of each pair of variants"):
+        st.dataframe(overlap_matrix(result.variants))
+    variant = st.selectbox("Show the papers of", list(result.variants))
+    st.dataframe(papers_to_frame([variant_search(result, variant)]))
+
+
 def clear_search_str(search_str_txt, clear_all: bool = False):
     """Clears the search string.
 
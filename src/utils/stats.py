@@ -0,0 +1,191 @@
+"""Overlap and PRISMA statistics of the databases of a review."""
+
+import numpy as np
+import pandas as pd
+import utils.consts as cs
+
+from collections import namedtuple
+
+Overlap = namedtuple('Overlap', ['sources', 'masks', 'counts'])
+Prisma = namedtuple('Prisma', ['identified', 'duplicates', 'screened', 'excluded', 'included'])
+
+
+def database_masks(databases: pd.Series, sources: list = None) -> tuple:
+    """Encodes the databases of each paper as a bitmask.
+
+    Args:
+        databases (pd.Series): list of databases of each paper.
+        sources (list, optional): databases in bit order, matched case
+            insensitively. Defaults to cs.AVAILABLE_DATABASES.
+
+    Returns:
+        tuple: sources and the bitmask of each paper (np.ndarray).
+    """
+    sources = list(cs.AVAILABLE_DATABASES if sources is None else sources)
+    lengths = np.fromiter((len(value) if value is not None else 0 for value in databases),
+                          dtype=np.int64, count=len(databases))
+    if lengths.sum() == 0:
+        return sources, np.zeros(len(databases), dtype=np.int64)
+    names = pd.Series(np.concatenate([value for value in databases if value is not None
+                                      and len(value)]).astype(str)).str.lower()
+    codes = pd.Index([source.lower() for source in sources]).get_indexer(names)
+    rows = np.repeat(np.arange(len(databases)), lengths)
+    known = codes >= 0
+    # the databases of a paper are unique, so the sum of the bits is their union
+    masks = np.bincount(rows[known], weights=np.left_shift(1, codes[known].astype(np.int64)),
+                        minlength=len(databases)).astype(np.int64)
+    return sources, masks
+
+
+def overlap(databases: pd.Series, sources: list = None) -> Overlap:
+    """Counts the papers of every combination of databases.
+
+    Args:
+        databases (pd.Series): list of databases of each paper.
+        sources (list, optional): databases in bit order.
+            Defaults to cs.AVAILABLE_DATABASES.
+
+    Returns:
+        Overlap: sources, bitmask of each paper and the number of papers
+            found by exactly the databases of each bitmask.
+    """
+    sources, masks = database_masks(databases, sources)
+    return Overlap(sources, masks, np.bincount(masks, minlength=2 ** len(sources)))
+
+
+def popcount(values: np.ndarray) -> np.ndarray:
+    """Number of set bits of each value."""
+    values = values.astype(np.int64)
+    bits = np.zeros(len(values), dtype=np.int64)
+    while values.any():
+        bits += values & 1
+        values = values >> 1
+    return bits
+
+
+def venn_subsets(stats: Overlap, selected: list) -> tuple:
+    """Region sizes of a Venn diagram of two or three databases.
+
+    Args:
+        stats (Overlap): overlap statistics.
+        selected (list): two or three of the sources.
+
+    Returns:
+        tuple: subsets in the order of matplotlib_venn.venn2/venn3.
+    """
+    lower = [source.lower() for source in stats.sources]
+    bits = [lower.index(source.lower()) for source in selected]
+    # regions are numbered with the first set as the highest bit
+    projected = np.zeros(len(stats.masks), dtype=np.int64)
+    for position, bit in enumerate(bits):
+        projected |= ((stats.masks >> bit) & 1) << (len(bits) - 1 - position)
+    counts = np.bincount(projected, minlength=2 ** len(bits))
+    if len(bits) == 2:
+        order = (0b10, 0b01, 0b11)
+    else:
+        order = (0b100, 0b010, 0b110, 0b001, 0b101, 0b011, 0b111)
+    return tuple(int(counts[region]) for region in order)
+
+
+def prisma_counts(stats: Overlap, n_included: int) -> Prisma:
+    """Record counts of the PRISMA flow diagram.
+
+    Args:
+        stats (Overlap): overlap statistics of the deduplicated papers.
+        n_included (int): papers left after the manual screening.
+
+    Returns:
+        Prisma: identified records, removed duplicates, screened,
+            excluded and included papers.
+    """
+    identified = int(popcount(stats.masks).sum())
+    screened = len(stats.masks)
+    return Prisma(identified, identified - screened, screened,
+                  screened - n_included, n_included)
+
+
+def prisma_dot(counts: Prisma) -> str:
+    """PRISMA flow diagram in the DOT language.
+
+    Streamlit renders DOT sources directly, so the graphviz package is
+    not needed.
+
+    Args:
+        counts (Prisma): record counts.
+
+    Returns:
+        str: DOT source of the diagram.
+    """
+    return '\n'.join([
+        'digraph PRISMA {',
+        '\tnode [shape=box]',
+        f'\tIdentification [label=" {counts.identified} records identified"]',
+        f'\t"Auto screening" [label=" {counts.screened} records after duplicate removal"]',
+        f'\t"Manual screening" [label=" {counts.included} records after manual screeening"]',
+        f'\tIdentification -> "Auto screening" [label={counts.duplicates}]',
+        f'\t"Auto screening" -> "Manual screening" [label={counts.excluded}]',
+        '}',
+    ])
+
+
+def overlap_figure(stats: Overlap, selected: list):
+    """Venn diagram of two or three databases, UpSet chart otherwise.
+
+    Args:
+        stats (Overlap): overlap statistics.
+        selected (list): searched databases.
+
+    Returns:
+        matplotlib.figure.Figure: overlap of the databases.
+    """
+    if len(selected) not in (2, 3):
+        return upset_figure(stats)
+    from matplotlib.figure import Figure
+    from matplotlib_venn import venn2, venn3
+
+    # figures outside of pyplot are freed with the session
+    fig = Figure()
+    venn = venn2 if len(selected) == 2 else venn3
+    venn(subsets=venn_subsets(stats, selected), set_labels=selected, ax=fig.add_subplot())
+    return fig
+
+
+def upset_figure(stats: Overlap, max_bars: int = cs.UPSET_MAX_BARS):
+    """UpSet chart of the database combinations, largest first.
+
+    Args:
+        stats (Overlap): overlap statistics.
+        max_bars (int, optional): maximum number of combinations shown.
+            Defaults to cs.UPSET_MAX_BARS.
+
+    Returns:
+        matplotlib.figure.Figure: bar chart of the combination sizes above
+            a matrix of the databases in each combination.
+    """
+    from matplotlib.figure import Figure
+
+    combinations = np.flatnonzero(stats.counts[1:]) + 1
+    combinations = combinations[np.argsort(-stats.counts[combinations], kind='stable')][:max_bars]
+    used = [bit for bit in range(len(stats.sources))
+            if any((combination >> bit) & 1 for combination in combinations)]
+
+    fig = Figure(figsize=(max(4, 0.4 * len(combinations) + 2), 5))
+    bars, matrix = fig.subplots(2, 1, sharex=True, gridspec_kw={'height_ratios': [3, 2]})
+    x = np.arange(len(combinations))
+    bars.bar(x, stats.counts[combinations], color='#4c72b0')
+    bars.set_ylabel('Papers')
+    for row, bit in enumerate(used):
+        members = (combinations >> bit) & 1 == 1
+        matrix.scatter(x, np.full(len(x), row), color=np.where(members, 'black', 'lightgrey'))
+    for column, combination in zip(x, combinations):
+        rows = [row for row, bit in enumerate(used) if (combination >> bit) & 1]
+        matrix.plot([column, column], [min(rows), max(rows)], color='black')
+    matrix.set_yticks(range(len(used)))
+    matrix.set_yticklabels([stats.sources[bit] for bit in used])
+    matrix.set_xticks([])
+    matrix.set_ylim(-0.5, len(used) - 0.5)
+    for axis in (bars, matrix):
+        for side in ('top', 'right'):
+            axis.spines[side].set_visible(False)
+    fig.tight_layout()
+    return fig
@@ -0,0 +1,39 @@
+import datetime
+import time
+
+from src.utils.cache import SearchCache, make_cache_key
+
+
+def test_make_cache_key_is_canonical():
+    key = make_cache_key("[ASD]  AND [fMRI]", ["PubMed", "arXiv"],
+                         datetime.date(2021, 10, 1), datetime.date(2022, 1, 1),
+                         ["journal"], 10)
+    same = make_cache_key("[ASD] AND [fMRI] ", ["arxiv", "pubmed"],
+                          datetime.date(2021, 10, 1), datetime.date(2022, 1, 1),
+                          ["Journal"], 10)
+    other = make_cache_key("[ASD] AND [fMRI]", ["PubMed", "arXiv"],
+                           datetime.date(2021, 10, 1), datetime.date(2022, 1, 1),
+                           ["journal"], 20)
+    assert key == same
+    assert key != other
+
+
+def test_search_cache_ttl_and_lru(tmp_path):
+    cache = SearchCache(tmp_path / "cache.sqlite", ttl=60, max_entries=2)
+    cache.put("a", {"papers": [1]})
+    cache.put("b", {"papers": [2]})
+    assert cache.get("a") == {"papers": [1]}
+    cache.put("c", {"papers": [3]})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"papers": [1]}
+    assert len(cache) == 2
+
+    cache.ttl = -1
+    assert cache.get("c") is None
+
+
+def test_search_cache_ignores_entries_older_than_a_run(tmp_path):
+    cache = SearchCache(tmp_path / "cache.sqlite", ttl=60, max_entries=2)
+    cache.put("a", {"papers": [1]})
+    assert cache.get("a", newer_than=0) == {"papers": [1]}
+    assert cache.get("a", newer_than=time.time() + 1) is None
@@ -0,0 +1,42 @@
+from src.utils.citation_graph import expand_citations
+
+# a cites b, c and d; b and c cite d; d cites e
+CITES = {'a': ['b', 'c', 'd'], 'b': ['d'], 'c': ['d'], 'd': ['e'], 'e': []}
+
+
+def fetch_level(dois, timeout):
+    calls.append(list(dois))
+    edges = {}
+    for doi in dois:
+        cited_by = [citing for citing, cited in CITES.items() if doi in cited]
+        edges[doi] = [(doi, cited) for cited in CITES[doi]] + [(c, doi) for c in cited_by]
+    return edges
+
+
+calls = []
+
+
+def test_expansion_is_bounded_by_depth():
+    calls.clear()
+    graph = expand_citations(['A'], fetch_level, depth=1, max_nodes=10, time_budget=10)
+    assert graph.depth == {'a': 0, 'b': 1, 'c': 1, 'd': 1}
+    assert graph.complete
+    assert calls == [['a']]
+    assert graph.edge_frame().values.tolist() == [['a', 'b'], ['a', 'c'], ['a', 'd']]
+
+
+def test_expansion_prefers_most_cited_and_caps_nodes():
+    calls.clear()
+    graph = expand_citations(['b', 'c', 'e'], fetch_level, depth=3, max_nodes=4,
+                             time_budget=10)
+    # d is linked to all three seeds, a only to two of them
+    assert graph.depth == {'b': 0, 'c': 0, 'e': 0, 'd': 1}
+    assert not graph.complete
+    assert calls == [['b', 'c', 'e'], ['d']]
+    assert graph.node_frame().doi.tolist() == ['d', 'e', 'b', 'c']
+
+
+def test_expansion_stops_at_time_budget():
+    graph = expand_citations(['a'], fetch_level, depth=2, max_nodes=10, time_budget=0)
+    assert graph.depth == {'a': 0}
+    assert not graph.complete
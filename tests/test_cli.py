@@ -0,0 +1,42 @@
+import datetime
+import json
+
+import pytest
+
+from src.utils.cli import load_queries, slugify
+
+
+def test_load_queries_applies_defaults(tmp_path):
+    path = tmp_path / "queries.json"
+    path.write_text(json.dumps({
+        'defaults': {'databases': ['arXiv'], 'since': '2021-10-01', 'limit': 5},
+        'queries': ['[ASD] AND [fMRI]',
+                    {'name': 'fnirs', 'query': '[fNIRS]', 'limit': 50}]
+    }))
+
+    first, second = load_queries(path)
+
+    assert first['name'] == 'query_1'
+    assert first['databases'] == ['arXiv']
+    assert first['since'] == datetime.date(2021, 10, 1)
+    assert first['limit'] == 5
+    assert (second['name'], second['limit']) == ('fnirs', 50)
+
+
+def test_load_queries_rejects_unknown_options(tmp_path):
+    path = tmp_path / "queries.json"
+    path.write_text(json.dumps([{'query': '[ASD]', 'limits': 5}]))
+    with pytest.raises(ValueError):
+        load_queries(path)
+
+
+@pytest.mark.parametrize('names', [['fnirs', 'fnirs'], ['ASD / fMRI', 'asd fmri']])
+def test_load_queries_rejects_names_sharing_an_output_directory(tmp_path, names):
+    path = tmp_path / "queries.json"
+    path.write_text(json.dumps([{'name': name, 'query': '[ASD]'} for name in names]))
+    with pytest.raises(ValueError, match="same output directory"):
+        load_queries(path)
+
+
+def test_slugify():
+    assert slugify("ASD / fMRI (2022)") == "ASD_fMRI_2022"
@@ -0,0 +1,25 @@
+from src.utils.dedup import find_duplicate_pairs
+
+
+def test_find_duplicate_pairs_keeps_threshold_semantics():
+    titles = [
+        "Functional near-infrared spectroscopy in autism",
+        "Functional Near-Infrared Spectroscopy in Autism.",
+        "Functional near-infrared spectroscopy in autism",
+        "Hyperscanning of parent-child interaction",
+        "Hyperscanning of parent child interactions",
+        "Hyperscanning of parent-child interaction",
+    ]
+    years = [2021, 2021, 2019, 2020, 2020, 2020]
+    dois = [None, None, None, "10.1/a", "10.1/b", "10.1/A"]
+
+    pairs = find_duplicate_pairs(titles, years, dois, similarity_threshold=0.95)
+
+    # different year and conflicting DOIs are never merged, equal DOIs are
+    assert pairs == [(0, 1), (3, 5)]
+
+
+def test_find_duplicate_pairs_threshold():
+    titles = ["Deep learning for EEG", "Deep learning for fNIRS"]
+    assert find_duplicate_pairs(titles, [2020, 2020], [None, None], 0.95) == []
+    assert find_duplicate_pairs(titles, [2020, 2020], [None, None], 0.75) == [(0, 1)]
@@ -0,0 +1,121 @@
+import datetime
+import time
+import findpapers as fp
+
+from src.utils.cache import SearchCache
+from src.utils.enrichment import cached_lookup, content_key, enrich_search
+
+
+def test_content_key_prefers_doi():
+    assert content_key('10.1/ABC', 'A title') == content_key('10.1/abc ', 'Other title')
+    assert content_key(None, 'Deep  EEG: a review') == content_key(None, 'deep eeg a review')
+    assert content_key(None, 'deep eeg') != content_key('10.1/abc')
+    assert content_key(None, ' ') is None
+
+
+def test_cached_lookup_fetches_each_paper_once(tmp_path):
+    cache = SearchCache(tmp_path / 'enrichment.sqlite', ttl=60, max_entries=100)
+    calls = []
+
+    def fetch(item):
+        calls.append(item)
+        return None if item == 'offline' else {'abstract': item.upper()}
+
+    items = {'a': 'first', 'b': 'second', 'c': 'offline'}
+    payloads, fetched = cached_lookup(cache, 'metadata', items, fetch)
+    assert payloads == {'a': {'abstract': 'FIRST'}, 'b': {'abstract': 'SECOND'}}
+    assert fetched == {'a', 'b'}
+
+    payloads, fetched = cached_lookup(cache, 'metadata', items, fetch)
+    assert fetched == set()
+    assert sorted(calls) == ['first', 'offline', 'offline', 'second']
+    assert len(cache) == 2
+
+
+def test_cached_lookup_keeps_payloads_fetched_before_a_timeout(tmp_path):
+    cache = SearchCache(tmp_path / 'enrichment.sqlite', ttl=60, max_entries=100)
+
+    def fetch(item):
+        if item == 'slow':
+            time.sleep(1)
+        return {'abstract': item}
+
+    items = {'a': 'first', 'b': 'second', 'c': 'slow'}
+    payloads, fetched = cached_lookup(cache, 'metadata', items, fetch,
+                                      timeout=0.3, checkpoint=1)
+    assert fetched == {'a', 'b'}
+    assert cache.get_many(['metadata:a', 'metadata:b', 'metadata:c']) == \
+        {'metadata:a': {'abstract': 'first'}, 'metadata:b': {'abstract': 'second'}}
+
+
+def test_enrich_search_runs_findpapers_enrichment_on_cache_misses(tmp_path):
+    cache = SearchCache(tmp_path / 'enrichment.sqlite', ttl=60, max_entries=100)
+    calls = []
+
+    def fetch(paper, scopus_api_token):
+        calls.append((paper.title, scopus_api_token))
+        return {'title': 'Hyperscanning in Autism', 'doi': paper.doi,
+                'abstract': 'From the page.', 'authors': ['A. Author'], 'keywords': [],
+                'publication': None}
+
+    def search():
+        search = fp.models.search.Search('[autism]', databases=['arxiv'])
+        search.add_paper(fp.models.paper.Paper('Hyperscanning in autism', None, [], None,
+                                               datetime.date(2021, 1, 1), set(), '10.1/a',
+                                               databases={'arXiv'}))
+        return search
+
+    enriched = search()
+    assert enrich_search(enriched, cache, 'key', fetch=fetch) == 0
+    assert enrich_search(search(), cache, 'key', fetch=fetch) == 1
+    assert calls == [('Hyperscanning in autism', 'key')]
+    paper = next(iter(enriched.papers))
+    assert (paper.title, paper.abstract, paper.doi) == \
+        ('Hyperscanning in Autism', 'From the page.', '10.1/a')
+    assert paper.authors == ['A. Author']
+    # payloads with Scopus data are kept apart
+    assert enrich_search(search(), cache, fetch=fetch) == 0
+
+
+def search_of(database):
+    search = fp.models.search.Search('[autism]', databases=[database.lower()])
+    search.add_paper(fp.models.paper.Paper('Hyperscanning in autism', None, [], None,
+                                           datetime.date(2021, 1, 1), set(), '10.1/a',
+                                           databases={database}))
+    return search
+
+
+def test_enrichment_shared_across_databases_keeps_the_databases(tmp_path, monkeypatch):
+    from findpapers.tools import search_runner_tool
+
+    def enrich(search, scopus_api_token):
+        for paper in search.papers:
+            paper.abstract = 'From the page.'
+            paper.add_database('Scopus')
+
+    monkeypatch.setattr(search_runner_tool, '_enrich', enrich)
+    monkeypatch.setattr(search_runner_tool, '_flag_potentially_predatory_publications',
+                        lambda search: None)
+    cache = SearchCache(tmp_path / 'enrichment.sqlite', ttl=60, max_entries=100)
+    assert enrich_search(search_of('Scopus'), cache) == 0
+    arxiv = search_of('arXiv')
+    assert enrich_search(arxiv, cache) == 1
+    paper = next(iter(arxiv.papers))
+    assert (paper.abstract, paper.databases) == ('From the page.', {'arXiv'})
+
+
+def test_papers_without_enrichment_are_cached_for_a_shorter_time(tmp_path):
+    cache = SearchCache(tmp_path / 'enrichment.sqlite', ttl=60, max_entries=100)
+    calls = []
+
+    def fetch(item):
+        calls.append(item)
+        return {} if item == 'unknown' else {'abstract': item}
+
+    items = {'a': 'known', 'b': 'unknown'}
+    cached_lookup(cache, 'paper', items, fetch, missing_ttl=0.2)
+    assert cached_lookup(cache, 'paper', items, fetch)[1] == set()
+    time.sleep(0.3)
+    payloads, fetched = cached_lookup(cache, 'paper', items, fetch, missing_ttl=0.2)
+    assert fetched == {'b'} and payloads['a'] == {'abstract': 'known'}
+    assert sorted(calls) == ['known', 'unknown', 'unknown']
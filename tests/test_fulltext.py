@@ -0,0 +1,48 @@
+import pandas as pd
+
+from src.utils.fulltext import FullTextIndex, match_expression
+from src.utils.review_store import ReviewStore
+
+
+def test_match_expression_quotes_words():
+    assert match_expression('fNIRS "hyper-scanning" neuro*') == \
+        '"fnirs" "hyper" "scanning" "neuro"*'
+    assert match_expression(' ( ) ') == ''
+
+
+def test_index_ranks_title_matches_first_and_updates_incrementally(tmp_path):
+    index = FullTextIndex(tmp_path / 'fulltext.sqlite')
+    assert index.update(['a', 'b', 'c'],
+                        ['EEG in infants', 'Hyperscanning with fNIRS', None],
+                        ['We record fNIRS.', 'Two brains.', 'Nothing here']) == 3
+    assert index.search('fnirs') == ['b', 'a']
+    assert index.search('infant') == ['a']
+    assert index.search('hyper*') == ['b']
+
+    # unchanged papers are not indexed again
+    assert index.update(['a', 'b', 'd'],
+                        ['EEG in infants', 'Hyperscanning with fNIRS', 'Infant fNIRS'],
+                        ['We record fNIRS.', 'Two brains (revised).', None]) == 2
+    assert index.search('revised') == ['b']
+    assert len(index) == 4
+
+
+def test_store_search_reuses_previous_index(tmp_path):
+    ris_df = pd.DataFrame({'id': [1, 2],
+                           'title': ['EEG in infants', 'Hyperscanning'],
+                           'date': ['2021-01-01', '2022-01-01'],
+                           'doi': [None, None],
+                           'abstract': ['', 'fNIRS of dyads']})
+    first = ReviewStore.create(ris_df, pd.DataFrame({'key': [1, 2]}), tmp_path)
+    ris_df = pd.concat([ris_df, pd.DataFrame({'id': [3], 'title': ['Infant fNIRS'],
+                                              'date': ['2022-05-01'], 'doi': [None],
+                                              'abstract': ['']})], ignore_index=True)
+    second = ReviewStore.create(ris_df, pd.DataFrame({'key': [1, 2, 3]}), tmp_path,
+                                previous=first)
+    assert second.search('fnirs') == [2, 1]
+
+    third = ReviewStore.create(ris_df.iloc[1:], pd.DataFrame({'key': [2, 3]}), tmp_path,
+                               previous=second)
+    assert len(third.index) == 2 and len(second.index) == 3
+    assert second.read(['title'], rows=[2, 0]).title.tolist() == ['Infant fNIRS',
+                                                                   'EEG in infants']
@@ -0,0 +1,91 @@
+import threading
+import time
+import requests
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.utils.http_client import RateLimitedAdapter, TokenBucket, install
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Fails the first `failures` requests of each path with a 429."""
+
+    failures = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            remaining = self.failures.get(self.path, 0)
+            self.failures[self.path] = remaining - 1
+        if remaining > 0:
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            body = b'slow down'
+        else:
+            self.send_response(200)
+            body = b'ok'
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def new_session(adapter):
+    session = requests.Session()
+    session.trust_env = False
+    install(session, adapter)
+    return session
+
+
+def test_retries_throttled_requests_within_budget(stub_server):
+    StubHandler.failures = {'/flaky': 2, '/down': 100}
+    adapter = RateLimitedAdapter(hosts={'127.0.0.1': 'stub'}, rate_limits={},
+                                 backoff=0.01, max_retries_per_request=3, min_retries=4,
+                                 retry_ratio=0)
+    session = new_session(adapter)
+
+    assert session.get(stub_server + '/flaky').text == 'ok'
+    assert session.get(stub_server + '/down').status_code == 429
+
+    metrics = adapter.metrics.snapshot()['stub']
+    assert metrics['requests'] == 3 + 3
+    assert metrics['retries'] == 2 + 2
+    assert metrics['throttled'] == 2 + 3
+
+
+def test_rate_limit_per_database_and_api_key(stub_server):
+    StubHandler.failures = {}
+    adapter = RateLimitedAdapter(hosts={'127.0.0.1': 'stub'}, rate_limits={'stub': (20.0, 1)})
+    session = new_session(adapter)
+
+    start = time.monotonic()
+    for _ in range(5):
+        assert session.get(stub_server + '/search?apiKey=a').ok
+    assert time.monotonic() - start >= 4 / 20 * 0.9
+    # another API key has its own bucket
+    assert session.get(stub_server + '/search?apiKey=b').ok
+    assert adapter.metrics.snapshot()['stub']['requests'] == 6
+    assert len(adapter._buckets) == 2
+
+
+def test_token_bucket_waits_for_tokens():
+    now, waits = [0.0], []
+    bucket = TokenBucket(2.0, 2, clock=lambda: now[0], sleep=waits.append)
+    assert [bucket.acquire() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+    now[0] = 10.0
+    assert bucket.acquire() == 0.0
+    assert waits == [0.5, 1.0]
@@ -0,0 +1,44 @@
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+from pathlib import Path
+from src.utils.consts import IMPORT_TIME_BUDGET
+
+SRC = Path(__file__).resolve().parents[1] / 'src'
+# loaded by streamlit itself, so they do not count against the budget
+PRELOADED = ['pandas', 'pyarrow', 'requests']
+PAGE_MODULES = ['utils.consts', 'utils.query', 'utils.pipeline', 'utils.exports',
+                'utils.review_store', 'utils.stats', 'utils.profiling']
+STREAMLIT_MODULES = ['utils.site_config', 'utils.search_engine']
+HEAVY = ['findpapers', 'rispy', 'lxml', 'matplotlib', 'matplotlib_venn', 'graphviz',
+         'st_aggrid']
+
+SCRIPT = """
+import importlib, json, sys, time
+for name in {preloaded}:
+    importlib.import_module(name)
+start = time.perf_counter()
+for name in {modules}:
+    importlib.import_module(name)
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds,
+                   'heavy': [name for name in {heavy} if name in sys.modules]}}))
+"""
+
+
+def test_page_imports_stay_within_budget():
+    preloaded, modules = list(PRELOADED), list(PAGE_MODULES)
+    if importlib.util.find_spec('streamlit') is not None:
+        preloaded.append('streamlit')
+        modules.extend(STREAMLIT_MODULES)
+    script = SCRIPT.format(preloaded=preloaded, modules=modules, heavy=HEAVY)
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    output = subprocess.run([sys.executable, '-c', script], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    result = json.loads(output)
+
+    assert result['heavy'] == []
+    assert result['seconds'] < IMPORT_TIME_BUDGET
@@ -0,0 +1,58 @@
+import datetime
+import findpapers as fp
+
+from src.utils.incremental import clip_window, delta_window, merge_into
+
+START = datetime.date(2021, 10, 1)
+LAST_RUN = datetime.date(2022, 3, 1)
+
+
+def test_delta_window_without_stored_window():
+    until = datetime.date(2022, 4, 1)
+    assert delta_window(None, None, START, until) == ((START, until), False)
+
+
+def test_delta_window_extends_stored_window():
+    until = datetime.date(2022, 4, 1)
+    assert delta_window(START, LAST_RUN, START, until) == ((LAST_RUN, until), True)
+
+
+def test_delta_window_covered_and_changed_start():
+    assert delta_window(START, LAST_RUN, START, LAST_RUN) == ((None, None), True)
+    other_start = datetime.date(2020, 1, 1)
+    assert delta_window(START, LAST_RUN, other_start, LAST_RUN) == \
+        ((other_start, LAST_RUN), False)
+
+
+def paper(title, date, database='arXiv'):
+    return fp.models.paper.Paper(title, None, [], None, date, set(), databases={database})
+
+
+def test_merge_into_adds_new_papers_and_raises_limits():
+    base = fp.models.search.Search('[autism]', START, LAST_RUN, limit=2,
+                                   limit_per_database=2, databases=['arxiv', 'pubmed'])
+    base.add_paper(paper('Hyperscanning in autism', datetime.date(2021, 11, 1)))
+    base.add_paper(paper('Autism and fNIRS', LAST_RUN))
+    until = datetime.date(2022, 4, 1)
+    delta = fp.models.search.Search('[autism]', LAST_RUN, until, databases=['arxiv', 'pubmed'])
+    # the last stored day is fetched again
+    delta.add_paper(paper('Autism and fNIRS', LAST_RUN, 'PubMed'))
+    delta.add_paper(paper('Autism genetics', datetime.date(2022, 3, 15)))
+
+    merged = merge_into(base, delta)
+    assert (merged.limit, merged.limit_per_database, merged.until) == (4, 4, until)
+    assert sorted(p.title for p in merged.papers) == \
+        ['Autism and fNIRS', 'Autism genetics', 'Hyperscanning in autism']
+    fnirs = next(p for p in merged.papers if p.title == 'Autism and fNIRS')
+    assert fnirs.databases == {'arXiv', 'PubMed'}
+
+
+def test_clip_window_drops_papers_after_the_end_date():
+    search = fp.models.search.Search('[autism]', START, LAST_RUN, databases=['arxiv'])
+    search.add_paper(paper('Hyperscanning in autism', datetime.date(2021, 11, 1)))
+    search.add_paper(paper('Autism and fNIRS', datetime.date(2022, 2, 1)))
+    until = datetime.date(2022, 1, 1)
+    clipped = clip_window(search, until)
+    assert clipped.until == until
+    assert [p.title for p in clipped.papers] == ['Hyperscanning in autism']
+    assert len(search.papers) == 2
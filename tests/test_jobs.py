@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+import time
+import pytest
+
+from concurrent.futures.process import BrokenProcessPool
+from src.utils.jobs import JobQueue, JobStore, QUEUED, RUNNING, FINISHED, FAILED
+
+
+def test_job_store_lifecycle(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite")
+    job_id = store.create({'query': '[ASD]', 'databases': ['arXiv']})
+    assert store.status(job_id)['status'] == QUEUED
+
+    store.update(job_id, status=RUNNING, progress=0.5, message="1 of 2")
+    status = store.status(job_id)
+    assert (status['status'], status['progress']) == (RUNNING, 0.5)
+    assert store.result(job_id) is None
+
+    store.finish(job_id, {'papers': []})
+    assert store.status(job_id)['status'] == FINISHED
+    assert store.result(job_id) == {'papers': []}
+
+
+def test_job_store_fails_unfinished_jobs_of_gone_processes(tmp_path):
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+    store = JobStore(tmp_path / "jobs.sqlite")
+    orphan = store.create({'query': '[ASD]'}, owner=exited.pid)
+    running = store.create({'query': '[ASD]'})
+    assert store.fail_unfinished() == [orphan]
+    assert store.status(orphan)['status'] == FAILED
+    # another server process sharing the store is still running it
+    assert store.status(running)['status'] == QUEUED
+
+
+def test_job_queue_replaces_a_broken_pool(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.sqlite", max_workers=1)
+    broken = queue._executor
+    with pytest.raises(BrokenProcessPool):
+        broken.submit(os._exit, 1).result(timeout=60)
+
+    # invalid dates fail the job inside the worker, without searching
+    job_id = queue.submit({'since': 'never', 'until': 'never', 'databases': []})
+    deadline = time.monotonic() + 60
+    while queue.status(job_id)['status'] in (QUEUED, RUNNING) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert queue._executor is not broken
+    assert queue.status(job_id)['status'] == FAILED
+    assert 'never' in queue.status(job_id)['error']
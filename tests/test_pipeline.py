@@ -0,0 +1,72 @@
+import datetime
+import findpapers as fp
+import pytest
+
+from findpapers.tools.search_runner_tool import _database_safe_run
+from src.utils.cache import SearchCache
+from src.utils.enrichment import content_key
+from src.utils.pipeline import merge_searches, raise_database_error, record_errors
+from src.utils.pipeline import shared_citations, snowball_search
+from src.utils.result_store import ResultStore
+
+
+def test_error_of_a_database_survives_findpapers():
+    def outage(search):
+        raise ConnectionError("429 Too Many Requests")
+
+    run = record_errors(outage)
+    search = fp.models.search.Search('[autism]', databases=['scopus'])
+    # findpapers catches and logs the error of each database
+    _database_safe_run(lambda: run(search), search, 'Scopus')
+    assert search.papers == set()
+    with pytest.raises(ConnectionError, match='429'):
+        raise_database_error(search)
+
+
+def test_search_without_errors_passes():
+    run = record_errors(lambda search: None)
+    search = fp.models.search.Search('[autism]', databases=['arxiv'])
+    _database_safe_run(lambda: run(search), search, 'arXiv')
+    raise_database_error(search)
+
+
+def test_snowballed_papers_are_stored_with_the_results(tmp_path):
+    search = fp.models.search.Search('[autism]', databases=['arxiv'])
+    search.add_paper(fp.models.paper.Paper('Hyperscanning in autism', None, [], None,
+                                           datetime.date(2021, 1, 1), set(), '10.1/a',
+                                           databases={'arXiv'}))
+    store = ResultStore(tmp_path / 'results.sqlite', tmp_path / 'results', ttl=60,
+                        max_entries=10, lease_seconds=60)
+    store.put('key', {'search': fp.models.search.Search.to_dict(search), 'failed': []})
+    # a cites b, c cites a and is unknown to CrossRef
+    cache = SearchCache(tmp_path / 'enrichment.sqlite', ttl=60, max_entries=100)
+    cache.put_many({
+        f"crossref:{content_key('10.1/a')}": {'references': ['10.1/b']},
+        f"citations:{content_key('10.1/a')}": ['10.1/c'],
+        f"crossref:{content_key('10.1/b')}": {'doi': '10.1/b', 'title': 'Joint attention',
+                                               'date': '2019-05-01', 'references': []},
+        f"crossref:{content_key('10.1/c')}": {},
+    })
+
+    graph, papers = shared_citations('key', depth=1, max_nodes=10, store=store, cache=cache)
+    assert graph.depth == {'10.1/a': 0, '10.1/b': 1, '10.1/c': 1}
+    assert [(p.title, p.databases, p.comments) for p in papers] == \
+        [('Joint attention', {'arXiv'}, 'Citation snowballing, depth 1')]
+
+    cache.clear()
+    graph, papers = shared_citations('key', depth=1, max_nodes=10, store=store, cache=cache)
+    assert len(graph.edges) == 2 and len(papers) == 1
+    extended = snowball_search(search, papers)
+    assert len(extended.papers) == 2 and len(search.papers) == 1
+
+
+def test_merge_keeps_papers_listed_under_other_databases():
+    search = fp.models.search.Search('[autism]', databases=['arxiv', 'scopus'])
+    for title, databases in [('Hyperscanning in autism', {'arXiv', 'Scopus'}),
+                             ('Joint attention', {'Scopus'})]:
+        search.add_paper(fp.models.paper.Paper(title, None, [], None, datetime.date(2021, 1, 1),
+                                               set(), databases=databases))
+    merged, dropped = merge_searches([search], '[autism]', None, None, 10, ['arXiv'])
+    assert [(paper.title, paper.databases) for paper in merged.papers] == \
+        [('Hyperscanning in autism', {'arXiv'})]
+    assert dropped == 1
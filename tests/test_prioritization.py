@@ -0,0 +1,59 @@
+import time
+
+import numpy as np
+
+from src.utils.prioritization import RelevanceModel, estimated_recall, screening_queue, tfidf_matrix
+
+
+def corpus(n_papers=2000, seed=0):
+    rng = np.random.RandomState(seed)
+    words = [f'word{n}' for n in range(500)]
+    relevant = rng.rand(n_papers) < 0.05
+    documents = [' '.join(rng.choice(words, 60))
+                 + (' autism hyperscanning fnirs' if include else ' genetics mice')
+                 for include in relevant]
+    return documents, relevant
+
+
+def test_tfidf_rows_have_unit_length():
+    matrix = tfidf_matrix(["deep eeg review", "eeg in infants", "unique words only", ""])
+    assert matrix.shape == (4, 1)
+    norms = np.bincount(matrix.rows, weights=matrix.values ** 2, minlength=4)
+    assert np.allclose(norms, [1, 1, 0, 0])
+
+
+def test_includes_are_ranked_first():
+    documents, relevant = corpus()
+    matrix = tfidf_matrix(documents)
+    model = RelevanceModel(matrix.shape[1])
+    reviewed = np.zeros(len(documents), dtype=bool)
+    reviewed[:100] = True
+
+    start = time.perf_counter()
+    model.fit(matrix, np.flatnonzero(reviewed), relevant[reviewed])
+    probabilities = model.predict(matrix)
+    assert time.perf_counter() - start < 1
+
+    queue = screening_queue(probabilities, reviewed)
+    assert len(queue) == len(documents) - 100 and not reviewed[queue].any()
+    # all includes are found after screening a small part of the papers
+    n_left = relevant[~reviewed].sum()
+    assert relevant[queue[:2 * n_left]].sum() == n_left
+
+
+def test_untrained_model_keeps_store_order():
+    model = RelevanceModel(3).fit(tfidf_matrix(["a b", "a b"]), np.array([0]), np.array([True]))
+    assert not model.trained
+    assert screening_queue(np.full(4, 0.5), np.array([False, True, False, False])).tolist() == \
+        [0, 2, 3]
+
+
+def test_estimated_recall_is_calibrated_by_recent_decisions():
+    probabilities = np.array([0.9, 0.8, 0.1, 0.1, 0.1, 0.1])
+    reviewed = np.array([True, True, False, False, False, False])
+    included = np.array([True, True, False, False, False, False])
+    stats = estimated_recall(probabilities, reviewed, included, included[:2], [1.0, 1.0])
+    assert stats['found'] == 2
+    assert stats['remaining'] == 0.4
+    assert stats['recall'] == 2 / 2.4
+    assert estimated_recall(probabilities, reviewed, np.zeros(6), [], [])['recall'] is None
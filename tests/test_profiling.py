@@ -0,0 +1,49 @@
+import datetime
+import findpapers as fp
+
+from src.utils.http_client import RequestMetrics
+from src.utils.pipeline import merge_searches
+from src.utils.profiling import RunProfile, load_profiles
+
+
+def test_span_counts_requests_of_its_database(tmp_path):
+    metrics = RequestMetrics()
+    profile = RunProfile(metrics, run_id='run')
+    with profile.span('database', http='medRxiv', database='medRxiv') as span:
+        metrics.add('rxiv', requests=2, bytes=300)
+        metrics.add('pubmed', requests=5, bytes=1000)
+        span['papers_out'] = 7
+    with profile.span('export', papers_in=7):
+        pass
+
+    frame = profile.frame()
+    assert frame['name'].tolist() == ['database', 'export']
+    assert frame.loc[0, ['requests', 'bytes', 'papers_out']].tolist() == [2, 300, 7]
+    assert frame.loc[1, ['requests', 'bytes']].tolist() == [0, 0]
+
+    path = tmp_path / 'profiles.jsonl'
+    profile.write_jsonl(path)
+    RunProfile(run_id='other').write_jsonl(path)
+    profile.write_jsonl(path)
+    loaded = load_profiles(path)
+    assert len(loaded) == 4 and set(loaded['run_id']) == {'run'}
+    assert (loaded['seconds'] >= 0).all()
+
+
+def test_merge_searches_records_merge_and_dedup():
+    date = datetime.date(2021, 1, 1)
+    searches = []
+    for database, title in [('arXiv', 'Hyperscanning in autism'),
+                            ('PubMed', 'Hyperscanning in autism.')]:
+        search = fp.models.search.Search('[autism]', databases=[database.lower()])
+        search.add_paper(fp.models.paper.Paper(title, None, [], None, date, set(),
+                                               databases={database}))
+        searches.append(search)
+
+    profile = RunProfile()
+    merged, dropped = merge_searches(searches, '[autism]', None, None, 10, ['arXiv', 'PubMed'],
+                                     profile=profile)
+    frame = profile.frame().set_index('name')
+    assert len(merged.papers) == 1 and dropped == 0
+    assert frame.loc['merge', ['papers_in', 'papers_out']].tolist() == [2, 2]
+    assert frame.loc['dedup', ['papers_in', 'papers_out']].tolist() == [2, 1]
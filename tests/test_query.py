@@ -0,0 +1,39 @@
+import re
+import pytest
+
+from src.utils.query import QuerySyntaxError, canonical_query, parse_query, Group, Term
+
+
+def test_canonical_query_orders_and_folds():
+    assert canonical_query("[fMRI]   and [ASD]") == "[asd] AND [fmri]"
+    assert canonical_query("(([B] OR [a]))") == "[a] OR [b]"
+    assert canonical_query("[a] OR ([c] OR [b]) OR [a]") == "[a] OR [b] OR [c]"
+    assert canonical_query("[x] AND NOT [z] AND ([b] OR [Deep  Learning])") == \
+        "([b] OR [deep learning]) AND [x] AND NOT [z]"
+
+
+def test_and_and_or_are_only_mixed_in_parentheses():
+    assert parse_query("[a] OR ([b] AND [c])") == \
+        Group('OR', [Term('a'), Group('AND', [Term('b'), Term('c')])])
+    assert canonical_query("([b] AND [c]) OR [a]") == "[a] OR ([b] AND [c])"
+    for query, position in [("[a] OR [b] AND [c]", 5), ("[a] AND [b] OR [c]", 13),
+                            ("[a] AND NOT [d] OR [c]", 17)]:
+        with pytest.raises(QuerySyntaxError, match="parentheses") as error:
+            canonical_query(query)
+        assert error.value.position == position - 1
+
+
+@pytest.mark.parametrize('query, message', [
+    ("", "empty"),
+    ("([a] OR [b]", "Missing closing parenthesis"),
+    ("[a] OR [b])", "Unexpected ')'"),
+    ("[a] (AND [b]", "Unexpected '('"),
+    ("fMRI OR [b]", "square brackets"),
+    ("[] AND [b]", "Empty search term"),
+    ("[a] AND", "Incomplete"),
+    ("NOT [a]", "AND NOT"),
+    ("[*mri]", "wildcard"),
+])
+def test_invalid_queries_are_rejected(query, message):
+    with pytest.raises(QuerySyntaxError, match=re.escape(message)):
+        canonical_query(query)
@@ -0,0 +1,83 @@
+import datetime
+
+import findpapers as fp
+
+from src.utils.cache import SearchCache, make_cache_key
+from src.utils.pipeline import compare_queries, variant_search
+from src.utils.query_set import evaluate, overlap_matrix, split_query_set, variant_summary
+from src.utils.result_store import ResultStore
+
+
+def tree(query):
+    return next(iter(split_query_set([query]).variants.values()))
+
+
+def test_variants_share_their_clauses():
+    query_set = split_query_set(["[asd] AND ([fnirs] OR [hyperscanning])",
+                                 "[ASD] AND ([hyperscanning] OR [fNIRS])",
+                                 "[asd] AND [fnirs] AND NOT [infants]"])
+    assert list(query_set.variants) == ["[asd] AND ([fnirs] OR [hyperscanning])",
+                                        "[asd] AND [fnirs] AND NOT [infants]"]
+    assert query_set.clauses == ['[asd]', '[fnirs]', '[hyperscanning]', '[infants]']
+
+
+def test_variants_are_split_into_their_largest_shared_clauses():
+    query_set = split_query_set(["[asd] AND [fnirs] AND [infants]",
+                                 "[asd] AND [fnirs] AND [adults]",
+                                 "([eeg] OR [meg] OR [fnirs]) AND [adults] AND [infants]",
+                                 "[eeg] OR [meg] OR [mri]"])
+    assert query_set.clauses == ['[adults]', '[asd] AND [fnirs]', '[eeg] OR [meg]',
+                                 '[fnirs]', '[infants]', '[mri]']
+    keys = {'[asd] AND [fnirs]': {1, 2}, '[infants]': {2, 3, 5}, '[adults]': {1, 5},
+            '[eeg] OR [meg]': {4}, '[fnirs]': {2, 5}, '[mri]': {6}}
+    assert [evaluate(node, keys) for node in query_set.variants.values()] == \
+        [{2}, {1}, {5}, {4, 6}]
+
+
+def test_clauses_of_a_single_variant_are_fetched_whole():
+    query_set = split_query_set(["[asd] AND [fnirs] AND NOT [infants]", "[eeg] OR [meg]"])
+    assert query_set.clauses == ['[asd] AND [fnirs] AND NOT [infants]', '[eeg] OR [meg]']
+
+
+def test_evaluate_uses_set_algebra():
+    keys = {'[a]': {1, 2, 3}, '[b]': {2, 3, 4}, '[c]': {5}, '[d]': {3}}
+    assert evaluate(tree("[a] AND ([b] OR [c])"), keys) == {2, 3}
+    assert evaluate(tree("[a] AND NOT [d]"), keys) == {1, 2}
+    assert evaluate(tree("[c] OR ([a] AND [b])"), keys) == {2, 3, 5}
+
+
+def test_summary_and_overlap_of_variants():
+    variants = {'narrow': {1, 2}, 'broad': {1, 2, 3, 4}, 'other': {5}}
+    summary = variant_summary(variants)
+    assert summary['papers'].tolist() == [2, 4, 1]
+    assert summary['unique'].tolist() == [0, 2, 1]
+    assert summary.loc['broad', 'coverage'] == 0.8
+    assert overlap_matrix(variants).loc['narrow', 'broad'] == 2
+
+
+def test_compare_queries_fetches_each_term_once(tmp_path):
+    cache = SearchCache(tmp_path / 'cache.sqlite', ttl=60, max_entries=10)
+    titles = {'[autism]': ['Hyperscanning in autism', 'Autism and fNIRS', 'Autism genetics'],
+              '[fnirs]': ['Autism and fNIRS', 'fNIRS in infants'],
+              '[hyperscanning]': ['Hyperscanning in autism']}
+    for term, term_titles in titles.items():
+        search = fp.models.search.Search(term, databases=['arxiv'])
+        for title in term_titles:
+            search.add_paper(fp.models.paper.Paper(title, None, [], None,
+                                                   datetime.date(2021, 1, 1), set(),
+                                                   databases={'arXiv'}))
+        cache.put(make_cache_key(term, ['arXiv'], None, None, None, 10, scopus=False,
+                                 ieee=False, enrich=False, similarity_threshold=0.95),
+                  fp.models.search.Search.to_dict(search))
+    store = ResultStore(tmp_path / 'results.sqlite', tmp_path / 'results', ttl=60,
+                        max_entries=10, lease_seconds=60)
+
+    result = compare_queries(["[autism] AND [fnirs]",
+                              "[autism] AND ([fnirs] OR [hyperscanning])"],
+                             None, None, 10, ['arXiv'], cache=cache, store=store)
+    assert sorted(result.clauses) == sorted(titles)
+    assert [len(keys) for keys in result.variants.values()] == [1, 2]
+    assert result.failed == [] and result.truncated == []
+    assert sorted(paper.title for paper in variant_search(
+        result, "[autism] AND ([fnirs] OR [hyperscanning])").papers) == \
+        ['Autism and fNIRS', 'Hyperscanning in autism']
@@ -0,0 +1,177 @@
+import datetime
+import threading
+import time
+
+import findpapers as fp
+import pytest
+
+from src.utils.cache import SearchCache, make_cache_key
+from src.utils.pipeline import load_search, shared_search
+from src.utils.result_store import ResultStore
+
+
+def open_store(tmp_path, **kwargs):
+    options = dict(ttl=60, max_entries=2, lease_seconds=60, poll_interval=0.01)
+    options.update(kwargs)
+    return ResultStore(tmp_path / 'results.sqlite', tmp_path / 'results', **options)
+
+
+def test_concurrent_requests_share_one_creation(tmp_path):
+    store = open_store(tmp_path)
+    calls, outcomes = [], []
+
+    def create():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'papers': 3}
+
+    def request():
+        outcomes.append(store.get_or_create('abc', create))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert [value for value, _ in outcomes] == [{'papers': 3}] * 8
+    assert sorted(created for _, created in outcomes) == [False] * 7 + [True]
+    assert store.get_or_create('abc', create) == ({'papers': 3}, False)
+    # partial results are not reused by later requests
+    assert store.get_or_create('abc', lambda: {'papers': 4},
+                               reusable=lambda value: value['papers'] > 3) == ({'papers': 4}, True)
+
+
+def test_replacing_and_evicting_entries_drops_derived_results(tmp_path):
+    store = open_store(tmp_path)
+    store.put('a', 1)
+    store.put('a:exports', 2)
+    store.directory('a').mkdir(parents=True)
+    store.put('a', 3)
+    assert store.get('a:exports') is None
+
+    store.put('a:exports', 4)
+    store.put('b', 5)
+    store.put('c', 6)
+    assert store.get('a') is None and store.get('a:exports') is None
+    assert not store.directory('a').exists()
+    assert store.get('c') == 6
+
+
+def test_pinned_entries_are_not_evicted(tmp_path):
+    store = open_store(tmp_path)
+    store.put('a', 1)
+    store.directory('a').mkdir(parents=True)
+    store.pin('a:exports')
+    for key in 'bcd':
+        store.put(key, 2)
+    assert store.get('a') == 1 and store.directory('a').exists()
+    assert store.get('b') is None and store.get('d') == 2
+
+    # expired pins do not protect the entry
+    store = open_store(tmp_path, pin_seconds=0)
+    store.put('e', 3)
+    assert store.get('a') is None and not store.directory('a').exists()
+
+
+def test_replacing_and_expiring_entries_removes_their_files(tmp_path):
+    store = open_store(tmp_path, ttl=0.2, max_entries=10, pin_seconds=60)
+    for key in 'ab':
+        store.put(key, 1)
+        store.put(f'{key}:exports', 2)
+        (store.directory(key) / 'exports').mkdir(parents=True)
+    store.pin('b')
+    store.put('a', 3)
+    store.put('b', 3)
+    assert not store.directory('a').exists() and store.directory('b').exists()
+
+    (store.directory('a') / 'exports').mkdir(parents=True)
+    store.put('a:exports', 4)
+    time.sleep(0.3)
+    store.put('c', 5)
+    assert not store.directory('a').exists() and store.directory('b').exists()
+    assert store.get('c') == 5
+    with store._connect() as con:
+        assert sorted(row[0] for row in con.execute("SELECT key FROM results")) == ['b', 'c']
+
+
+def test_waits_for_the_lease_of_another_process(tmp_path):
+    store, other = open_store(tmp_path), open_store(tmp_path)
+    assert other._acquire_lease('abc')
+
+    with pytest.raises(TimeoutError):
+        store.get_or_create('abc', lambda: 'mine', timeout=0.05)
+
+    def finish():
+        time.sleep(0.1)
+        other.put('abc', 'theirs')
+        other._release_lease('abc')
+
+    thread = threading.Thread(target=finish)
+    thread.start()
+    assert store.get_or_create('abc', lambda: 'mine') == ('theirs', False)
+    thread.join()
+
+
+def test_lease_is_renewed_while_creating(tmp_path):
+    store, other = open_store(tmp_path, lease_seconds=0.2), open_store(tmp_path)
+
+    def create():
+        time.sleep(0.5)
+        # the lease would have expired twice without renewal
+        return other._acquire_lease('abc')
+
+    assert store.get_or_create('abc', create) == (False, True)
+    assert other._acquire_lease('abc')
+
+
+def test_shared_search_runs_identical_searches_once(tmp_path):
+    search = fp.models.search.Search('[autism]', databases=['arxiv'])
+    search.add_paper(fp.models.paper.Paper('Hyperscanning in autism', None, [], None,
+                                           datetime.date(2021, 1, 1), set(),
+                                           databases={'arXiv'}))
+    cache = SearchCache(tmp_path / 'cache.sqlite', ttl=60, max_entries=10)
+    cache.put(make_cache_key('[autism]', ['arXiv'], None, None, None, 10, scopus=False,
+                             ieee=False, enrich=False, similarity_threshold=0.95),
+              fp.models.search.Search.to_dict(search))
+    store = open_store(tmp_path)
+
+    first = shared_search('[autism]', None, None, 10, ['arXiv'], cache=cache, store=store)
+    second = shared_search('[Autism]', None, None, 10, ['arXiv'], cache=cache, store=store)
+    assert first[1:] == ([], True) and second == (first[0], [], False)
+    assert [paper.title for paper in load_search(first[0], store).papers] == \
+        ['Hyperscanning in autism']
+
+
+def test_interrupted_runs_are_listed_until_they_succeed(tmp_path):
+    store = open_store(tmp_path)
+    started_at = store.start_run('abc', {'query': '[autism]'})
+    store.finish_run('abc', "TimeoutError()")
+    assert [(run['key'], run['params'], run['error']) for run in store.interrupted_runs()] == \
+        [('abc', {'query': '[autism]'}, "TimeoutError()")]
+
+    # resumed runs keep their start and are hidden while they run
+    assert store._acquire_lease('abc')
+    assert store.start_run('abc', {'query': '[autism]'}) == started_at
+    assert store.interrupted_runs() == []
+    store._release_lease('abc')
+    store.finish_run('abc')
+    assert store.interrupted_runs() == []
+
+
+def test_forced_search_resumes_from_results_of_the_interrupted_run(tmp_path):
+    search = fp.models.search.Search('[autism]', databases=['arxiv'])
+    cache = SearchCache(tmp_path / 'cache.sqlite', ttl=60, max_entries=10)
+    key = make_cache_key('[autism]', ['arXiv'], None, None, None, 10, scopus=False,
+                         ieee=False, enrich=False, similarity_threshold=0.95)
+    store = open_store(tmp_path)
+    store.start_run(key, {})
+    store.finish_run(key, "KeyboardInterrupt()")
+    # the database finished before the run was interrupted
+    cache.put(key, fp.models.search.Search.to_dict(search))
+
+    result = shared_search('[autism]', None, None, 10, ['arXiv'], force_refresh=True,
+                           cache=cache, store=store)
+    assert result == (key, [], True)
+    assert store.interrupted_runs() == []
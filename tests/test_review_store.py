@@ -0,0 +1,71 @@
+import pandas as pd
+
+from src.utils.review_store import (ReviewStore, new_decisions, review_view, paper_keys,
+                                    changed_decisions, apply_decisions, match_keys)
+
+
+def test_review_view_joins_decisions(tmp_path):
+    ris_df = pd.DataFrame({'type_of_reference': ['JOUR', 'JOUR'],
+                           'id': [1, 2],
+                           'title': ['a', 'b'],
+                           'date': ['2021-01-01', '2022-01-01'],
+                           'doi': [None, '10.1/b'],
+                           'abstract': ['long a', 'long b'],
+                           'custom1': ['', 'x'],
+                           'authors': [['A', 'B'], ['C']]})
+    rayyan_df = pd.DataFrame({'key': [1, 2], 'databases': [['arXiv'], ['arXiv', 'PubMed']]})
+    store = ReviewStore.create(ris_df, rayyan_df, tmp_path)
+
+    decisions = new_decisions(store)
+    assert decisions.columns.tolist() == ['id', 'reviewed', 'decision', 'criteria', 'custom1']
+    decisions.loc[decisions.id == 2, ['reviewed', 'decision']] = [True, False]
+
+    review = review_view(store, decisions, ['type_of_reference', 'id', 'title'])
+    assert review.columns.tolist() == ['id', 'reviewed', 'decision', 'criteria',
+                                       'type_of_reference', 'title', 'custom1']
+    assert review.decision.tolist() == [True, False]
+    assert store.read(['databases'], table='rayyan').databases[1].tolist() == ['arXiv', 'PubMed']
+    assert len(store) == 2
+    assert store.read(['paper_key']).paper_key.tolist() == ['a|2021', 'DOI-10.1/b']
+
+
+def test_paper_keys_match_findpapers():
+    keys = paper_keys(pd.Series(['Deep EEG', 'fNIRS', 'Hyperscanning']),
+                      pd.Series(['2021-03-01', '2020-01-01', None]),
+                      pd.Series([float('nan'), '10.1/x', '']))
+    assert keys.tolist() == ['deep eeg|2021', 'DOI-10.1/x', 'hyperscanning|']
+
+
+def test_review_page_and_decision_deltas(tmp_path):
+    ris_df = pd.DataFrame({'id': range(1, 6),
+                           'title': list('abcde'),
+                           'date': ['2021-01-01'] * 5,
+                           'doi': [None] * 5,
+                           'custom1': [''] * 5})
+    store = ReviewStore.create(ris_df, pd.DataFrame({'key': range(1, 6)}), tmp_path)
+    decisions = new_decisions(store)
+
+    page = review_view(store, decisions, ['id', 'title'], start=2, stop=4)
+    assert page.id.tolist() == [3, 4]
+    assert store.read(['title'], start=4, stop=9).title.tolist() == ['e']
+
+    edited = page.copy()
+    edited.loc[1, ['decision', 'custom1']] = [False, 'off topic']
+    changes = changed_decisions(page[decisions.columns], edited)
+    assert changes.id.tolist() == [4]
+
+    assert apply_decisions(decisions, changes) == 1
+    assert decisions.decision.tolist() == [True, True, True, False, True]
+    assert decisions.custom1[3] == 'off topic'
+
+
+def test_papers_sharing_a_key_are_all_found(tmp_path):
+    ris_df = pd.DataFrame({'id': [1, 2, 3],
+                           'title': ['Hyperscanning', 'EEG of dyads', 'Hyperscanning'],
+                           'date': ['2021-01-01', '2021-01-01', '2021-06-01'],
+                           'doi': [None, None, None],
+                           'abstract': ['fNIRS', 'fNIRS and EEG', 'fNIRS']})
+    store = ReviewStore.create(ris_df, pd.DataFrame({'key': [1, 2, 3]}), tmp_path)
+    assert sorted(store.search('fnirs')) == [0, 1, 2]
+    rows, positions = match_keys(['a', 'b', 'a'], pd.Series(['x', 'a', 'b'], index=[5, 6, 7]))
+    assert rows.tolist() == [0, 2, 1] and positions.tolist() == [1, 1, 2]
@@ -0,0 +1,72 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.utils.screening import ScreeningLog, agreement, consolidate, reviewer_decisions, shard_of
+
+
+def test_shards_are_stable_and_assigned_to_two_reviewers(tmp_path):
+    keys = [f'DOI-10.1/{n}' for n in range(200)]
+    shards = shard_of(keys, 4)
+    assert np.array_equal(shards, shard_of(keys, 4))
+    assert set(shards) == {0, 1, 2, 3}
+
+    log = ScreeningLog(tmp_path / 'screening.sqlite')
+    log.assign('review', ['ann', 'bob', 'cy'], 4, per_shard=2)
+    n_shards, assigned = log.assignment('review')
+    assert n_shards == 4
+    assert assigned == {'ann': [0, 2, 3], 'bob': [0, 1, 3], 'cy': [1, 2]}
+    assert log.assignment('other') == (None, {})
+
+
+def test_concurrent_reviewers_do_not_overwrite_each_other(tmp_path):
+    log = ScreeningLog(tmp_path / 'screening.sqlite')
+    keys = [f'paper{n}' for n in range(50)]
+
+    def screen(reviewer):
+        for key in keys:
+            log.record('review', reviewer, [key], [reviewer != 'bob' or key != 'paper0'])
+
+    threads = [threading.Thread(target=screen, args=(name,)) for name in ('ann', 'bob')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    merged = consolidate(log.events('review'))
+    assert merged['votes'].eq(2).all()
+    assert merged.loc['paper0', 'status'] == 'conflict' and merged.loc['paper0', 'decision'] is None
+    assert (merged['status'] == 'agreed').sum() == 49
+
+
+def test_latest_and_final_decisions_win(tmp_path):
+    log = ScreeningLog(tmp_path / 'screening.sqlite')
+    log.record('review', 'ann', ['a', 'b', 'c'], [True, False, True])
+    log.record('review', 'bob', ['a', 'b', 'c'], [True, True, False], criteria='population')
+    log.record('review', 'ann', ['b'], [True])
+    log.record('review', 'cy', ['c'], [False], final=True)
+    events = log.events('review')
+
+    merged = consolidate(events)
+    assert merged['status'].to_dict() == {'a': 'agreed', 'b': 'agreed', 'c': 'resolved'}
+    assert merged['decision'].tolist() == [True, True, False]
+
+    stats = agreement(events)
+    assert stats[['reviewer_a', 'reviewer_b', 'papers']].values.tolist() == [['ann', 'bob', 3]]
+    assert stats.loc[0, 'agreement'] == 2 / 3
+
+    own = reviewer_decisions(log.events('review', 'bob'), pd.Series(['c', 'a', 'x']),
+                             pd.Series([10, 11, 12]))
+    assert own[['id', 'decision', 'criteria']].values.tolist() == \
+        [[11, True, 'population'], [10, False, 'population']]
+
+
+def test_decisions_apply_to_all_papers_sharing_a_key(tmp_path):
+    log = ScreeningLog(tmp_path / 'screening.sqlite')
+    log.record('review', 'alice', ['hyperscanning|2021', 'DOI-10.1/b'], [False, True])
+    changes = reviewer_decisions(log.events('review', 'alice'),
+                                 pd.Series(['hyperscanning|2021', 'DOI-10.1/b',
+                                            'hyperscanning|2021']),
+                                 pd.Series([10, 11, 12]))
+    assert changes[['id', 'decision']].values.tolist() == [[10, False], [12, False], [11, True]]
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from src.utils.stats import overlap, popcount, prisma_counts, prisma_dot, venn_subsets
+
+SOURCES = ['ACM', 'arXiv', 'PubMed']
+DATABASES = pd.Series([['arXiv'], ['arXiv', 'PubMed'], np.array(['pubmed']), ['ACM', 'arXiv',
+                       'PubMed'], [], ['Unknown']])
+
+
+def test_overlap_counts_every_combination():
+    stats = overlap(DATABASES, SOURCES)
+    assert stats.masks.tolist() == [0b010, 0b110, 0b100, 0b111, 0, 0]
+    assert stats.counts.tolist() == [2, 0, 1, 0, 1, 0, 1, 1]
+    assert popcount(stats.masks).tolist() == [1, 2, 1, 3, 0, 0]
+
+
+def test_venn_subsets_and_prisma():
+    stats = overlap(DATABASES, SOURCES)
+    # (arXiv only, PubMed only, both)
+    assert venn_subsets(stats, ['arXiv', 'PubMed']) == (1, 1, 2)
+    assert venn_subsets(stats, ['ACM', 'arXiv', 'PubMed']) == (0, 1, 0, 1, 0, 1, 1)
+    assert prisma_counts(stats, 4) == (7, 1, 6, 2, 4)
+    assert 'Identification -> "Auto screening" [label=1]' in prisma_dot(prisma_counts(stats, 4))
+
+
+def test_overlap_scales_to_all_sources():
+    rng = np.random.RandomState(0)
+    sources = [f'db{i}' for i in range(7)]
+    databases = pd.Series([list(rng.choice(sources, size=rng.randint(1, 4), replace=False))
+                           for _ in range(1000)])
+    stats = overlap(databases, sources)
+    assert stats.counts.sum() == 1000
+    assert popcount(stats.masks).sum() == sum(len(d) for d in databases)